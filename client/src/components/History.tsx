@@ -6,16 +6,31 @@ import { format } from "date-fns";
 import { Button } from "@/components/ui/button";
 
 type HistoryItem = {
-  _id?: string;
+  id: string;
   image_id: string;
   image_url: string;
+  thumbnail_url?: string;
   timestamp: string;
   disease: { result: string };
   variety: { result: string };
   age: { result: number };
 };
 
+const API_BASE_URL = "https://rice-plant-disease-classification.k-clowd.top";
 const ITEMS_PER_PAGE = 8;
+// Number of entries kept as new predictions are streamed in
+const MAX_HISTORY_ITEMS = 50;
+
+// Merges entries into the history, newest first, keeping one entry per prediction record
+const mergeHistory = (items: HistoryItem[], prev: HistoryItem[]) => {
+  const byId = new Map<string, HistoryItem>();
+  for (const item of [...items, ...prev]) {
+    if (!byId.has(item.id)) byId.set(item.id, item);
+  }
+  return [...byId.values()]
+    .sort((a, b) => b.timestamp.localeCompare(a.timestamp))
+    .slice(0, MAX_HISTORY_ITEMS);
+};
 
 export default function History() {
   const [history, setHistory] = useState<HistoryItem[]>([]);
@@ -23,22 +38,36 @@ export default function History() {
 
   const fetchHistory = async () => {
     try {
-      const res = await fetch(
-        "https://rice-plant-disease-classification.k-clowd.top/api/history/"
-      );
-      const data = await res.json();
-      setHistory(data);
+      const res = await fetch(`${API_BASE_URL}/api/history/`);
+      const data: HistoryItem[] = await res.json();
+      setHistory((prev) => mergeHistory(data, prev));
     } catch (err) {
       console.error("Failed to fetch history", err);
     }
   };
 
   useEffect(() => {
-    fetchHistory();
-
-    const onUpdate = () => fetchHistory();
-    window.addEventListener("prediction:completed", onUpdate);
-    return () => window.removeEventListener("prediction:completed", onUpdate);
+    // New predictions are pushed by the server; reconnects resume from the last event.
+    // The history is fetched once the stream is open, so no prediction saved in between
+    // is missed; one that arrives both ways is kept once
+    const stream = new EventSource(`${API_BASE_URL}/api/history/stream`);
+    let fetched = false;
+    const fetchOnce = () => {
+      if (fetched) return;
+      fetched = true;
+      fetchHistory();
+    };
+    stream.addEventListener("open", fetchOnce);
+    stream.addEventListener("error", fetchOnce);
+    stream.addEventListener("prediction", (e) => {
+      const item: HistoryItem = JSON.parse((e as MessageEvent).data);
+      setHistory((prev) => mergeHistory([item], prev));
+    });
+    // Sent when missed predictions cannot be replayed
+    stream.addEventListener("reset", () => {
+      fetchHistory();
+    });
+    return () => stream.close();
   }, []);
 
   // Pagination logic
@@ -63,11 +92,11 @@ export default function History() {
           <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
             {paginated.map((item) => (
               <div
-                key={item.image_id}
+                key={item.id}
                 className="border rounded-lg p-4 bg-background shadow-sm space-y-2"
               >
                 <Image
-                  src={`https://rice-plant-disease-classification.k-clowd.top${item.image_url}`}
+                  src={`${API_BASE_URL}${item.thumbnail_url ?? item.image_url}`}
                   alt="Predicted image"
                   width={300}
                   height={300}
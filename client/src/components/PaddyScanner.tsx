@@ -17,11 +17,6 @@ export default function PaddyScanner() {
   } | null>(null);
   const [loading, setLoading] = useState(false);
 
-  // Dispatch an event for History.tsx to re-fetch
-  const notifyHistoryUpdate = () => {
-    window.dispatchEvent(new Event("prediction:completed"));
-  };
-
   useEffect(() => {
     const timer = setTimeout(() => setVisible(true), 100);
     return () => clearTimeout(timer);
@@ -53,7 +48,6 @@ export default function PaddyScanner() {
 
       const data = await res.json();
       setResult(data);
-      notifyHistoryUpdate(); // trigger history refresh
     } catch (error) {
       console.error("Prediction error:", error);
     } finally {
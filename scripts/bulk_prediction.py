@@ -0,0 +1,299 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from preprocessing import preprocess_batch, remove_transparency
+
+# Configurations
+DISEASE_MODEL_PATH = "../models/disease_classification_model.keras"
+VARIETY_MODEL_PATH = "../models/variety_identification_model.keras"
+AGE_MODEL_PATH = "../models/age_prediction_model.keras"
+IMAGE_DIR = "../data/test_images"
+OUTPUT_PATH = "../prediction/COSC2753_A2_S1_G7.csv"
+BATCH_SIZE = 64
+NUM_WORKERS = os.cpu_count() or 1
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+DISEASE_SIZE = (256, 256)
+VARIETY_AGE_SIZE = (128, 128)
+CSV_HEADER = ["image_id", "label", "variety", "age"]
+DISEASE_CLASSES = sorted(
+    [
+        "Bacterial Leaf Blight",
+        "Bacterial Leaf Streak",
+        "Bacterial Panicle Blight",
+        "Blast",
+        "Brown Spot",
+        "Dead Heart",
+        "Downy Mildew",
+        "Hispa",
+        "Normal",
+        "Tungro",
+    ]
+)
+VARIETY_CLASSES = sorted(
+    [
+        "ADT45",
+        "AndraPonni",
+        "AtchayaPonni",
+        "IR20",
+        "KarnatakaPonni",
+        "Onthanel",
+        "Ponni",
+        "RR",
+        "Surya",
+        "Zonal",
+    ]
+)
+AGE_CLASSES = sorted(
+    [45, 47, 50, 55, 57, 60, 62, 65, 66, 67, 68, 70, 72, 73, 75, 77, 80, 82]
+)
+
+
+def load_and_preprocess(image_paths: list) -> tuple:
+    """
+    Loads one batch of images and produces the model inputs at both resolutions.
+
+    Runs in a worker process, so decoding and resizing happen in parallel with inference.
+    The batch is resized with the vectorized `preprocess_batch` straight into contiguous
+    arrays that can be fed to the models as they are.
+
+    Args:
+        image_paths (list): Paths to the input images.
+
+    Returns:
+        Tuple[list, np.ndarray, np.ndarray]: The image file names, the (N, 256, 256, 3) batch
+        for the disease model and the (N, 128, 128, 3) batch shared by the variety and age models.
+    """
+    images = []
+    for path in image_paths:
+        with Image.open(path) as image:
+            images.append(remove_transparency(image).convert("RGB"))
+
+    disease_batch = preprocess_batch(images, *DISEASE_SIZE)
+    small_batch = preprocess_batch(images, *VARIETY_AGE_SIZE)
+    return [os.path.basename(path) for path in image_paths], disease_batch, small_batch
+
+
+def read_completed_ids(output_path: str) -> set:
+    """
+    Reads the image IDs already written to an output CSV so an interrupted run can resume.
+
+    A trailing partial line left by an interruption is truncated before reading.
+
+    Args:
+        output_path (str): Path to the output CSV file.
+
+    Returns:
+        set: Image IDs that already have a prediction row.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(output_path, newline="") as f:
+        return {row["image_id"] for row in csv.DictReader(f) if row.get("image_id")}
+
+
+def iter_preprocessed(image_paths: list, batch_size: int, num_workers: int, prefetch: int):
+    """
+    Yields preprocessed batches in input order from a pool of worker processes.
+
+    At most `prefetch` batches are decoded ahead of the consumer, which bounds memory use.
+    Workers are spawned rather than forked so they never inherit TensorFlow state.
+
+    Args:
+        image_paths (list): Paths of the images to preprocess.
+        batch_size (int): Number of images per batch.
+        num_workers (int): Number of worker processes.
+        prefetch (int): Maximum number of batches in flight.
+
+    Yields:
+        Tuple[list, np.ndarray, np.ndarray]: Output of `load_and_preprocess` for each batch.
+    """
+    context = multiprocessing.get_context("spawn")
+    chunks = (
+        image_paths[i : i + batch_size] for i in range(0, len(image_paths), batch_size)
+    )
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context) as executor:
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(load_and_preprocess, chunk))
+            if len(pending) >= prefetch:
+                break
+
+        while pending:
+            yield pending.popleft().result()
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(executor.submit(load_and_preprocess, next_chunk))
+
+
+def predict_batch(
+    models: tuple, image_ids: list, disease_batch: np.ndarray, small_batch: np.ndarray
+) -> list:
+    """
+    Runs the three models on one batch and formats the submission rows.
+
+    Args:
+        models (tuple): The loaded (disease, variety, age) Keras models.
+        image_ids (list): Image file names of the batch.
+        disease_batch (np.ndarray): (N, 256, 256, 3) batch for the disease model.
+        small_batch (np.ndarray): (N, 128, 128, 3) batch for the variety and age models.
+
+    Returns:
+        list: Rows of [image_id, label, variety, age].
+    """
+    disease_model, variety_model, age_model = models
+
+    disease_idx = np.argmax(disease_model.predict_on_batch(disease_batch), axis=1)
+    variety_idx = np.argmax(variety_model.predict_on_batch(small_batch), axis=1)
+    age_idx = np.argmax(age_model.predict_on_batch(small_batch), axis=1)
+
+    return [
+        [
+            image_id,
+            DISEASE_CLASSES[d].lower().replace(" ", "_"),
+            VARIETY_CLASSES[v],
+            AGE_CLASSES[a],
+        ]
+        for image_id, d, v, a in zip(image_ids, disease_idx, variety_idx, age_idx)
+    ]
+
+
+def bulk_predict(
+    image_dir: str,
+    output_path: str,
+    batch_size: int = BATCH_SIZE,
+    num_workers: int = NUM_WORKERS,
+    resume: bool = True,
+    cache_dir: str = None,
+):
+    """
+    Predicts disease, variety and age for every image in a directory and writes the submission CSV.
+
+    All three models are loaded once. Images are decoded and preprocessed by parallel worker
+    processes, run through the models in batches, and written to the CSV after every batch,
+    so an interrupted run can be resumed without repeating finished images. With a cache
+    directory, the preprocessed inputs are kept in memory-mapped shards (see
+    `dataset_cache.py`): only new or changed images are preprocessed, and batches are read
+    from the shards without decoding or copying.
+
+    Args:
+        image_dir (str): Directory containing the input images.
+        output_path (str): Path of the CSV file to write (image_id,label,variety,age).
+        batch_size (int, optional): Number of images per model call. Defaults to 64.
+        num_workers (int, optional): Number of preprocessing processes. Defaults to the CPU count.
+        resume (bool, optional): Whether to skip images already present in the output. Defaults to True.
+        cache_dir (str, optional): Directory of the preprocessed tensor cache. Defaults to None.
+
+    Returns:
+        int: Number of images predicted in this run.
+    """
+    image_paths = sorted(
+        os.path.join(image_dir, name)
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+    completed = read_completed_ids(output_path) if resume else set()
+    remaining = [path for path in image_paths if os.path.basename(path) not in completed]
+
+    print("-" * 50)
+    print("Images found:", len(image_paths))
+    print("Already predicted:", len(image_paths) - len(remaining))
+    print("To predict:", len(remaining))
+    if not remaining:
+        return 0
+
+    cache = None
+    if cache_dir:
+        from dataset_cache import build_dataset_cache
+
+        cache = build_dataset_cache(image_dir, cache_dir, num_workers=num_workers)
+
+    # Load models once for the whole run (TensorFlow is imported here so that
+    # preprocessing workers stay lightweight)
+    import tensorflow as tf
+
+    models = (
+        tf.keras.models.load_model(DISEASE_MODEL_PATH),
+        tf.keras.models.load_model(VARIETY_MODEL_PATH),
+        tf.keras.models.load_model(AGE_MODEL_PATH),
+    )
+
+    write_header = not (resume and os.path.exists(output_path) and os.path.getsize(output_path) > 0)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    done = 0
+
+    with open(output_path, "a" if resume else "w", newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(CSV_HEADER)
+
+        if cache is not None:
+            batches = cache.iter_batches(
+                [os.path.basename(path) for path in remaining], batch_size
+            )
+        else:
+            batches = iter_preprocessed(
+                remaining, batch_size, num_workers, prefetch=max(2, num_workers + 1)
+            )
+
+        for image_ids, disease_batch, small_batch in batches:
+            writer.writerows(predict_batch(models, image_ids, disease_batch, small_batch))
+            f.flush()
+            os.fsync(f.fileno())
+
+            done += len(image_ids)
+            elapsed = time.perf_counter() - start
+            print(f"Predicted {done}/{len(remaining)} images ({done / elapsed:.1f} images/s)")
+
+    elapsed = time.perf_counter() - start
+    print("-" * 50)
+    print("Output:", output_path)
+    print(f"Throughput: {done / elapsed:.1f} images/s over {elapsed:.1f}s")
+
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predict disease, variety and age for a directory of paddy images."
+    )
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Overwrite the output instead of skipping images already predicted.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Reuse preprocessed images from this tensor cache (see dataset_cache.py).",
+    )
+    args = parser.parse_args()
+
+    bulk_predict(
+        args.image_dir,
+        args.output,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        resume=not args.no_resume,
+        cache_dir=args.cache_dir,
+    )
@@ -0,0 +1,327 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from bulk_prediction import (
+    DISEASE_SIZE,
+    IMAGE_DIR,
+    IMAGE_EXTENSIONS,
+    NUM_WORKERS,
+    VARIETY_AGE_SIZE,
+    iter_preprocessed,
+)
+
+# Configurations
+CACHE_DIR = "../data/cache/test_images"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+SHARD_SIZE = 1024
+PREPROCESS_BATCH_SIZE = 64
+RESOLUTIONS = {"disease": DISEASE_SIZE, "small": VARIETY_AGE_SIZE}
+
+
+def hash_file(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shard_path(cache_dir: str, shard: int, resolution: str) -> str:
+    """
+    Returns the path of one resolution of a shard, e.g. "shard-00003-disease.npy".
+    """
+    return os.path.join(cache_dir, f"shard-{shard:05d}-{resolution}.npy")
+
+
+def list_images(image_dir: str) -> list:
+    """
+    Returns the sorted paths of the images in a directory.
+    """
+    return sorted(
+        os.path.join(image_dir, name)
+        for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+class DatasetCache:
+    """
+    Preprocessed uint8 model inputs of an image set, stored in memory-mapped shard files.
+
+    Every shard holds up to SHARD_SIZE images at each resolution in RESOLUTIONS, as `.npy`
+    files that are opened with `mmap_mode="r"`, so reading a batch costs no decoding,
+    resizing or copying. `index.json` maps each image ID (file name) to its shard and row,
+    together with the size, modification time and SHA-256 of the source file.
+
+    Shards are never modified once written. `update` re-hashes only the sources whose size
+    or modification time changed, preprocesses only new or changed images into new shards,
+    and deletes shards none of whose rows are referenced any more.
+
+    Args:
+        cache_dir (str): Directory of the index and shard files.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.entries = {}
+        self.shards = []
+        self._arrays = {}
+
+        index_path = os.path.join(cache_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION and index.get("resolutions") == {
+                name: list(size) for name, size in RESOLUTIONS.items()
+            }:
+                self.entries = index["entries"]
+                self.shards = index["shards"]
+
+    def _write_index(self) -> None:
+        """
+        Writes the index atomically, so an interrupted update leaves the previous one intact.
+        """
+        index = {
+            "version": INDEX_VERSION,
+            "resolutions": {name: list(size) for name, size in RESOLUTIONS.items()},
+            "shards": self.shards,
+            "entries": self.entries,
+        }
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def stale(self, image_paths: list) -> list:
+        """
+        Returns the images that are missing from the cache or whose source file changed.
+
+        A source is only re-hashed when its size or modification time differs from the
+        index; an entry whose hash still matches just has its file stats refreshed.
+
+        Args:
+            image_paths (list): Paths of the source images.
+
+        Returns:
+            list: Paths of the images to preprocess.
+        """
+        stale = []
+        for path in image_paths:
+            entry = self.entries.get(os.path.basename(path))
+            if entry is None:
+                stale.append(path)
+                continue
+
+            stat = os.stat(path)
+            if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                continue
+            if entry["sha256"] == hash_file(path):
+                entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+            else:
+                stale.append(path)
+        return stale
+
+    def update(
+        self,
+        image_paths: list,
+        shard_size: int = SHARD_SIZE,
+        batch_size: int = PREPROCESS_BATCH_SIZE,
+        num_workers: int = NUM_WORKERS,
+    ) -> int:
+        """
+        Brings the cache up to date with a set of source images.
+
+        Images no longer in `image_paths` are dropped, and new or changed ones are
+        preprocessed by parallel worker processes straight into new shard files.
+
+        Args:
+            image_paths (list): Paths of the source images.
+            shard_size (int): Maximum number of images per new shard.
+            batch_size (int): Number of images preprocessed per worker task.
+            num_workers (int): Number of preprocessing processes.
+
+        Returns:
+            int: Number of images preprocessed.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        names = {os.path.basename(path) for path in image_paths}
+        self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+        stale = self.stale(image_paths)
+
+        next_shard = max((shard["id"] for shard in self.shards), default=-1) + 1
+        for start in range(0, len(stale), shard_size):
+            shard_paths = stale[start : start + shard_size]
+            arrays = {
+                name: np.lib.format.open_memmap(
+                    shard_path(self.cache_dir, next_shard, name),
+                    mode="w+",
+                    dtype=np.uint8,
+                    shape=(len(shard_paths), height, width, 3),
+                )
+                for name, (width, height) in RESOLUTIONS.items()
+            }
+
+            row = 0
+            batches = iter_preprocessed(
+                shard_paths, batch_size, num_workers, prefetch=max(2, num_workers + 1)
+            )
+            for image_ids, disease_batch, small_batch in batches:
+                arrays["disease"][row : row + len(image_ids)] = disease_batch
+                arrays["small"][row : row + len(image_ids)] = small_batch
+                row += len(image_ids)
+            for array in arrays.values():
+                array.flush()
+            del arrays
+
+            for row, path in enumerate(shard_paths):
+                stat = os.stat(path)
+                self.entries[os.path.basename(path)] = {
+                    "shard": next_shard,
+                    "row": row,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": hash_file(path),
+                }
+            self.shards.append({"id": next_shard, "rows": len(shard_paths)})
+            next_shard += 1
+
+        live = {entry["shard"] for entry in self.entries.values()}
+        self.shards = [shard for shard in self.shards if shard["id"] in live]
+        self._write_index()
+        self._remove_unused_shards()
+        return len(stale)
+
+    def _remove_unused_shards(self) -> None:
+        """
+        Deletes shard files that the index no longer references, including files left
+        by an interrupted update.
+        """
+        keep = {
+            os.path.basename(shard_path(self.cache_dir, shard["id"], name))
+            for shard in self.shards
+            for name in RESOLUTIONS
+        }
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("shard-") and name.endswith(".npy") and name not in keep:
+                os.remove(os.path.join(self.cache_dir, name))
+        self._arrays = {}
+
+    def _array(self, shard: int, resolution: str) -> np.ndarray:
+        key = (shard, resolution)
+        if key not in self._arrays:
+            path = shard_path(self.cache_dir, shard, resolution)
+            self._arrays[key] = np.load(path, mmap_mode="r")
+        return self._arrays[key]
+
+    def iter_batches(self, image_ids: list, batch_size: int):
+        """
+        Yields the cached model inputs of a set of images in batches.
+
+        Images are read shard by shard in row order. A batch of consecutive rows is a
+        read-only view of the memory-mapped shard, so no data is copied; only batches
+        spanning rows that are no longer adjacent (after an update) are gathered.
+
+        Args:
+            image_ids (list): Image IDs (file names) in the cache.
+            batch_size (int): Maximum number of images per batch.
+
+        Yields:
+            Tuple[list, np.ndarray, np.ndarray]: The image IDs, the (N, 256, 256, 3) batch
+            for the disease model and the (N, 128, 128, 3) batch shared by the variety and
+            age models.
+
+        Raises:
+            KeyError: If an image is not in the cache.
+        """
+        located = sorted(
+            (self.entries[image_id]["shard"], self.entries[image_id]["row"], image_id)
+            for image_id in image_ids
+        )
+        start = 0
+        while start < len(located):
+            shard = located[start][0]
+            end = start
+            while end < len(located) and end - start < batch_size and located[end][0] == shard:
+                end += 1
+
+            rows = [row for _, row, _ in located[start:end]]
+            if rows[-1] - rows[0] + 1 == len(rows):
+                selection = slice(rows[0], rows[-1] + 1)
+            else:
+                selection = rows
+            yield (
+                [image_id for _, _, image_id in located[start:end]],
+                self._array(shard, "disease")[selection],
+                self._array(shard, "small")[selection],
+            )
+            start = end
+
+
+def build_dataset_cache(
+    image_dir: str,
+    cache_dir: str,
+    shard_size: int = SHARD_SIZE,
+    num_workers: int = NUM_WORKERS,
+    rebuild: bool = False,
+) -> DatasetCache:
+    """
+    Creates or updates the preprocessed tensor cache of a directory of images.
+
+    Args:
+        image_dir (str): Directory containing the source images.
+        cache_dir (str): Directory of the cache.
+        shard_size (int, optional): Maximum number of images per shard. Defaults to 1024.
+        num_workers (int, optional): Number of preprocessing processes. Defaults to the CPU count.
+        rebuild (bool, optional): Whether to discard the cache and preprocess every image.
+            Defaults to False.
+
+    Returns:
+        DatasetCache: The up-to-date cache.
+    """
+    cache = DatasetCache(cache_dir)
+    if rebuild:
+        # The old shards are deleted once the new index is written
+        cache.entries = {}
+
+    image_paths = list_images(image_dir)
+    start = time.perf_counter()
+    updated = cache.update(image_paths, shard_size=shard_size, num_workers=num_workers)
+
+    print("-" * 50)
+    print("Images found:", len(image_paths))
+    print("Preprocessed:", updated)
+    print("Reused from cache:", len(image_paths) - updated)
+    print("Shards:", len(cache.shards))
+    print(f"Updated in {time.perf_counter() - start:.1f}s")
+    return cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cache the preprocessed model inputs of a directory of paddy images."
+    )
+    parser.add_argument("--image-dir", default=IMAGE_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Preprocess every image again instead of reusing unchanged entries.",
+    )
+    args = parser.parse_args()
+
+    build_dataset_cache(
+        args.image_dir,
+        args.cache_dir,
+        shard_size=args.shard_size,
+        num_workers=args.workers,
+        rebuild=args.rebuild,
+    )
@@ -0,0 +1,69 @@
+import argparse
+import json
+import sys
+
+# Metrics where a larger value is better; for all others (latencies) smaller is better
+HIGHER_IS_BETTER = {"throughput_per_s"}
+
+
+def compare_results(baseline: dict, candidate: dict, metric: str, threshold: float) -> list:
+    """
+    Compares one metric of every benchmark present in both result files.
+
+    Args:
+        baseline (dict): Results of the reference run ({"meta": ..., "results": ...}).
+        candidate (dict): Results of the run being checked.
+        metric (str): Summary field to compare, e.g. "p50_ms" or "throughput_per_s".
+        threshold (float): Percentage change in the worse direction counted as a regression.
+
+    Returns:
+        list: (name, baseline value, candidate value, change in percent, regressed) rows.
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        head = candidate["results"].get(name)
+        if head is None or base.get(metric) in (None, 0) or head.get(metric) is None:
+            continue
+
+        change = (head[metric] - base[metric]) / base[metric] * 100.0
+        worse = -change if metric in HIGHER_IS_BETTER else change
+        rows.append((name, base[metric], head[metric], change, worse > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark JSON files and flag regressions."
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p50_ms")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Regression threshold in percent."
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline_results = json.load(f)
+    with open(args.candidate) as f:
+        candidate_results = json.load(f)
+
+    print(
+        f"{args.metric}: {baseline_results['meta'].get('commit')} -> "
+        f"{candidate_results['meta'].get('commit')}"
+    )
+    print("benchmark".ljust(28) + "baseline".rjust(14) + "candidate".rjust(14) + "change".rjust(10))
+    regressions = 0
+    for name, base_value, head_value, change, regressed in compare_results(
+        baseline_results, candidate_results, args.metric, args.threshold
+    ):
+        regressions += regressed
+        print(
+            name.ljust(28)
+            + str(base_value).rjust(14)
+            + str(head_value).rjust(14)
+            + f"{change:+.1f}%".rjust(10)
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,350 @@
+import copy
+import itertools
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import gridfs
+
+# Duplicate key error code, as reported by MongoDB
+DUPLICATE_KEY_ERROR = 11000
+
+# GridFS chunk size used for streamed reads, matching the MongoDB default
+DEFAULT_CHUNK_SIZE = 255 * 1024
+
+
+def get_path(doc: dict, path: str):
+    """
+    Reads a dotted field path ("disease.result") from a document; None if missing.
+    """
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _compare(value, operator: str, operand) -> bool:
+    """
+    Evaluates one query operator against a field value.
+    """
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if operator == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise NotImplementedError(f"Query operator {operator} is not supported.")
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """
+    Checks whether a document satisfies a query.
+
+    Supports field equality on dotted paths, the comparison operators ($eq, $ne, $gt,
+    $gte, $lt, $lte, $in, $nin, $exists) and the logical operators $and and $or, which
+    covers every query the API issues.
+    """
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            value = get_path(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif get_path(doc, key) != condition:
+            return False
+    return True
+
+
+def project(doc: dict, projection) -> dict:
+    """
+    Applies an inclusion or exclusion projection to a copy of a document.
+    """
+    if not projection:
+        return copy.deepcopy(doc)
+
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    exclude = {k for k, v in projection.items() if not v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+    else:
+        result = {k: copy.deepcopy(v) for k, v in doc.items() if k not in exclude}
+
+    if projection.get("_id", 1) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_key(value):
+    """
+    Orders None before every other value, as MongoDB orders missing fields.
+    """
+    return (value is not None, value if value is not None else 0)
+
+
+class FakeCursor:
+    """
+    The subset of a Motor cursor used by the API: sort, limit, batch_size and async iteration.
+    """
+
+    def __init__(self, docs: list, projection=None):
+        self._docs = docs
+        self._projection = projection
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def _results(self) -> list:
+        docs = list(self._docs)
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(get_path(d, key)), reverse=direction < 0)
+        if self._limit:
+            docs = docs[: self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None) -> list:
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._results():
+            yield doc
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for a Motor collection.
+
+    Documents are stored by `_id` in insertion order. Queries are evaluated by scanning,
+    so the stand-in measures the API rather than the database; indexes are recorded but
+    not used.
+
+    Args:
+        name (str): Collection name.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.docs = {}
+        self.indexes = []
+
+    async def create_index(self, keys, **kwargs) -> str:
+        self.indexes.append(keys)
+        return str(keys)
+
+    def _insert(self, doc: dict) -> ObjectId:
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(f"Duplicate _id {doc['_id']}", DUPLICATE_KEY_ERROR)
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return doc["_id"]
+
+    async def insert_one(self, doc: dict):
+        self._insert(doc)
+
+    async def insert_many(self, docs: list, ordered: bool = True):
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                self._insert(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY_ERROR, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    def find(self, query: dict = None, projection=None) -> FakeCursor:
+        return FakeCursor([d for d in self.docs.values() if matches(d, query)], projection)
+
+    async def find_one(self, query: dict = None, projection=None):
+        for doc in self.docs.values():
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    async def count_documents(self, query: dict) -> int:
+        return sum(1 for doc in self.docs.values() if matches(doc, query))
+
+    async def delete_many(self, query: dict):
+        for doc_id in [k for k, d in self.docs.items() if matches(d, query)]:
+            del self.docs[doc_id]
+
+    def _update(self, query: dict, update: dict, upsert: bool) -> None:
+        doc = next((d for d in self.docs.values() if matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.update(copy.deepcopy(update.get("$setOnInsert", {})))
+            self._insert(doc)
+            doc = self.docs[doc["_id"]]
+
+        for path, amount in update.get("$inc", {}).items():
+            *parents, leaf = path.split(".")
+            target = doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = target.get(leaf, 0) + amount
+        for path, value in update.get("$set", {}).items():
+            *parents, leaf = path.split(".")
+            target = doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = copy.deepcopy(value)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        self._update(query, update, upsert)
+
+    def _replace(self, query: dict, replacement: dict, upsert: bool) -> None:
+        doc = next((d for d in self.docs.values() if matches(d, query)), None)
+        if doc is None:
+            if upsert:
+                self._insert({**query, **copy.deepcopy(replacement)})
+            return
+        self.docs[doc["_id"]] = {**copy.deepcopy(replacement), "_id": doc["_id"]}
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        for operation in operations:
+            if isinstance(operation, ReplaceOne):
+                self._replace(operation._filter, operation._doc, operation._upsert)
+            else:
+                self._update(operation._filter, operation._doc, operation._upsert)
+
+
+class FakeGridOut:
+    """
+    In-memory stand-in for a Motor GridOut download stream.
+    """
+
+    def __init__(self, file: dict):
+        self._id = file["_id"]
+        self.filename = file["filename"]
+        self.metadata = file["metadata"]
+        self.upload_date = file["upload_date"]
+        self.length = len(file["data"])
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self._data = file["data"]
+        self._position = 0
+
+    def seek(self, position: int) -> None:
+        self._position = position
+
+    async def read(self, size: int = -1) -> bytes:
+        end = self.length if size is None or size < 0 else self._position + size
+        data = self._data[self._position : end]
+        self._position += len(data)
+        return data
+
+
+class FakeGridFSBucket:
+    """
+    In-memory stand-in for a Motor GridFS bucket.
+
+    Args:
+        bucket_name (str): Bucket name.
+    """
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.files = {}
+        self._sequence = itertools.count()
+
+    @staticmethod
+    def _read_source(source) -> bytes:
+        return source.read() if hasattr(source, "read") else bytes(source)
+
+    async def upload_from_stream_with_id(self, file_id, filename: str, source, metadata=None):
+        if file_id in self.files:
+            raise gridfs.errors.FileExists(f"File {file_id} already exists")
+        self.files[file_id] = {
+            "_id": file_id,
+            "filename": filename,
+            "metadata": metadata,
+            "upload_date": datetime.now(timezone.utc),
+            "data": self._read_source(source),
+            "sequence": next(self._sequence),
+        }
+
+    async def upload_from_stream(self, filename: str, source, metadata=None) -> ObjectId:
+        file_id = ObjectId()
+        await self.upload_from_stream_with_id(file_id, filename, source, metadata)
+        return file_id
+
+    async def open_download_stream(self, file_id) -> FakeGridOut:
+        if file_id not in self.files:
+            raise gridfs.errors.NoFile(f"No file with id {file_id}")
+        return FakeGridOut(self.files[file_id])
+
+    async def open_download_stream_by_name(self, filename: str) -> FakeGridOut:
+        revisions = [f for f in self.files.values() if f["filename"] == filename]
+        if not revisions:
+            raise gridfs.errors.NoFile(f"No file with name {filename}")
+        return FakeGridOut(max(revisions, key=lambda f: f["sequence"]))
+
+    async def delete(self, file_id) -> None:
+        if self.files.pop(file_id, None) is None:
+            raise gridfs.errors.NoFile(f"No file with id {file_id}")
+
+
+def install_fake_mongo(db_module) -> dict:
+    """
+    Replaces the collections and GridFS buckets of the `db` module with in-memory fakes.
+
+    Must run before any module that does `from db import ...` is imported, i.e. before
+    `main`, the routers and the `utils` modules that touch the database.
+
+    Args:
+        db_module (module): The imported `db` module.
+
+    Returns:
+        dict: The installed fakes by attribute name.
+    """
+    fakes = {
+        "fs": FakeGridFSBucket("images"),
+        "thumbnail_fs": FakeGridFSBucket("thumbnails"),
+        "prediction_collection": FakeCollection("predictions"),
+        "stats_collection": FakeCollection("prediction_daily_stats"),
+    }
+    for name, fake in fakes.items():
+        setattr(db_module, name, fake)
+    return fakes
+
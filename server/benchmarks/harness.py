@@ -0,0 +1,187 @@
+import atexit
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+import numpy as np
+
+# Simulated cost of a stub forward pass (milliseconds per batch and per image), roughly
+# the order of the real models on a CPU
+STUB_BATCH_LATENCY_MS = 5.0
+STUB_IMAGE_LATENCY_MS = 1.0
+
+# Sample images shipped with the training scripts
+SAMPLE_DIR = "../scripts/data"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def configure_models(
+    models: str,
+    batch_latency_ms: float = STUB_BATCH_LATENCY_MS,
+    image_latency_ms: float = STUB_IMAGE_LATENCY_MS,
+) -> None:
+    """
+    Selects real or stub models for the benchmark process.
+
+    With "stub", every model is served by `StubBackend`; with "real", the backends come
+    from the environment (INFERENCE_BACKEND etc.) as in production. Either way the feature
+    index is kept in a temporary directory unless VECTOR_INDEX_DIR is set, so benchmark
+    runs leave no files in the tree. Must run before `config` is imported, since the
+    settings are read at import time.
+
+    Args:
+        models (str): "stub" or "real".
+        batch_latency_ms (float): Simulated cost of a stub forward pass.
+        image_latency_ms (float): Simulated additional cost per image for the stub.
+
+    Raises:
+        RuntimeError: If `config` has already been imported.
+    """
+    if "config" in sys.modules:
+        raise RuntimeError("configure_models must run before config is imported.")
+
+    if "VECTOR_INDEX_DIR" not in os.environ:
+        index_dir = tempfile.mkdtemp(prefix="vector_index-")
+        atexit.register(shutil.rmtree, index_dir, ignore_errors=True)
+        os.environ["VECTOR_INDEX_DIR"] = index_dir
+    if models == "stub":
+        for name in ("INFERENCE_BACKEND", "DISEASE_BACKEND", "VARIETY_BACKEND", "AGE_BACKEND"):
+            os.environ[name] = "stub"
+        os.environ["FUSED_INFERENCE"] = "false"
+
+        from benchmarks.stub_backend import register_stub_backend
+
+        register_stub_backend(batch_latency_ms, image_latency_ms)
+
+
+def load_app(models: str = "stub", **stub_options):
+    """
+    Imports the FastAPI app from `main` against an in-process Mongo stand-in.
+
+    The `db` module's collections and GridFS buckets are replaced before `main` (and with
+    it every router) is imported, so the whole API runs without a MongoDB server.
+
+    Args:
+        models (str): "stub" or "real", see `configure_models`.
+        **stub_options: `batch_latency_ms` / `image_latency_ms` for the stub backend.
+
+    Returns:
+        tuple: (app, fakes) where `fakes` holds the installed fake collections and buckets.
+    """
+    configure_models(models, **stub_options)
+
+    import db
+    from benchmarks.fake_mongo import install_fake_mongo
+
+    fakes = install_fake_mongo(db)
+
+    from main import app
+
+    return app, fakes
+
+
+def load_sample_images(image_dir: str = SAMPLE_DIR) -> list:
+    """
+    Reads the raw bytes of the benchmark images.
+
+    Args:
+        image_dir (str): Directory of sample images.
+
+    Returns:
+        list: (filename, bytes) pairs, sorted by name.
+
+    Raises:
+        FileNotFoundError: If the directory holds no images.
+    """
+    names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+    if not names:
+        raise FileNotFoundError(f"No images found in {image_dir}.")
+
+    images = []
+    for name in names:
+        with open(os.path.join(image_dir, name), "rb") as f:
+            images.append((name, f.read()))
+    return images
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """
+    Summarizes measured latencies.
+
+    Args:
+        latencies (list): Per-operation latencies in seconds.
+        elapsed (float): Wall time of the whole run in seconds.
+        errors (int): Number of failed operations.
+
+    Returns:
+        dict: Count, errors, throughput (per second) and mean/min/p50/p95/p99/max in ms.
+    """
+    values = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {"count": 0, "errors": errors}
+
+    return {
+        "count": int(values.size),
+        "errors": errors,
+        "throughput_per_s": round(values.size / elapsed, 2) if elapsed > 0 else None,
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def run_metadata(**settings) -> dict:
+    """
+    Describes the run, so results from different commits and machines can be told apart.
+
+    Args:
+        **settings: Benchmark parameters to record.
+
+    Returns:
+        dict: Git commit, timestamp, Python/platform details, CPU count and the settings.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "settings": settings,
+    }
+
+
+def write_results(path: str, metadata: dict, results: dict) -> None:
+    """
+    Writes benchmark results as JSON ({"meta": ..., "results": {name: summary}}).
+    """
+    with open(path, "w") as f:
+        json.dump({"meta": metadata, "results": results}, f, indent=2)
+
+
+def print_results(results: dict) -> None:
+    """
+    Prints one line per benchmark with throughput and latency percentiles.
+    """
+    columns = ["count", "errors", "throughput_per_s", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    print("benchmark".ljust(28) + "".join(column.rjust(18) for column in columns))
+    for name, summary in results.items():
+        print(name.ljust(28) + "".join(str(summary.get(c, "")).rjust(18) for c in columns))
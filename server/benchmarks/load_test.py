@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import itertools
+import time
+import httpx
+from benchmarks.harness import (
+    SAMPLE_DIR,
+    STUB_BATCH_LATENCY_MS,
+    STUB_IMAGE_LATENCY_MS,
+    load_app,
+    load_sample_images,
+    print_results,
+    run_metadata,
+    summarize,
+    write_results,
+)
+
+# Endpoints the load test can drive, in the order they run
+SCENARIOS = ["predict", "history", "image"]
+
+# Predictions made before the history and image scenarios when predict is not run
+SEED_PREDICTIONS = 50
+
+
+async def drive(send_request, total: int, concurrency: int) -> dict:
+    """
+    Sends `total` requests from `concurrency` concurrent clients and measures each one.
+
+    Args:
+        send_request (Callable[[int], Awaitable[httpx.Response]]): Sends request number i.
+        total (int): Number of requests.
+        concurrency (int): Number of requests in flight at a time.
+
+    Returns:
+        dict: Summary from `summarize`, plus the count of each status code.
+    """
+    indices = iter(range(total))
+    latencies = []
+    statuses = {}
+    errors = 0
+
+    async def client_loop():
+        nonlocal errors
+        for index in indices:
+            start = time.perf_counter()
+            try:
+                response = await send_request(index)
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except Exception:
+                status, failed = "exception", True
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - start
+    return {**summarize(latencies, elapsed, errors), "statuses": statuses}
+
+
+async def load_test(
+    app,
+    images: list,
+    scenarios: list,
+    requests: int,
+    concurrency: int,
+    unique: bool = True,
+    image_size: str = "original",
+) -> dict:
+    """
+    Drives the API in-process through httpx's ASGI transport.
+
+    The app's lifespan (index creation, engine warm-up, write-behind shutdown) runs
+    around the test, as under uvicorn. Client and server share one event loop and CPU,
+    so results are comparable between commits rather than absolute capacity figures.
+
+    Args:
+        app (FastAPI): The application from `load_app`.
+        images (list): (filename, bytes) pairs to upload.
+        scenarios (list): Names from SCENARIOS to run.
+        requests (int): Requests per scenario.
+        concurrency (int): Concurrent clients per scenario.
+        unique (bool): Make every upload distinct so the prediction cache never hits.
+        image_size (str): Variant requested by the image scenario.
+
+    Returns:
+        dict: Summary per scenario.
+    """
+    upload_numbers = itertools.count()
+    image_ids = []
+    results = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+
+            async def predict(index: int) -> httpx.Response:
+                filename, data = images[index % len(images)]
+                if unique:
+                    # Bytes after the end of the image change the hash but not the pixels
+                    data = data + f"\0benchmark-{next(upload_numbers)}".encode()
+                response = await client.post(
+                    "/api/predict/", files={"file": (filename, data, "image/jpeg")}
+                )
+                if response.status_code == 200:
+                    image_ids.append(response.json()["image_id"])
+                return response
+
+            async def history(index: int) -> httpx.Response:
+                return await client.get("/api/history/", params={"limit": 50})
+
+            async def image(index: int) -> httpx.Response:
+                image_id = image_ids[index % len(image_ids)]
+                return await client.get(f"/api/image/{image_id}", params={"size": image_size})
+
+            if "predict" in scenarios:
+                results["predict"] = await drive(predict, requests, concurrency)
+            elif not image_ids:
+                await drive(predict, SEED_PREDICTIONS, concurrency)
+
+            if "history" in scenarios:
+                results["history"] = await drive(history, requests, concurrency)
+            if "image" in scenarios:
+                name = "image" if image_size == "original" else f"image_{image_size}"
+                results[name] = await drive(image, requests, concurrency)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load-test /api/predict, /api/history and /api/image in-process."
+    )
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--stub-batch-ms", type=float, default=STUB_BATCH_LATENCY_MS)
+    parser.add_argument("--stub-image-ms", type=float, default=STUB_IMAGE_LATENCY_MS)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--image-dir", default=SAMPLE_DIR)
+    parser.add_argument(
+        "--image-size", choices=["original", "thumb", "medium"], default="original"
+    )
+    parser.add_argument(
+        "--allow-cache",
+        action="store_true",
+        help="Upload the sample images as they are, so repeats hit the prediction cache.",
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    benchmark_app, _ = load_app(
+        args.models,
+        batch_latency_ms=args.stub_batch_ms,
+        image_latency_ms=args.stub_image_ms,
+    )
+    sample_images = load_sample_images(args.image_dir)
+
+    result = asyncio.run(
+        load_test(
+            benchmark_app,
+            sample_images,
+            args.scenarios,
+            args.requests,
+            args.concurrency,
+            unique=not args.allow_cache,
+            image_size=args.image_size,
+        )
+    )
+    print_results(result)
+
+    if args.json:
+        write_results(args.json, run_metadata(**vars(args)), result)
@@ -0,0 +1,122 @@
+import argparse
+import time
+from io import BytesIO
+from benchmarks.harness import (
+    SAMPLE_DIR,
+    STUB_BATCH_LATENCY_MS,
+    STUB_IMAGE_LATENCY_MS,
+    configure_models,
+    load_sample_images,
+    print_results,
+    run_metadata,
+    summarize,
+    write_results,
+)
+
+# Benchmarks that need the models; the others only exercise image processing
+MODEL_BENCHMARKS = {"classify_disease", "identify_variety", "estimate_age"}
+
+
+def time_calls(fn, repeat: int, warmup: int) -> dict:
+    """
+    Calls `fn` repeatedly and summarizes the per-call latency.
+
+    Args:
+        fn (Callable[[], Any]): The operation to measure.
+        repeat (int): Number of measured calls.
+        warmup (int): Number of unmeasured calls made first.
+
+    Returns:
+        dict: Summary from `summarize`; throughput is calls per second.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def build_benchmarks(contents: bytes, batch_size: int, with_models: bool) -> dict:
+    """
+    Builds the micro-benchmarks for one sample image.
+
+    Args:
+        contents (bytes): Raw bytes of the sample image.
+        batch_size (int): Number of images for the batched preprocessing benchmark.
+        with_models (bool): Whether to include the classifier functions.
+
+    Returns:
+        dict: Benchmark name -> zero-argument callable.
+    """
+    from PIL import Image
+    from utils.image_decoder import decode_image
+    from utils.image_preprocessor import (
+        preprocess_batch,
+        preprocess_image,
+        preprocess_image_multi,
+    )
+    from utils.prediction_cache import hash_contents
+
+    image = decode_image(contents)
+    batch = [image] * batch_size
+
+    benchmarks = {
+        "hash_contents": lambda: hash_contents(contents),
+        "pil_open_load": lambda: Image.open(BytesIO(contents)).load(),
+        "decode_image": lambda: decode_image(contents),
+        "decode_image_draft_256": lambda: decode_image(contents, (256, 256)),
+        "preprocess_image_256": lambda: preprocess_image(image, 256, 256, normalize=False),
+        "preprocess_image_128": lambda: preprocess_image(image, 128, 128, normalize=False),
+        "preprocess_image_multi": lambda: preprocess_image_multi(
+            image, [(256, 256), (128, 128)], normalize=False
+        ),
+        f"preprocess_batch_256_x{batch_size}": lambda: preprocess_batch(batch, 256, 256),
+    }
+
+    if with_models:
+        from utils.disease_classifier import classify_disease
+        from utils.variety_identifier import identify_variety
+        from utils.age_estimator import estimate_age
+
+        benchmarks["classify_disease"] = lambda: classify_disease(image)
+        benchmarks["identify_variety"] = lambda: identify_variety(image)
+        benchmarks["estimate_age"] = lambda: estimate_age(image)
+
+    return benchmarks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark decoding, preprocessing and the classifier functions."
+    )
+    parser.add_argument("--models", choices=["stub", "real", "none"], default="stub")
+    parser.add_argument("--stub-batch-ms", type=float, default=STUB_BATCH_LATENCY_MS)
+    parser.add_argument("--stub-image-ms", type=float, default=STUB_IMAGE_LATENCY_MS)
+    parser.add_argument("--image-dir", default=SAMPLE_DIR)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.models != "none":
+        configure_models(args.models, args.stub_batch_ms, args.stub_image_ms)
+
+    _, sample = load_sample_images(args.image_dir)[0]
+    selected = build_benchmarks(sample, args.batch_size, with_models=args.models != "none")
+    if args.only:
+        selected = {name: fn for name, fn in selected.items() if name in args.only}
+
+    result = {}
+    for benchmark_name, benchmark in selected.items():
+        result[benchmark_name] = time_calls(benchmark, args.repeat, args.warmup)
+    print_results(result)
+
+    if args.json:
+        write_results(args.json, run_metadata(**vars(args)), result)
@@ -0,0 +1,69 @@
+import os
+import time
+import numpy as np
+from utils.backends import BACKENDS, BACKEND_FILE_SUFFIXES, InferenceBackend
+
+# Number of output classes of each model, by model file stem
+STUB_NUM_CLASSES = {
+    "disease_classification_model": 10,
+    "variety_identification_model": 10,
+    "age_prediction_model": 18,
+}
+
+
+class StubBackend(InferenceBackend):
+    """
+    Stands in for a model so the API can be benchmarked without TensorFlow or model files.
+
+    Returns a deterministic softmax over the model's classes derived from each image's
+    mean pixel value, after sleeping for a fixed cost per batch plus a cost per image, so
+    batching behaves like a real model whose forward pass releases the GIL.
+
+    Args:
+        model_path (str): Path of the model it replaces; only the file stem is used.
+    """
+
+    kind = "stub"
+
+    # Simulated forward pass cost, set by `register_stub_backend`
+    batch_latency_ms = 0.0
+    image_latency_ms = 0.0
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        stem = os.path.basename(model_path)
+        stem = stem[: -len(BACKEND_FILE_SUFFIXES["stub"])] if stem.endswith(".stub") else stem
+        self.num_classes = STUB_NUM_CLASSES.get(stem, 10)
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        delay = self.batch_latency_ms + self.image_latency_ms * len(input_batch)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        means = np.asarray(input_batch, dtype=np.float32).mean(axis=(1, 2, 3)) / 255.0
+        logits = np.cos(np.outer(means * 10.0, np.arange(1, self.num_classes + 1)))
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def predict_with_features(self, input_batch: np.ndarray) -> tuple:
+        # Mean colour of each cell of a 4x4 grid, so similar-looking images get similar features
+        batch = np.asarray(input_batch, dtype=np.float32)
+        n, height, width, channels = batch.shape
+        cells = batch[:, : height // 4 * 4, : width // 4 * 4].reshape(
+            n, 4, height // 4, 4, width // 4, channels
+        )
+        return self.predict(input_batch), cells.mean(axis=(2, 4)).reshape(n, -1) / 255.0
+
+
+def register_stub_backend(batch_latency_ms: float = 0.0, image_latency_ms: float = 0.0) -> None:
+    """
+    Makes the "stub" backend available to `load_backend`.
+
+    Args:
+        batch_latency_ms (float): Simulated fixed cost of every forward pass.
+        image_latency_ms (float): Simulated additional cost per image in a batch.
+    """
+    StubBackend.batch_latency_ms = batch_latency_ms
+    StubBackend.image_latency_ms = image_latency_ms
+    BACKEND_FILE_SUFFIXES["stub"] = ".stub"
+    BACKENDS["stub"] = StubBackend
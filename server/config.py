@@ -0,0 +1,176 @@
+from dotenv import load_dotenv
+import os
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Maximum number of images grouped into a single forward pass per model
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+
+# Maximum time (in milliseconds) a request waits for others to join its batch
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+# Number of threads dedicated to running model forward passes
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# Number of threads dedicated to image decoding and preprocessing
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Maximum number of prediction results kept in the in-process content-hash cache
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "4096"))
+
+# Maximum total size (in bytes) of the results kept in the content-hash cache
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Maximum number of images accepted by one batch prediction request
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+# Largest zip archive accepted by the batch prediction route (each extracted image is still
+# limited to MAX_UPLOAD_BYTES)
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", str(256 * 1024 * 1024)))
+
+# Number of images of a batch request processed concurrently
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "32"))
+
+# Number of prediction records written per bulk insert
+BATCH_INSERT_SIZE = int(os.getenv("BATCH_INSERT_SIZE", "50"))
+
+# Run the three models as one fused TensorFlow graph for the combined predict route
+FUSED_INFERENCE = os.getenv("FUSED_INFERENCE", "false").lower() in ("1", "true", "yes")
+
+# Directory of the server code, against which relative paths below are resolved
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Directory containing the model files
+MODELS_DIR = os.path.join(SERVER_DIR, os.getenv("MODELS_DIR", "models"))
+
+# Inference backend for all models: keras, tflite, tflite-int8 or onnx
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+
+# Per-model overrides of the inference backend
+DISEASE_BACKEND = os.getenv("DISEASE_BACKEND", INFERENCE_BACKEND)
+VARIETY_BACKEND = os.getenv("VARIETY_BACKEND", INFERENCE_BACKEND)
+AGE_BACKEND = os.getenv("AGE_BACKEND", INFERENCE_BACKEND)
+
+# Number of threads used by each TFLite interpreter / ONNX Runtime session
+BACKEND_NUM_THREADS = int(os.getenv("BACKEND_NUM_THREADS", "0")) or None
+
+# Address of a separate model server ("host:port" or a Unix socket path). When set, API
+# workers load no models and send preprocessed tensors to that process instead
+MODEL_SERVER_ADDRESS = os.getenv("MODEL_SERVER_ADDRESS", "")
+
+# Shared secret that API workers use to authenticate to the model server. There is no
+# default: the server and its clients refuse to start without one
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")
+
+# Let the model server listen on a TCP address other than the loopback interface
+MODEL_SERVER_ALLOW_REMOTE = os.getenv("MODEL_SERVER_ALLOW_REMOTE", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Connections (each with its own shared-memory buffer) an API worker opens to the model server
+MODEL_SERVER_CONNECTIONS = int(os.getenv("MODEL_SERVER_CONNECTIONS", str(INFERENCE_WORKERS)))
+
+# When models are loaded: "background" (concurrently after start-up, serving once ready),
+# "eager" (concurrently, before the app accepts requests) or "lazy" (on first use)
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background").lower()
+
+# Trace and run every model at start-up so the first requests do not pay that cost
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Batch sizes exercised during warm-up (defaults to powers of two up to the max batch size)
+WARMUP_BATCH_SIZES = [
+    int(size)
+    for size in os.getenv(
+        "WARMUP_BATCH_SIZES",
+        ",".join(
+            str(2**i)
+            for i in range(INFERENCE_MAX_BATCH_SIZE.bit_length())
+            if 2**i <= INFERENCE_MAX_BATCH_SIZE
+        ),
+    ).split(",")
+    if size.strip()
+]
+
+# Sample images run through each model during warm-up (zeros are used if there are none)
+MODEL_WARMUP_IMAGES_DIR = os.path.join(
+    SERVER_DIR, os.getenv("MODEL_WARMUP_IMAGES_DIR", "../scripts/data")
+)
+
+# Token expected in the X-Admin-Token header of the model admin routes; they are disabled
+# when it is not set
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+# Generate the history thumbnail in the background once an upload is stored
+THUMBNAIL_ON_UPLOAD = os.getenv("THUMBNAIL_ON_UPLOAD", "true").lower() in ("1", "true", "yes")
+
+# Respond before the upload and prediction record are written, flushing them in the background
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+
+# Maximum bytes of images and records waiting to be written before requests are held back
+WRITE_BEHIND_MAX_BYTES = int(os.getenv("WRITE_BEHIND_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Maximum number of records waiting to be written before requests are held back
+WRITE_BEHIND_MAX_ITEMS = int(os.getenv("WRITE_BEHIND_MAX_ITEMS", "10000"))
+
+# Maximum number of records written per insert_many
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+
+# Time (in milliseconds) the flusher waits for more records before writing a batch
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+
+# Time (in seconds) a failing write is retried with backoff before it is given up; long
+# enough to ride out a MongoDB replica set failover
+WRITE_BEHIND_RETRY_SECONDS = float(os.getenv("WRITE_BEHIND_RETRY_SECONDS", "300"))
+
+# Maximum number of inference requests processed at once; later ones wait in the admission queue
+ADMISSION_MAX_INFLIGHT = int(
+    os.getenv("ADMISSION_MAX_INFLIGHT", str(2 * INFERENCE_WORKERS * INFERENCE_MAX_BATCH_SIZE))
+)
+
+# Maximum number of inference requests waiting for admission before new ones are rejected
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+
+# Maximum total upload bytes held by admitted inference requests
+ADMISSION_MAX_BYTES = int(os.getenv("ADMISSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Time (in milliseconds) from arrival within which an inference request must be answered, or
+# it is shed while queued or cut off while decoding and running inference
+ADMISSION_DEADLINE_MS = float(os.getenv("ADMISSION_DEADLINE_MS", "30000"))
+
+# Admit the single-model routes ahead of the full prediction route when requests are queued
+ADMISSION_PRIORITY = os.getenv("ADMISSION_PRIORITY", "true").lower() in ("1", "true", "yes")
+
+# Largest accepted upload (in bytes); larger files are rejected before decoding
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Largest accepted image (in pixels), checked from the header before decoding
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+
+# Let the JPEG decoder downscale (DCT scaling) to the smallest size the models need
+JPEG_DRAFT_DECODE = os.getenv("JPEG_DRAFT_DECODE", "true").lower() in ("1", "true", "yes")
+
+# Server-Timing header with per-stage durations: "request" adds it to responses of requests
+# sending `X-Server-Timing: 1`, "true" adds it to every response and "false" never does
+SERVER_TIMING = os.getenv("SERVER_TIMING", "request").lower()
+
+# Number of recent prediction events kept for history stream clients resuming with Last-Event-ID
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+
+# Maximum number of undelivered events per history stream client before it is told to reset
+EVENT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+# Interval (in seconds) between heartbeats on an idle history stream
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+# Keep the disease model's penultimate-layer features of every new image for similarity search
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "false").lower() in ("1", "true", "yes")
+
+# Directory of the feature index, with one sub-directory per disease model version; relative
+# paths are resolved against the server directory
+VECTOR_INDEX_DIR = os.path.join(SERVER_DIR, os.getenv("VECTOR_INDEX_DIR", "vector_index"))
+
+# Number of clusters scanned per query once the index is clustered (tools.build_vector_index)
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
@@ -17,5 +17,31 @@ db = client["paddy_scanner_ai"]
 # GridFS bucket for storing uploaded images
 fs = AsyncIOMotorGridFSBucket(db, bucket_name="images")
 
+# GridFS bucket for resized variants (thumbnails) of uploaded images
+thumbnail_fs = AsyncIOMotorGridFSBucket(db, bucket_name="thumbnails")
+
 # Collection for prediction results (metadata)
 prediction_collection = db["predictions"]
+
+# Collection of per-day prediction statistics, maintained incrementally
+stats_collection = db["prediction_daily_stats"]
+
+
+async def ensure_indexes():
+    """
+    Create the indexes the API relies on. Safe to call on every start-up.
+    """
+    # Lookup of previous predictions for a repeated upload
+    await prediction_collection.create_index("content_hash")
+
+    # Keyset-paginated history, newest first, optionally filtered by class
+    await prediction_collection.create_index([("timestamp", -1), ("_id", -1)])
+    await prediction_collection.create_index(
+        [("disease.result", 1), ("timestamp", -1), ("_id", -1)]
+    )
+    await prediction_collection.create_index(
+        [("variety.result", 1), ("timestamp", -1), ("_id", -1)]
+    )
+
+    # Records of the images returned by similarity search
+    await prediction_collection.create_index("image_id")
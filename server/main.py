@@ -1,15 +1,38 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Routers for different endpoints
 from routers.predict import router as predict_router
 from routers.history import router as history_router
 from routers.image import router as image_router
+from routers.stats import router as stats_router
+from routers.health import router as health_router
+from routers.models import router as models_router
+from routers.similar import router as similar_router
+from utils.inference_engine import start_engine, shutdown_engine
+from utils.write_behind import write_behind_queue
+from utils.metrics import MetricsMiddleware, metrics_response
+from db import ensure_indexes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: start-up and shutdown hooks for background services.
+    """
+    await ensure_indexes()
+    await start_engine()
+    yield
+    await write_behind_queue.close()
+    await shutdown_engine()
+
 
 app = FastAPI(
     title="PaddyScannerAI API",
     description="AI-powered backend for paddy disease classification, variety identification, and age prediction.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware to allow requests from the frontend
@@ -19,14 +42,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Request counters, latency histograms and the optional Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Include API routers
 app.include_router(predict_router, prefix="/api/predict", tags=["Predict"])
 app.include_router(history_router, prefix="/api/history", tags=["History"])
 app.include_router(image_router, prefix="/api/image", tags=["Image"])
+app.include_router(stats_router, prefix="/api/stats", tags=["Stats"])
+app.include_router(health_router, prefix="/health", tags=["Health"])
+app.include_router(models_router, prefix="/api/models", tags=["Models"])
+app.include_router(similar_router, prefix="/api/similar", tags=["Similar"])
 
 
 @app.get("/")
 async def root():
     return {"message": "PaddyScannerAI API is running."}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Expose request, stage, model and queue metrics in the Prometheus text format.
+    """
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,248 @@
+import argparse
+import os
+import sys
+import threading
+import traceback
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Listener
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from config import (
+    AGE_BACKEND,
+    DISEASE_BACKEND,
+    FUSED_INFERENCE,
+    MODEL_SERVER_ADDRESS,
+    MODEL_SERVER_ALLOW_REMOTE,
+    MODEL_SERVER_AUTHKEY,
+    MODEL_WARMUP,
+    VARIETY_BACKEND,
+    WARMUP_BATCH_SIZES,
+)
+from utils.backends import load_backend
+from utils.model_server_client import LOOPBACK_HOSTS, parse_address, require_authkey
+from utils.disease_classifier import DISEASE_CLASSIFICATION_MODEL_NAME, DISEASE_INPUT_SIZE
+from utils.variety_identifier import VARIETY_IDENTIFICATION_MODEL_NAME, VARIETY_INPUT_SIZE
+from utils.age_estimator import AGE_PREDICTION_MODEL_NAME, AGE_INPUT_SIZE
+
+# Address used when neither --address nor MODEL_SERVER_ADDRESS is given
+DEFAULT_ADDRESS = "127.0.0.1:8500"
+
+# Models served (file stem -> backend and input (width, height)), in the order the fused
+# graph expects them
+SERVED_MODELS = {
+    DISEASE_CLASSIFICATION_MODEL_NAME: (DISEASE_BACKEND, DISEASE_INPUT_SIZE),
+    VARIETY_IDENTIFICATION_MODEL_NAME: (VARIETY_BACKEND, VARIETY_INPUT_SIZE),
+    AGE_PREDICTION_MODEL_NAME: (AGE_BACKEND, AGE_INPUT_SIZE),
+}
+
+
+def attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Maps a shared-memory segment created by an API worker.
+
+    The worker owns and unlinks the segment, so it is detached from this process's
+    resource tracker, which would otherwise unlink it when the model server exits.
+
+    Args:
+        name (str): Segment name sent by the client.
+
+    Returns:
+        SharedMemory: The attached segment.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+
+    segment = SharedMemory(name=name)
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def check_listen_address(address: str, allow_remote: bool = MODEL_SERVER_ALLOW_REMOTE):
+    """
+    Parses the address to listen on, refusing TCP addresses reachable from other hosts
+    unless `allow_remote` is set.
+
+    Args:
+        address (str): "host:port" or a Unix socket path.
+        allow_remote (bool): Whether a non-loopback TCP address may be used.
+
+    Returns:
+        tuple or str: The parsed address, see `parse_address`.
+
+    Raises:
+        ValueError: If the address is not local and remote clients are not allowed.
+    """
+    listen_address = parse_address(address)
+    if isinstance(listen_address, tuple) and listen_address[0] not in LOOPBACK_HOSTS:
+        if not allow_remote:
+            raise ValueError(
+                f"Refusing to listen on {address}: set MODEL_SERVER_ALLOW_REMOTE=true to "
+                "accept connections from other hosts."
+            )
+    return listen_address
+
+
+class ModelServer:
+    """
+    Owns the models and serves forward passes to API workers over `multiprocessing.connection`.
+
+    Each client connection is handled by its own thread and carries one request at a time.
+    A request names a shared-memory segment holding the input tensor; the tensor is read in
+    place, and only the (small) model output is sent back over the socket. The segment
+    stays mapped between requests, since clients reuse one buffer per connection.
+
+    Args:
+        models (dict): Model file stem -> loaded `InferenceBackend`.
+        fused_predictor (Callable[[np.ndarray], tuple], optional): Fused three-model graph.
+    """
+
+    def __init__(self, models: dict, fused_predictor=None):
+        self.models = models
+        self.fused_predictor = fused_predictor
+
+    def _run(self, operation: str, model_name: str, input_array: np.ndarray):
+        if operation == "predict":
+            if model_name not in self.models:
+                raise KeyError(f"Model '{model_name}' is not served.")
+            return np.asarray(self.models[model_name].predict(input_array))
+        if operation == "predict_features":
+            if model_name not in self.models:
+                raise KeyError(f"Model '{model_name}' is not served.")
+            probabilities, features = self.models[model_name].predict_with_features(input_array)
+            return np.asarray(probabilities), None if features is None else np.asarray(features)
+        if operation == "fused":
+            if self.fused_predictor is None:
+                raise RuntimeError("Fused inference is not enabled on the model server.")
+            return tuple(
+                None if output is None else np.asarray(output)
+                for output in self.fused_predictor(input_array)
+            )
+        raise ValueError(f"Unknown operation '{operation}'.")
+
+    def handle_connection(self, connection) -> None:
+        """
+        Answers requests from one client until it disconnects.
+        """
+        segment = None
+        try:
+            while True:
+                try:
+                    operation, model_name, segment_name, shape, dtype = connection.recv()
+                except EOFError:
+                    break
+
+                try:
+                    if segment is None or segment.name != segment_name:
+                        if segment is not None:
+                            segment.close()
+                            segment = None
+                        segment = attach_shared_memory(segment_name)
+
+                    input_array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+                    try:
+                        reply = ("ok", self._run(operation, model_name, input_array))
+                    finally:
+                        del input_array
+                except Exception as e:
+                    traceback.print_exc()
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                connection.send(reply)
+        except (ConnectionError, OSError):
+            traceback.print_exc()
+        finally:
+            connection.close()
+            if segment is not None:
+                segment.close()
+
+    def serve_forever(
+        self, address: str, authkey: str, allow_remote: bool = MODEL_SERVER_ALLOW_REMOTE
+    ) -> None:
+        """
+        Accepts client connections, handling each on a daemon thread.
+
+        Clients send pickled messages, so the listener is restricted: a shared secret is
+        required, a Unix socket is only accessible to its owner, and a TCP address must be
+        on the loopback interface unless `allow_remote` is set.
+
+        Args:
+            address (str): "host:port" or a Unix socket path.
+            authkey (str): Shared secret the clients must present.
+            allow_remote (bool): Whether a non-loopback TCP address may be used.
+
+        Raises:
+            ValueError: If no authkey is set, or the address is not local and remote
+                clients are not allowed.
+        """
+        key = require_authkey(authkey)
+        listen_address = check_listen_address(address, allow_remote)
+        if isinstance(listen_address, str) and os.path.exists(listen_address):
+            # Socket file left behind by a model server that was killed
+            os.remove(listen_address)
+
+        with Listener(listen_address, authkey=key) as listener:
+            if isinstance(listen_address, str):
+                os.chmod(listen_address, 0o600)
+            print(f"Model server listening on {address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception:
+                    # Failed handshakes (e.g. a wrong authkey) only affect that client
+                    traceback.print_exc()
+                    continue
+                threading.Thread(
+                    target=self.handle_connection, args=(connection,), daemon=True
+                ).start()
+
+
+def load_models(fused: bool = FUSED_INFERENCE, warmup: bool = MODEL_WARMUP) -> ModelServer:
+    """
+    Loads every served model with its configured backend.
+
+    Args:
+        fused (bool): Also build the fused three-model graph.
+        warmup (bool): Run each model once per warm-up batch size before serving.
+
+    Returns:
+        ModelServer: Server holding the loaded models.
+    """
+    models = {name: load_backend(name, backend) for name, (backend, _) in SERVED_MODELS.items()}
+
+    fused_predictor = None
+    if fused:
+        from utils.fused_model import build_fused_predictor
+
+        fused_predictor = build_fused_predictor(
+            *models.values(), *(size for _, size in SERVED_MODELS.values())
+        )
+
+    if warmup:
+        batch_sizes = sorted(set(WARMUP_BATCH_SIZES)) or [1]
+        for name, (_, input_size) in SERVED_MODELS.items():
+            models[name].warmup(input_size, batch_sizes)
+        if fused_predictor is not None:
+            width, height = DISEASE_INPUT_SIZE
+            fused_predictor(np.zeros((height, width, 3), dtype=np.uint8))
+
+    return ModelServer(models, fused_predictor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve the models to API workers over shared memory."
+    )
+    parser.add_argument(
+        "--address",
+        default=MODEL_SERVER_ADDRESS or DEFAULT_ADDRESS,
+        help='"host:port" or a Unix socket path.',
+    )
+    args = parser.parse_args()
+
+    # Check the listener settings before spending time loading the models
+    try:
+        require_authkey(MODEL_SERVER_AUTHKEY)
+        check_listen_address(args.address)
+    except ValueError as e:
+        parser.error(str(e))
+
+    load_models().serve_forever(args.address, MODEL_SERVER_AUTHKEY)
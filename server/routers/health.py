@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from utils.inference_engine import is_engine_ready
+from utils.model_registry import model_registry
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def liveness():
+    """
+    Report that the process is up and serving requests, whether or not the models are loaded.
+
+    Returns:
+        JSON: {status: "ok"}
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Report whether the models are loaded and warm, so the instance can receive traffic.
+
+    Responds with 503 while models are still loading or when one failed to load.
+
+    Returns:
+        JSON: {
+            status: "ready" | "loading" | "failed",
+            loading_mode: str,
+            models: {name: {state: str, backend: str, load_ms: float, memory_bytes: int, error: str}}
+        }
+    """
+    models = model_registry.stats()
+    if is_engine_ready():
+        status = "ready"
+    elif any(model["state"] == "failed" for model in models.values()):
+        status = "failed"
+    else:
+        status = "loading"
+
+    content = {"status": status, "loading_mode": model_registry.mode, "models": models}
+    return JSONResponse(status_code=200 if status == "ready" else 503, content=content)
@@ -1,39 +1,291 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
 from db import prediction_collection
 from datetime import datetime
+from typing import Optional
+from utils.event_bus import prediction_events
+from config import EVENT_HEARTBEAT_SECONDS
+import asyncio
+import base64
 
 router = APIRouter()
 
+# Fields returned for each history entry
+HISTORY_PROJECTION = {
+    "image_id": 1,
+    "filename": 1,
+    "disease": 1,
+    "variety": 1,
+    "age": 1,
+    "timestamp": 1,
+}
+
+# Time (in milliseconds) EventSource clients wait before reconnecting to the stream
+STREAM_RETRY_MS = 3000
+
+# Sort order of the history; also the key used for cursor pagination
+HISTORY_SORT = [("timestamp", -1), ("_id", -1)]
+
+
+def history_entry(doc: dict) -> dict:
+    """
+    Format a prediction record as a history entry.
+
+    Args:
+        doc (dict): The prediction record (at least the HISTORY_PROJECTION fields).
+
+    Returns:
+        dict: Record ID, image ID and URLs, filename, predictions and ISO 8601 timestamp.
+    """
+    return {
+        "id": str(doc.get("_id")),
+        "image_id": str(doc.get("image_id")),
+        "image_url": f"/api/image/{doc.get('image_id')}",
+        "thumbnail_url": f"/api/image/{doc.get('image_id')}?size=thumb",
+        "filename": doc.get("filename"),
+        "disease": doc.get("disease"),
+        "variety": doc.get("variety"),
+        "age": doc.get("age"),
+        "timestamp": (
+            doc.get("timestamp").isoformat()
+            if isinstance(doc.get("timestamp"), datetime)
+            else None
+        ),
+    }
+
+
+def publish_predictions(records: list) -> None:
+    """
+    Push newly saved prediction records to the clients of the history stream.
+
+    Args:
+        records (list): The prediction records, in the order they were saved.
+    """
+    for record in records:
+        prediction_events.publish("prediction", history_entry(record))
+
+
+def encode_cursor(timestamp: datetime, doc_id: ObjectId) -> str:
+    """
+    Encode the sort key of the last returned record into an opaque pagination cursor.
+
+    Args:
+        timestamp (datetime): Timestamp of the last record on the page.
+        doc_id (ObjectId): `_id` of the last record on the page.
+
+    Returns:
+        str: URL-safe cursor string.
+    """
+    raw = f"{timestamp.isoformat()}|{doc_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a pagination cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple: (timestamp, ObjectId) of the last record of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, _, doc_id = base64.urlsafe_b64decode(padded).decode().partition("|")
+        return datetime.fromisoformat(timestamp), ObjectId(doc_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def build_history_query(
+    disease: Optional[str],
+    variety: Optional[str],
+    age_min: Optional[int],
+    age_max: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    cursor: Optional[str],
+) -> dict:
+    """
+    Build the MongoDB filter for a page of prediction history.
+
+    Args:
+        disease (str, optional): Exact predicted disease.
+        variety (str, optional): Exact predicted variety.
+        age_min (int, optional): Minimum predicted age in days (inclusive).
+        age_max (int, optional): Maximum predicted age in days (inclusive).
+        date_from (datetime, optional): Earliest timestamp (inclusive).
+        date_to (datetime, optional): Latest timestamp (exclusive).
+        cursor (str, optional): Cursor of the previous page.
+
+    Returns:
+        dict: The query document.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = {}
+    if disease:
+        query["disease.result"] = disease
+    if variety:
+        query["variety.result"] = variety
+
+    age_range = {}
+    if age_min is not None:
+        age_range["$gte"] = age_min
+    if age_max is not None:
+        age_range["$lte"] = age_max
+    if age_range:
+        query["age.result"] = age_range
+
+    time_range = {}
+    if date_from is not None:
+        time_range["$gte"] = date_from
+    if date_to is not None:
+        time_range["$lt"] = date_to
+    if time_range:
+        query["timestamp"] = time_range
+
+    if cursor:
+        last_timestamp, last_id = decode_cursor(cursor)
+        query = {
+            "$and": [
+                query,
+                {
+                    "$or": [
+                        {"timestamp": {"$lt": last_timestamp}},
+                        {"timestamp": last_timestamp, "_id": {"$lt": last_id}},
+                    ]
+                },
+            ]
+        }
+
+    return query
+
 
 @router.get("/")
-async def get_prediction_history(limit: int = Query(50, ge=1, le=100)):
+async def get_prediction_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    disease: Optional[str] = Query(None),
+    variety: Optional[str] = Query(None),
+    age_min: Optional[int] = Query(None, ge=0),
+    age_max: Optional[int] = Query(None, ge=0),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+):
     """
-    Retrieve the most recent prediction records from MongoDB.
+    Retrieve prediction records from MongoDB, newest first, one page at a time.
+
+    Pages are keyset-paginated on (timestamp, _id), so every page is an index range scan
+    no matter how deep it is. When more records are available, the cursor for the next
+    page is returned in the `X-Next-Cursor` response header.
 
     Args:
         limit (int): Number of records to return (max 100).
+        cursor (str, optional): Value of `X-Next-Cursor` from the previous page.
+        disease (str, optional): Only records with this predicted disease.
+        variety (str, optional): Only records with this predicted variety.
+        age_min (int, optional): Only records with predicted age >= age_min days.
+        age_max (int, optional): Only records with predicted age <= age_max days.
+        date_from (datetime, optional): Only records at or after this time (ISO 8601).
+        date_to (datetime, optional): Only records before this time (ISO 8601).
 
     Returns:
         List of dicts: Each includes image metadata, predictions, and timestamp.
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid.
     """
-    cursor = prediction_collection.find().sort("timestamp", -1).limit(limit)
+    try:
+        query = build_history_query(
+            disease, variety, age_min, age_max, date_from, date_to, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    docs = (
+        prediction_collection.find(query, projection=HISTORY_PROJECTION)
+        .sort(HISTORY_SORT)
+        .limit(limit + 1)
+    )
     results = []
+    last_doc = None
 
-    async for doc in cursor:
-        results.append(
-            {
-                "image_id": str(doc.get("image_id")),
-                "image_url": f"/api/image/{doc.get('image_id')}",
-                "filename": doc.get("filename"),
-                "disease": doc.get("disease"),
-                "variety": doc.get("variety"),
-                "age": doc.get("age"),
-                "timestamp": (
-                    doc.get("timestamp").isoformat()
-                    if isinstance(doc.get("timestamp"), datetime)
-                    else None
-                ),
-            }
-        )
+    async for doc in docs:
+        if len(results) == limit:
+            if isinstance(last_doc.get("timestamp"), datetime):
+                response.headers["X-Next-Cursor"] = encode_cursor(
+                    last_doc["timestamp"], last_doc["_id"]
+                )
+            break
+
+        last_doc = doc
+        results.append(history_entry(doc))
 
     return results
+
+
+@router.get("/stream")
+async def stream_prediction_history(
+    request: Request,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Stream new prediction records as server-sent events, so clients can prepend them to a
+    page of history fetched once instead of re-fetching it after every prediction.
+
+    Each record is sent once, as a "prediction" event whose data is a history entry. A
+    comment line is sent as a heartbeat when the stream has been idle for
+    EVENT_HEARTBEAT_SECONDS. A client that reconnects with the ID of the last event it
+    received (the Last-Event-ID header, which EventSource sends automatically, or the
+    `last_event_id` query parameter) first receives the records it missed. When they can
+    no longer be replayed, e.g. after a restart, or that falls too far behind, is sent a
+    "reset" event instead and should re-fetch the history; the stream then carries on
+    with new records.
+
+    The feed is per server process: with several workers, a client only sees predictions
+    made by the worker its stream is connected to.
+
+    Args:
+        last_event_id (str, optional): ID of the last event received.
+        last_event_id_header (str, optional): Same, from the Last-Event-ID header.
+
+    Returns:
+        text/event-stream: "prediction" and "reset" events.
+    """
+    async def events():
+        queue = prediction_events.subscribe(last_event_id_header or last_event_id)
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if message is None:
+                    yield "event: reset\ndata: {}\n\n"
+                    queue = prediction_events.subscribe()
+                    continue
+                event_id, event, data = message
+                yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+        finally:
+            prediction_events.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,34 +1,191 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from bson import ObjectId
+from bson.errors import InvalidId
+from email.utils import format_datetime
+from utils.image_decoder import ImageDecodeError
+from utils.image_store import IMAGE_VARIANTS, guess_content_type, open_image_variant
+from utils.write_behind import write_behind_queue
 from db import fs
 import gridfs
-import io
 
 router = APIRouter()
 
+# Image IDs never change, so responses can be cached forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def parse_range(range_header: str, length: int):
+    """
+    Parse a single-range HTTP `Range` header.
+
+    Args:
+        range_header (str): Header value such as "bytes=0-1023", "bytes=1024-" or "bytes=-500".
+        length (int): Total size of the file in bytes.
+
+    Returns:
+        tuple or None: Inclusive (start, end) byte positions, or None if the header is not a
+            single byte range (the full file should then be served).
+
+    Raises:
+        ValueError: If the range cannot be satisfied for a file of this length.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError("Empty suffix range")
+            start, end = max(0, length - suffix), length - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else length - 1
+    except ValueError:
+        if start_text == "" and end_text.isdigit():
+            raise
+        return None
+
+    end = min(end, length - 1)
+    if start >= length or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def stream_grid_file(grid_out, start: int, end: int):
+    """
+    Yield a byte range of a GridFS file chunk by chunk without buffering the whole file.
+
+    Args:
+        grid_out: An open Motor GridOut.
+        start (int): First byte to send.
+        end (int): Last byte to send (inclusive).
+
+    Yields:
+        bytes: Consecutive pieces of the requested range.
+    """
+    grid_out.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await grid_out.read(min(grid_out.chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def stream_bytes(data: bytes, start: int, end: int):
+    """
+    Yield a byte range of an in-memory image.
+    """
+    yield data[start : end + 1]
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Check whether an `If-None-Match` / `If-Range` header value matches the ETag.
+    """
+    if header is None:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
 
 @router.get("/{image_id}")
-async def get_image(image_id: str):
+async def get_image(
+    image_id: str,
+    request: Request,
+    size: str = Query("original", pattern=f"^(original|{'|'.join(IMAGE_VARIANTS)})$"),
+):
     """
     Retrieve an uploaded paddy image by its ID from GridFS.
 
+    With `size=thumb` or `size=medium`, a downscaled JPEG variant is served instead of the
+    original upload. Variants are stored in a separate GridFS bucket; a missing variant is
+    generated from the original on first request.
+
+    The image is streamed from GridFS chunk by chunk with its stored content type and
+    length. Single byte ranges are supported through the `Range` header. Because image IDs
+    never change, responses carry an immutable `Cache-Control` and an ETag derived from
+    the ID, and a matching `If-None-Match` is answered with 304 without touching GridFS.
+
     Args:
         image_id (str): The ObjectId of the image in GridFS.
+        size (str): "original" (default) or a variant name such as "thumb" or "medium".
 
     Returns:
-        StreamingResponse: Image file stream if found.
+        StreamingResponse: Image file stream (200, or 206 for a range request) if found.
 
     Raises:
-        HTTPException: 404 if the image is not found or 400 if invalid ID.
+        HTTPException: 404 if the image is not found, 400 if invalid ID, 422 if a variant
+            is requested for an image that cannot be decoded, or 416 if the requested range
+            cannot be satisfied.
     """
     try:
         file_id = ObjectId(image_id)
-        grid_out = await fs.open_download_stream(file_id)
-        content = await grid_out.read()
-        return StreamingResponse(io.BytesIO(content), media_type="image/jpeg")
-
-    except gridfs.errors.NoFile:
-        raise HTTPException(status_code=404, detail="Image not found.")
-    except Exception:
+    except (InvalidId, TypeError):
         raise HTTPException(status_code=400, detail="Invalid image ID.")
+
+    etag = f'"{image_id}"' if size == "original" else f'"{image_id}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    pending = write_behind_queue.get_pending_image(file_id)
+    if pending is not None and size == "original":
+        # Accepted but not yet written to GridFS: serve the queued bytes
+        _, filename, data = pending
+        length = len(data)
+        content_type = guess_content_type(data, filename)
+        body = lambda start, end: stream_bytes(data, start, end)
+    else:
+        try:
+            if size == "original":
+                grid_out = await fs.open_download_stream(file_id)
+            else:
+                contents = pending[2] if pending is not None else None
+                grid_out = await open_image_variant(file_id, size, contents)
+        except gridfs.errors.NoFile:
+            raise HTTPException(status_code=404, detail="Image not found.")
+        except ImageDecodeError:
+            raise HTTPException(
+                status_code=422, detail=f"Image cannot be decoded to render the {size} size."
+            )
+
+        length = grid_out.length
+        metadata = grid_out.metadata or {}
+        content_type = metadata.get("content_type")
+        if not content_type:
+            content_type = guess_content_type(await grid_out.read(16), grid_out.filename)
+        if grid_out.upload_date is not None:
+            headers["Last-Modified"] = format_datetime(grid_out.upload_date, usegmt=True)
+        body = lambda start, end: stream_grid_file(grid_out, start, end)
+
+    start, end, status_code = 0, length - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and length > 0 and (if_range is None or etag_matches(if_range, etag)):
+        try:
+            byte_range = parse_range(range_header, length)
+        except ValueError:
+            raise HTTPException(
+                status_code=416,
+                detail="Requested range not satisfiable.",
+                headers={"Content-Range": f"bytes */{length}"},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+
+    headers["Content-Length"] = str(end - start + 1 if length > 0 else 0)
+    return StreamingResponse(
+        body(start, end),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers,
+    )
@@ -0,0 +1,107 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from utils.model_registry import model_registry
+from config import MODELS_DIR, MODEL_ADMIN_TOKEN
+
+router = APIRouter()
+
+
+def check_admin_token(token: Optional[str]) -> None:
+    """
+    Reject requests to the model admin routes without the configured admin token.
+
+    Args:
+        token (str, optional): Value of the X-Admin-Token header.
+
+    Raises:
+        HTTPException: 403 if no admin token is configured, 401 if the token is wrong.
+    """
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model administration is disabled.")
+    if token is None or not hmac.compare_digest(token, MODEL_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+def resolve_model_path(path: str) -> str:
+    """
+    Resolve a model file given relative to MODELS_DIR, e.g. "v2/disease_classification_model.keras".
+
+    Args:
+        path (str): Path relative to MODELS_DIR.
+
+    Returns:
+        str: The absolute path of the file.
+
+    Raises:
+        HTTPException: 400 if the path leaves MODELS_DIR or does not exist.
+    """
+    models_dir = os.path.realpath(MODELS_DIR)
+    model_path = os.path.realpath(os.path.join(models_dir, path))
+    if os.path.commonpath([models_dir, model_path]) != models_dir:
+        raise HTTPException(status_code=400, detail="Model path must be inside MODELS_DIR.")
+    if not os.path.exists(model_path):
+        raise HTTPException(status_code=400, detail=f"Model file '{path}' does not exist.")
+    return model_path
+
+
+@router.get("/")
+async def list_models(x_admin_token: Optional[str] = Header(None)):
+    """
+    Report every model with its serving version, load time, memory footprint and the state
+    of its last reload.
+
+    Args:
+        x_admin_token (str): The admin token (X-Admin-Token header).
+
+    Returns:
+        JSON: {
+            name: {state: str, backend: str, version: str, loaded_at: str, load_ms: float,
+                   memory_bytes: int, error: str, reload: {state: str, error: str}}
+        }
+    """
+    check_admin_token(x_admin_token)
+    return model_registry.stats()
+
+
+@router.post("/{name}/reload")
+async def reload_model(
+    name: str,
+    path: Optional[str] = Query(None),
+    version: Optional[str] = Query(None),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Load a new version of a model in the background and swap it in once it is warm.
+
+    Requests keep being served by the current version until the swap, and requests in
+    flight at the swap finish on it. Poll `GET /api/models/` for the outcome: the reload
+    state becomes "swapped", or "failed" (with the old version still serving).
+
+    Args:
+        name (str): Model file stem, e.g. "disease_classification_model".
+        path (str, optional): Model file relative to MODELS_DIR; defaults to the configured
+            file, e.g. after it was replaced on disk.
+        version (str, optional): Version label; defaults to the file's content hash.
+        x_admin_token (str): The admin token (X-Admin-Token header).
+
+    Returns:
+        JSON (202): {name: str, reload: "loading"}
+
+    Raises:
+        HTTPException: 404 for an unknown model, 400 for a bad path, 409 if a reload is
+            already in progress or the models are served by a model server.
+    """
+    check_admin_token(x_admin_token)
+    if name not in model_registry.models:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'.")
+
+    model_path = resolve_model_path(path) if path else None
+    try:
+        model_registry.reload(name, model_path, version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return JSONResponse(status_code=202, content={"name": name, "reload": "loading"})
@@ -1,16 +1,327 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-from PIL import Image
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from io import BytesIO
+from typing import List
+import asyncio
+import json
+import os
 import traceback
+import zipfile
 from datetime import datetime, timezone
-from utils.disease_classifier import classify_disease
-from utils.variety_identifier import identify_variety
-from utils.age_estimator import estimate_age
-from db import fs, prediction_collection
+from bson import ObjectId
+from utils.inference_engine import (
+    classify_disease_async,
+    identify_variety_async,
+    estimate_age_async,
+    predict_all_with_features_async,
+    get_engine_stats,
+    get_model_versions,
+)
+from utils.inference_pool import preprocess_pool
+from utils.image_decoder import decode_image, ImageDecodeError, ImageTooLargeError
+from utils.disease_classifier import DISEASE_INPUT_SIZE
+from utils.variety_identifier import VARIETY_INPUT_SIZE
+from utils.age_estimator import AGE_INPUT_SIZE
+from utils.prediction_cache import prediction_cache, hash_contents
+from utils.image_store import store_original
+from utils.prediction_stats import record_prediction_stats
+from utils.write_behind import write_behind_queue
+from utils.vector_index import add_features
+from utils.metrics import timed, record_parse_time
+from utils.model_registry import ModelUnavailableError, model_registry
+from utils.admission import (
+    AdmissionRejected,
+    admission_controller,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+)
+from routers.history import publish_predictions
+from db import prediction_collection
+from config import (
+    BATCH_MAX_FILES,
+    BATCH_MAX_ARCHIVE_BYTES,
+    BATCH_CONCURRENCY,
+    MAX_UPLOAD_BYTES,
+    BATCH_INSERT_SIZE,
+    WRITE_BEHIND,
+    ADMISSION_PRIORITY,
+    VECTOR_INDEX,
+)
 
 router = APIRouter()
 
+# Smallest decoded size that covers every model input, for the combined routes
+ALL_MODELS_MIN_SIZE = tuple(
+    max(size[i] for size in (DISEASE_INPUT_SIZE, VARIETY_INPUT_SIZE, AGE_INPUT_SIZE))
+    for i in range(2)
+)
+
+# Admission priorities: the cheap single-model routes go ahead of the full prediction
+# route, and images of batch requests come last
+SINGLE_MODEL_PRIORITY = PRIORITY_HIGH if ADMISSION_PRIORITY else PRIORITY_NORMAL
+BATCH_PRIORITY = PRIORITY_LOW if ADMISSION_PRIORITY else PRIORITY_NORMAL
+
+# Content types browsers and clients send for zip archives
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+# Results cached in memory came from the replaced model version
+model_registry.add_swap_listener(lambda handle: prediction_cache.clear())
+
+# Records written behind are announced to history clients once they are stored
+write_behind_queue.add_write_listener(publish_predictions)
+
+
+def upload_limit(file: UploadFile) -> int:
+    """
+    Byte limit of one file uploaded to the batch route: archives may be larger than images.
+    """
+    name = (file.filename or "").lower()
+    if file.content_type in ZIP_CONTENT_TYPES or name.endswith(".zip"):
+        return BATCH_MAX_ARCHIVE_BYTES
+    return MAX_UPLOAD_BYTES
+
+
+def check_upload_size(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> None:
+    """
+    Reject an upload whose declared size exceeds the byte budget, before it is read.
+
+    Raises:
+        HTTPException: 413 if the file is larger than `max_bytes`.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{file.filename} is {file.size} bytes; the limit is {max_bytes} bytes.",
+        )
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read an uploaded file, rejecting it early when it exceeds the upload byte budget.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        max_bytes (int): Largest accepted size; MAX_UPLOAD_BYTES for a single image.
+
+    Returns:
+        bytes: The file contents.
+
+    Raises:
+        HTTPException: 413 if the file is larger than `max_bytes`.
+    """
+    check_upload_size(file, max_bytes)
+    with timed("read"):
+        return await file.read()
+
+
+def decode_error_response(error: ImageDecodeError) -> HTTPException:
+    """
+    Map an image decoding error to the HTTP error returned to the client.
+
+    Args:
+        error (ImageDecodeError): The decoding error.
+
+    Returns:
+        HTTPException: 413 for images over the byte/pixel budget, 400 for unreadable images.
+    """
+    status_code = 413 if isinstance(error, ImageTooLargeError) else 400
+    return HTTPException(status_code=status_code, detail=str(error))
+
+
+def admission_error_response(error: AdmissionRejected) -> HTTPException:
+    """
+    Map a shed request to the HTTP error returned to the client.
+
+    Args:
+        error (AdmissionRejected): The admission error.
+
+    Returns:
+        HTTPException: 429 or 503 with a Retry-After header.
+    """
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+async def find_cached_prediction(content_hash: str, model_versions: dict) -> dict | None:
+    """
+    Look up the result of a previous prediction for the same image content.
+
+    The in-process cache is checked first; on a miss the persisted hash index on the
+    prediction collection is queried for a record made by the serving model versions, and
+    a match is promoted into the cache.
+
+    Args:
+        content_hash (str): Content hash of the upload.
+        model_versions (dict): Serving model versions, see `get_model_versions`.
+
+    Returns:
+        dict or None: The stored image ID and predictions, or None if the image is new.
+    """
+    result = prediction_cache.get(content_hash)
+    if result is not None:
+        return result
+
+    doc = await prediction_collection.find_one(
+        {
+            "content_hash": content_hash,
+            **{f"model_version.{model}": version for model, version in model_versions.items()},
+        },
+        projection={"_id": 0, "image_id": 1, "disease": 1, "variety": 1, "age": 1},
+    )
+    if doc is None:
+        prediction_cache.record_miss()
+        return None
+
+    result = {
+        "image_id": str(doc.get("image_id")),
+        "disease": doc.get("disease"),
+        "variety": doc.get("variety"),
+        "age": doc.get("age"),
+    }
+    prediction_cache.record_store_hit()
+    cache_prediction(content_hash, result, model_versions)
+    return result
+
+
+def cache_prediction(content_hash: str, result: dict, model_versions: dict) -> None:
+    """
+    Cache a result unless the models that produced it are no longer serving.
+
+    A hot swap clears the cache; a result of the old version finishing after the swap is
+    not cached, so that it is not served for the new version.
+
+    Args:
+        content_hash (str): Content hash of the upload.
+        result (dict): The image ID and predictions.
+        model_versions (dict): Versions of the models that produced the result.
+    """
+    if model_versions == get_model_versions():
+        prediction_cache.put(content_hash, result)
+
+
+async def index_features(image_id: ObjectId, features, version: str) -> None:
+    """
+    Add the disease model features of a new image to the similarity index.
+
+    Failures are logged rather than raised, so they never fail the prediction.
+
+    Args:
+        image_id (ObjectId): ID of the image in GridFS.
+        features (np.ndarray): Penultimate-layer features of the image.
+        version (str): Version of the disease model that produced them.
+    """
+    try:
+        with timed("vector_index_add"):
+            await preprocess_pool.run(add_features, version, str(image_id), features)
+    except Exception:
+        traceback.print_exc()
+
+
+async def run_prediction(filename: str, contents: bytes) -> tuple:
+    """
+    Run the full prediction workflow for one uploaded image, without saving anything.
+
+    A repeated image is resolved through the content-hash cache; a new image gets a
+    pre-allocated GridFS ID and is run through the disease, variety, and age models, and
+    its disease model features are added to the similarity index. The record and the index
+    name the model versions that actually ran, which differ from the serving ones if a new
+    version was swapped in meanwhile.
+
+    Args:
+        filename (str): Original name of the uploaded file.
+        contents (bytes): Raw bytes of the uploaded file.
+
+    Returns:
+        tuple: (result, prediction_record, upload) where `result` is the API response body,
+            `prediction_record` is the document to insert into the prediction collection and
+            `upload` is the (image_id, filename, contents) to store in GridFS, or None if
+            the image is already stored.
+    """
+    with timed("hash"):
+        content_hash = await preprocess_pool.run(hash_contents, contents)
+    model_versions = get_model_versions()
+    with timed("cache_lookup"):
+        result = await find_cached_prediction(content_hash, model_versions)
+    upload = None
+
+    if result is None:
+        with timed("decode"):
+            image = await preprocess_pool.run(decode_image, contents, ALL_MODELS_MIN_SIZE)
+        image_id = ObjectId()
+        upload = (image_id, filename, contents)
+        disease, variety, age, features, model_versions = await predict_all_with_features_async(
+            image
+        )
+        if VECTOR_INDEX and features is not None:
+            await index_features(image_id, features, model_versions["disease"])
+
+        result = {
+            "image_id": str(image_id),
+            "disease": disease,
+            "variety": variety,
+            "age": age,
+        }
+        cache_prediction(content_hash, result, model_versions)
+
+    prediction_record = {
+        "_id": ObjectId(),
+        **result,
+        "filename": filename,
+        "content_hash": content_hash,
+        "model_version": model_versions,
+        "timestamp": datetime.now(),
+    }
+    return result, prediction_record, upload
+
+
+async def run_single_model(image_bytes: bytes, input_size: tuple, predict_async) -> dict:
+    """
+    Decode an upload for one model and run it through the batching engine.
+
+    Args:
+        image_bytes (bytes): Raw bytes of the uploaded image.
+        input_size (tuple): The model's input (width, height), the smallest size to decode.
+        predict_async (Callable): The model's async prediction, e.g. `classify_disease_async`.
+
+    Returns:
+        dict: Dictionary with 'result' and 'confidence'.
+    """
+    with timed("decode"):
+        image = await preprocess_pool.run(decode_image, image_bytes, input_size)
+    return await predict_async(image)
+
+
+async def save_prediction(prediction_record: dict, upload: tuple = None) -> None:
+    """
+    Persist a prediction record and its image.
+
+    With WRITE_BEHIND enabled, both are handed to the write-behind queue and written in
+    the background, and the record is published to the history stream once it is stored;
+    otherwise the image is uploaded, the record inserted and published right away.
+
+    Args:
+        prediction_record (dict): The document to insert into the prediction collection.
+        upload (tuple, optional): (image_id, filename, contents) to store in GridFS.
+    """
+    if WRITE_BEHIND:
+        with timed("write_behind_submit"):
+            await write_behind_queue.submit(prediction_record, upload)
+        return
+
+    if upload is not None:
+        with timed("gridfs_upload"):
+            await store_original(*upload)
+    with timed("mongo_insert"):
+        await prediction_collection.insert_one(prediction_record)
+    with timed("stats_update"):
+        await record_prediction_stats([prediction_record])
+    publish_predictions([prediction_record])
+
 
 @router.post("/")
 async def predict(file: UploadFile = File(...)):
@@ -18,9 +329,13 @@ async def predict(file: UploadFile = File(...)):
     Predict the disease class, variety, and age of a paddy plant image.
 
     This route performs the full prediction workflow:
-    1. Stores the uploaded image in MongoDB GridFS.
-    2. Runs disease, variety, and age prediction models.
-    3. Saves the prediction result to the database.
+    1. Hashes the upload and looks for a previous prediction of the same image,
+       first in the in-process cache and then in the persisted hash index.
+    2. On a miss, runs disease, variety, and age prediction models. A repeated
+       image reuses the stored image and results instead.
+    3. Stores the uploaded image in MongoDB GridFS, saves the prediction result to
+       the database and updates the daily statistics (in the background when
+       write-behind is enabled).
     4. Returns all predictions with confidence and image ID.
 
     Args:
@@ -34,37 +349,207 @@ async def predict(file: UploadFile = File(...)):
             age: {result: int, confidence: float}
         }
     """
+    record_parse_time()
     try:
-        contents = await file.read()
-        image = Image.open(BytesIO(contents)).convert("RGB")
-        image_id = await fs.upload_from_stream(file.filename, BytesIO(contents))
-
-        disease = classify_disease(image)
-        variety = identify_variety(image)
-        age = estimate_age(image)
-
-        prediction_record = {
-            "image_id": str(image_id),
-            "filename": file.filename,
-            "disease": disease,
-            "variety": variety,
-            "age": age,
-            "timestamp": datetime.now(),
-        }
-        await prediction_collection.insert_one(prediction_record)
+        async with admission_controller.admit(file.size, PRIORITY_NORMAL) as deadline:
+            contents = await read_upload(file)
+            # Saving is not cut off by the deadline, so no write is left half done
+            result, prediction_record, upload = await admission_controller.run_within(
+                deadline, run_prediction(file.filename, contents)
+            )
+            await save_prediction(prediction_record, upload)
 
-        return {
-            "image_id": str(image_id),
-            "disease": disease,
-            "variety": variety,
-            "age": age,
-        }
+        return result
 
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error_response(e)
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ImageDecodeError as e:
+        raise decode_error_response(e)
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+def expand_uploads(uploads: list) -> list:
+    """
+    Flatten uploaded files into individual images, extracting any zip archives.
+
+    Directory entries, hidden files and archive members that are not images (by extension)
+    are skipped. Images and members larger than MAX_UPLOAD_BYTES are not kept or extracted;
+    they are returned with `None` contents and reported as failed.
+
+    Args:
+        uploads (list): (filename, contents) pairs as uploaded.
+
+    Returns:
+        list: (filename, contents) pairs, one per image.
+    """
+    image_extensions = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+    images = []
+
+    for filename, contents in uploads:
+        if not zipfile.is_zipfile(BytesIO(contents)):
+            images.append((filename, contents if len(contents) <= MAX_UPLOAD_BYTES else None))
+            continue
+
+        with zipfile.ZipFile(BytesIO(contents)) as archive:
+            for member in archive.infolist():
+                name = os.path.basename(member.filename)
+                extension = os.path.splitext(name)[1].lower()
+                if member.is_dir() or name.startswith(".") or extension not in image_extensions:
+                    continue
+                if member.file_size > MAX_UPLOAD_BYTES:
+                    images.append((name, None))
+                    continue
+                images.append((name, archive.read(member)))
+
+    return images
+
+
+@router.post("/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    Predict the disease class, variety, and age of many paddy plant images in one request.
+
+    Accepts any number of image files and/or zip archives of images. Each image may be up to
+    MAX_UPLOAD_BYTES and each archive up to BATCH_MAX_ARCHIVE_BYTES. Before anything is
+    read, the request reserves its total upload size with admission control, so it can be
+    shed like the other inference routes; its images then take admission slots one at a
+    time, behind the single-image routes. Images are processed
+    concurrently, so they are grouped into real batches by the inference engine, and the
+    prediction records are written with bulk inserts (through the write-behind queue when
+    it is enabled). Results are streamed back as
+    newline-delimited JSON, one line per image in completion order, followed by a summary.
+
+    Args:
+        files (List[UploadFile]): Image files and/or zip archives of images.
+
+    Returns:
+        StreamingResponse: application/x-ndjson lines of the form
+            {index: int, filename: str, image_id: str, disease: {...}, variety: {...}, age: {...}}
+            or {index: int, filename: str, error: str} for images that failed, and finally
+            {done: true, total: int, succeeded: int, failed: int}.
+
+    Raises:
+        HTTPException: 400 if no images were found, 413 if there are more than BATCH_MAX_FILES
+            or a file is over its size limit, 429 or 503 if the request is shed.
+    """
+    record_parse_time()
+    for file in files:
+        check_upload_size(file, upload_limit(file))
+
+    upload_bytes = sum(file.size or 0 for file in files)
+    try:
+        await admission_controller.acquire(upload_bytes, BATCH_PRIORITY, slot=False)
+    except AdmissionRejected as e:
+        raise admission_error_response(e)
+
+    released = False
+
+    def release_upload_bytes() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            admission_controller.release(upload_bytes, slot=False)
+
+    try:
+        uploads = [(file.filename, await read_upload(file, upload_limit(file))) for file in files]
+        with timed("expand_uploads"):
+            images = await preprocess_pool.run(expand_uploads, uploads)
+        del uploads
+
+        if not images:
+            raise HTTPException(status_code=400, detail="No images found in the upload.")
+        if len(images) > BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many images: {len(images)} (maximum {BATCH_MAX_FILES}).",
+            )
+    except BaseException:
+        release_upload_bytes()
+        raise
+
+    async def insert_records(records: list) -> None:
+        """
+        Writes a chunk of prediction records and their statistics.
+        """
+        with timed("mongo_insert"):
+            await prediction_collection.insert_many(records, ordered=False)
+        with timed("stats_update"):
+            await record_prediction_stats(records)
+        publish_predictions(records)
+
+    async def stream_results():
+        semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+        pending_records = []
+        succeeded = 0
+
+        async def process(index: int, filename: str, contents: bytes) -> tuple:
+            async with semaphore:
+                try:
+                    if contents is None:
+                        raise ImageTooLargeError(
+                            f"Image exceeds the limit of {MAX_UPLOAD_BYTES} bytes."
+                        )
+                    # The upload bytes are already reserved for the whole request
+                    async with admission_controller.admit(0, BATCH_PRIORITY, shed=False):
+                        result, record, upload = await run_prediction(filename, contents)
+                    if WRITE_BEHIND:
+                        with timed("write_behind_submit"):
+                            await write_behind_queue.submit(record, upload)
+                        record = None
+                    elif upload is not None:
+                        with timed("gridfs_upload"):
+                            await store_original(*upload)
+                    return {"index": index, "filename": filename, **result}, record
+                except Exception as e:
+                    traceback.print_exc()
+                    return {"index": index, "filename": filename, "error": str(e)}, None
+
+        tasks = [
+            asyncio.ensure_future(process(index, filename, contents))
+            for index, (filename, contents) in enumerate(images)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line, record = await next_done
+                if "error" not in line:
+                    succeeded += 1
+                if record is not None:
+                    pending_records.append(record)
+                if len(pending_records) >= BATCH_INSERT_SIZE:
+                    await insert_records(pending_records)
+                    pending_records = []
+
+                yield json.dumps(line) + "\n"
+
+            if pending_records:
+                await insert_records(pending_records)
+
+            summary = {
+                "done": True,
+                "total": len(tasks),
+                "succeeded": succeeded,
+                "failed": len(tasks) - succeeded,
+            }
+            yield json.dumps(summary) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            release_upload_bytes()
+
+    # The background task releases the reservation if the stream never started
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(release_upload_bytes),
+    )
+
+
 @router.post("/disease")
 async def predict_disease(file: UploadFile = File(...)):
     """
@@ -79,16 +564,28 @@ async def predict_disease(file: UploadFile = File(...)):
             confidence: float
         }
     """
+    record_parse_time()
     try:
-        image_bytes = await file.read()
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-        disease_result = classify_disease(image)
+        async with admission_controller.admit(file.size, SINGLE_MODEL_PRIORITY) as deadline:
+            image_bytes = await read_upload(file)
+            disease_result = await admission_controller.run_within(
+                deadline,
+                run_single_model(image_bytes, DISEASE_INPUT_SIZE, classify_disease_async),
+            )
 
         return {
             "result": disease_result["result"],
             "confidence": disease_result["confidence"],
         }
 
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error_response(e)
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ImageDecodeError as e:
+        raise decode_error_response(e)
     except Exception:
         return JSONResponse(status_code=500, content={"error": "Internal server error"})
 
@@ -107,19 +604,31 @@ async def predict_variety(file: UploadFile = File(...)):
             confidence: float
         }
     """
+    record_parse_time()
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image files are allowed.")
 
     try:
-        image_bytes = await file.read()
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-        variety_result = identify_variety(image)
+        async with admission_controller.admit(file.size, SINGLE_MODEL_PRIORITY) as deadline:
+            image_bytes = await read_upload(file)
+            variety_result = await admission_controller.run_within(
+                deadline,
+                run_single_model(image_bytes, VARIETY_INPUT_SIZE, identify_variety_async),
+            )
 
         return {
             "result": variety_result["result"],
             "confidence": variety_result["confidence"],
         }
 
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error_response(e)
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ImageDecodeError as e:
+        raise decode_error_response(e)
     except Exception:
         return JSONResponse(status_code=500, content={"error": "Internal server error"})
 
@@ -138,15 +647,58 @@ async def predict_age(file: UploadFile = File(...)):
             confidence: float
         }
     """
+    record_parse_time()
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image files are allowed.")
 
     try:
-        image_bytes = await file.read()
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-        age_result = estimate_age(image)
+        async with admission_controller.admit(file.size, SINGLE_MODEL_PRIORITY) as deadline:
+            image_bytes = await read_upload(file)
+            age_result = await admission_controller.run_within(
+                deadline, run_single_model(image_bytes, AGE_INPUT_SIZE, estimate_age_async)
+            )
 
         return {"result": age_result["result"], "confidence": age_result["confidence"]}
 
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_error_response(e)
+    except ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ImageDecodeError as e:
+        raise decode_error_response(e)
     except Exception:
         return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+
+@router.get("/status")
+async def get_inference_status():
+    """
+    Report the load on the inference engine and admission control.
+
+    Returns:
+        JSON: {
+            batchers: {model: int},
+            pools: [{name: str, workers: int, queued: int, running: int, completed: int, failed: int}],
+            admission: {
+                inflight: int, inflight_bytes: int, waiting: {high: int, normal: int, low: int},
+                service_time_ms: float, admitted: int, rejected: int
+            }
+        }
+    """
+    return {**get_engine_stats(), "admission": admission_controller.stats()}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Report the size and hit/miss counters of the prediction cache.
+
+    Returns:
+        JSON: {
+            entries: int, bytes: int, max_entries: int, max_bytes: int,
+            memory_hits: int, store_hits: int, misses: int, evictions: int, hit_ratio: float
+        }
+    """
+    return prediction_cache.stats()
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException, Query
+from bson import ObjectId
+from bson.errors import InvalidId
+from db import prediction_collection
+from routers.history import HISTORY_PROJECTION, history_entry
+from utils.inference_engine import get_model_versions
+from utils.inference_pool import preprocess_pool
+from utils.vector_index import get_vector_index
+from config import VECTOR_INDEX
+
+router = APIRouter()
+
+
+@router.get("/{image_id}")
+async def get_similar_images(image_id: str, k: int = Query(10, ge=1, le=100)):
+    """
+    Retrieve the past images most similar to an image, by cosine similarity of the disease
+    model's penultimate-layer features.
+
+    Features are compared within the index of the serving disease model version, so after
+    a model swap only images predicted since then are found.
+
+    Args:
+        image_id (str): The ObjectId of the query image.
+        k (int): Number of similar images to return (max 100).
+
+    Returns:
+        List of dicts: History entries of the similar images, most similar first, each
+            with its `similarity` (-1.0 to 1.0).
+
+    Raises:
+        HTTPException: 400 for an invalid ID, 404 if similarity search is disabled or the
+            image is not in the index.
+    """
+    try:
+        ObjectId(image_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid image ID.")
+    if not VECTOR_INDEX:
+        raise HTTPException(status_code=404, detail="Similarity search is disabled.")
+
+    index = get_vector_index(get_model_versions()["disease"])
+    matches = await preprocess_pool.run(index.similar, image_id, k)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Image is not in the similarity index.")
+
+    entries = {}
+    docs = prediction_collection.find(
+        {"image_id": {"$in": [match_id for match_id, _ in matches]}},
+        projection=HISTORY_PROJECTION,
+    )
+    async for doc in docs:
+        entries.setdefault(str(doc.get("image_id")), history_entry(doc))
+
+    # Images whose record is not written yet (or was deleted) are left out
+    return [
+        {**entries[match_id], "similarity": round(score, 4)}
+        for match_id, score in matches
+        if match_id in entries
+    ]
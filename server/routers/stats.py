@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Query
+from datetime import datetime
+from typing import Optional
+from utils.prediction_stats import get_prediction_stats
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_stats(
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+):
+    """
+    Retrieve per-day prediction statistics for dashboards.
+
+    Statistics come from daily rollup documents that are updated as predictions are
+    saved, so the cost of this query grows with the number of days, not predictions.
+
+    Args:
+        date_from (datetime, optional): First day to include (ISO 8601).
+        date_to (datetime, optional): Last day to include (ISO 8601).
+
+    Returns:
+        JSON: {
+            days: [{day: str, total: int, disease: {name: int}, variety: {name: int},
+                    age: {days: int}, confidence: {disease|variety|age: {bucket: int}}}],
+            totals: {...same counters summed over the range...}
+        }
+        Confidence buckets "0" to "9" cover [0.0, 0.1) up to [0.9, 1.0].
+    """
+    return await get_prediction_stats(date_from, date_to)
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from utils.image_preprocessor import preprocess_batch, preprocess_image, preprocess_image_multi
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sample images shipped with the training scripts
+SAMPLE_DIR = os.path.join(SERVER_DIR, "..", "scripts", "data")
+
+# Source sizes of the synthetic images: landscape, portrait, square, small, tiny and odd
+SYNTHETIC_SIZES = [(640, 480), (480, 640), (1024, 1024), (300, 120), (90, 100), (33, 200)]
+
+# Image modes of the synthetic images, covering the transparency and palette handling
+SYNTHETIC_MODES = ["RGB", "RGBA", "P", "LA"]
+
+# Model input sizes (disease; variety and age), as (width, height)
+MODEL_INPUT_SIZES = [(256, 256), (128, 128)]
+
+
+@pytest.fixture(scope="module")
+def images() -> list:
+    """
+    Sample photos plus synthetic noise images of varied sizes and modes.
+    """
+    images = []
+    if os.path.isdir(SAMPLE_DIR):
+        for name in sorted(os.listdir(SAMPLE_DIR)):
+            if name.lower().endswith((".jpg", ".jpeg", ".png")):
+                with Image.open(os.path.join(SAMPLE_DIR, name)) as image:
+                    image.load()
+                    images.append(image.copy())
+
+    rng = np.random.default_rng(0)
+    for index, (width, height) in enumerate(SYNTHETIC_SIZES):
+        image = Image.fromarray(rng.integers(0, 256, (height, width, 4), dtype=np.uint8), "RGBA")
+        mode = SYNTHETIC_MODES[index % len(SYNTHETIC_MODES)]
+        images.append(image if mode == "RGBA" else image.convert(mode))
+    return images
+
+
+@pytest.mark.parametrize("size", MODEL_INPUT_SIZES)
+def test_preprocess_batch_matches_preprocess_image(images, size):
+    # Both paths resize with Pillow, one image at a time, so this compares Pillow with itself:
+    # it checks the batch plumbing (mode conversion, cropping, writes into the output rows)
+    expected = np.concatenate([preprocess_image(image, *size, normalize=False) for image in images])
+
+    batch = preprocess_batch(images, *size)
+
+    assert batch.dtype == np.uint8
+    np.testing.assert_array_equal(batch, expected)
+
+
+def test_preprocess_batch_accepts_arrays_and_output_buffer(images):
+    rgb = [np.asarray(image.convert("RGB")) for image in images]
+    out = np.zeros((len(rgb), 128, 128, 3), dtype=np.uint8)
+
+    batch = preprocess_batch(rgb, 128, 128, out=out)
+
+    assert batch is out
+    np.testing.assert_array_equal(batch, preprocess_batch(images, 128, 128))
+
+
+def test_preprocess_batch_rejects_bad_buffer_and_arrays(images):
+    with pytest.raises(ValueError):
+        preprocess_batch(images, 128, 128, out=np.zeros((1, 128, 128, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        preprocess_batch([np.zeros((10, 10), dtype=np.uint8)], 128, 128)
+
+
+def test_preprocess_image_multi_matches_preprocess_image(images):
+    for image in images:
+        tensors = preprocess_image_multi(image, MODEL_INPUT_SIZES + [(128, 128)])
+
+        assert set(tensors) == set(MODEL_INPUT_SIZES)
+        for size, tensor in tensors.items():
+            np.testing.assert_array_equal(tensor, preprocess_image(image, *size))
+
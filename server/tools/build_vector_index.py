@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+from config import VECTOR_INDEX_DIR
+from utils.vector_index import VectorIndex
+
+
+def build_vector_indexes(
+    index_dir: str, nlist: int = None, sample_size: int = 100_000, iterations: int = 10
+) -> int:
+    """
+    Clusters every per-version feature index under `index_dir`, so similarity queries only
+    scan the rows of the nearest clusters. Safe to run while the API is adding rows, and
+    worth re-running as an index grows (e.g. each time it doubles).
+
+    Args:
+        index_dir (str): Directory holding one index per disease model version.
+        nlist (int, optional): Number of clusters; twice the square root of the row count
+            when omitted.
+        sample_size (int): Rows used to fit the centroids.
+        iterations (int): k-means iterations.
+
+    Returns:
+        int: Number of indexes clustered.
+    """
+    built = 0
+    names = sorted(os.listdir(index_dir)) if os.path.isdir(index_dir) else []
+    for name in names:
+        path = os.path.join(index_dir, name)
+        if not os.path.isfile(os.path.join(path, "vectors.f16")):
+            continue
+
+        index = VectorIndex(path)
+        rows = index.stats()["rows"]
+        if rows == 0:
+            print(f"{name}: empty, skipped")
+            continue
+
+        start = time.perf_counter()
+        clusters = index.train(nlist, sample_size, iterations)
+        print(
+            f"{name}: {rows} rows in {clusters} clusters "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+        built += 1
+    return built
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cluster the image feature indexes used by /api/similar."
+    )
+    parser.add_argument("--index-dir", default=VECTOR_INDEX_DIR)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--sample-size", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    count = build_vector_indexes(args.index_dir, args.nlist, args.sample_size, args.iterations)
+    sys.exit(0 if count else 1)
@@ -0,0 +1,154 @@
+import argparse
+import glob
+import os
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from config import MODELS_DIR
+from utils.backends import get_model_path
+from utils.image_preprocessor import preprocess_image
+
+# Model file stems and their input resolution (width, height)
+MODELS = {
+    "disease_classification_model": (256, 256),
+    "variety_identification_model": (128, 128),
+    "age_prediction_model": (128, 128),
+}
+
+# Export formats supported by this command
+FORMATS = ("tflite", "tflite-int8", "onnx")
+
+# Default images used to calibrate int8 quantization
+CALIBRATION_DIR = "../scripts/data"
+
+
+def load_calibration_images(calibration_dir: str, size: tuple, limit: int) -> list:
+    """
+    Loads and preprocesses the images used to calibrate int8 quantization ranges.
+
+    Args:
+        calibration_dir (str): Directory of representative JPEG/PNG images.
+        size (tuple): Model input (width, height).
+        limit (int): Maximum number of images to use.
+
+    Returns:
+        list: Preprocessed float32 tensors of shape (1, height, width, 3).
+    """
+    paths = sorted(
+        glob.glob(os.path.join(calibration_dir, "*.jpg"))
+        + glob.glob(os.path.join(calibration_dir, "*.png"))
+    )[:limit]
+    if not paths:
+        raise FileNotFoundError(f"No calibration images found in {calibration_dir}")
+
+    tensors = []
+    for path in paths:
+        with Image.open(path) as image:
+            tensor = preprocess_image(image, width=size[0], height=size[1], normalize=False)
+        tensors.append(tensor.astype(np.float32))
+    return tensors
+
+
+def export_tflite(model: tf.keras.Model, output_path: str, calibration: list = None) -> None:
+    """
+    Converts a Keras model to TFLite with dynamic-range or full int8 quantization.
+
+    Without calibration data, weights are quantized to int8 and activations stay float
+    (dynamic range). With calibration data, weights and activations are quantized to int8
+    and the model takes uint8 pixel input.
+
+    Args:
+        model (tf.keras.Model): The model to convert.
+        output_path (str): Destination .tflite file.
+        calibration (list, optional): Representative input tensors for int8 quantization.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if calibration is not None:
+        converter.representative_dataset = lambda: ([tensor] for tensor in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model: tf.keras.Model, size: tuple, output_path: str, opset: int) -> None:
+    """
+    Converts a Keras model to ONNX with a dynamic batch dimension.
+
+    Args:
+        model (tf.keras.Model): The model to convert.
+        size (tuple): Model input (width, height).
+        output_path (str): Destination .onnx file.
+        opset (int): ONNX opset version.
+    """
+    import tf2onnx
+
+    width, height = size
+    signature = [tf.TensorSpec((None, height, width, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(
+        model, input_signature=signature, opset=opset, output_path=output_path
+    )
+
+
+def export_models(
+    formats: list,
+    models_dir: str = MODELS_DIR,
+    calibration_dir: str = CALIBRATION_DIR,
+    calibration_limit: int = 200,
+    opset: int = 17,
+):
+    """
+    Exports every Keras model in `models_dir` to the requested formats, next to the original.
+
+    Args:
+        formats (list): Any of "tflite", "tflite-int8" and "onnx".
+        models_dir (str): Directory containing the .keras models.
+        calibration_dir (str): Representative images for int8 calibration.
+        calibration_limit (int): Maximum number of calibration images per model.
+        opset (int): ONNX opset version.
+    """
+    for model_name, size in MODELS.items():
+        keras_path = get_model_path(model_name, "keras", models_dir)
+        model = tf.keras.models.load_model(keras_path)
+
+        for fmt in formats:
+            output_path = get_model_path(model_name, fmt, models_dir)
+
+            if fmt == "tflite":
+                export_tflite(model, output_path)
+            elif fmt == "tflite-int8":
+                calibration = load_calibration_images(calibration_dir, size, calibration_limit)
+                export_tflite(model, output_path, calibration)
+            elif fmt == "onnx":
+                export_onnx(model, size, output_path, opset)
+
+            print(
+                f"{model_name}: {fmt} -> {output_path} "
+                f"({os.path.getsize(output_path) / 1e6:.1f} MB, "
+                f"keras {os.path.getsize(keras_path) / 1e6:.1f} MB)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the Keras models to quantized TFLite and ONNX backends."
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=FORMATS, default=list(FORMATS)
+    )
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--calibration-dir", default=CALIBRATION_DIR)
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    export_models(
+        args.formats,
+        models_dir=args.models_dir,
+        calibration_dir=args.calibration_dir,
+        calibration_limit=args.calibration_limit,
+        opset=args.opset,
+    )
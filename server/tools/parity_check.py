@@ -0,0 +1,234 @@
+import argparse
+import csv
+import json
+import os
+import time
+import numpy as np
+from PIL import Image
+from config import MODELS_DIR
+from utils.backends import BACKENDS, load_backend
+from utils.image_preprocessor import preprocess_batch, remove_transparency
+from utils.disease_classifier import (
+    DISEASE_CLASSIFICATION_MODEL_NAME,
+    DISEASE_CLASSES,
+    DISEASE_INPUT_SIZE,
+)
+from utils.variety_identifier import (
+    VARIETY_IDENTIFICATION_MODEL_NAME,
+    VARIETY_CLASSES,
+    VARIETY_INPUT_SIZE,
+)
+from utils.age_estimator import AGE_PREDICTION_MODEL_NAME, AGE_CLASSES, AGE_INPUT_SIZE
+
+# Task name -> (model file stem, input size, label column, classes)
+TASKS = {
+    "disease": (DISEASE_CLASSIFICATION_MODEL_NAME, DISEASE_INPUT_SIZE, "label", DISEASE_CLASSES),
+    "variety": (VARIETY_IDENTIFICATION_MODEL_NAME, VARIETY_INPUT_SIZE, "variety", VARIETY_CLASSES),
+    "age": (AGE_PREDICTION_MODEL_NAME, AGE_INPUT_SIZE, "age", AGE_CLASSES),
+}
+
+
+def normalize_label(label) -> str:
+    """
+    Normalizes a class label so "Bacterial Leaf Blight" matches "bacterial_leaf_blight".
+    """
+    return str(label).strip().lower().replace(" ", "_")
+
+
+def load_samples(labels_path: str, image_dir: str, limit: int) -> list:
+    """
+    Loads the labelled sample set and locates each image (searching subdirectories).
+
+    Args:
+        labels_path (str): CSV with image_id,label,variety,age columns (as meta_train.csv).
+        image_dir (str): Directory containing the images, possibly in per-class folders.
+        limit (int): Maximum number of samples to use (0 for all).
+
+    Returns:
+        list: (image_path, row) pairs for images that were found.
+    """
+    paths = {}
+    for root, _, names in os.walk(image_dir):
+        for name in names:
+            paths.setdefault(name, os.path.join(root, name))
+
+    samples = []
+    with open(labels_path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["image_id"] in paths:
+                samples.append((paths[row["image_id"]], row))
+            if limit and len(samples) >= limit:
+                break
+    return samples
+
+
+def preprocess_samples(samples: list) -> dict:
+    """
+    Preprocesses every sample once at each model resolution.
+
+    Args:
+        samples (list): (image_path, row) pairs.
+
+    Returns:
+        dict: Maps (width, height) to an array of shape (N, height, width, 3).
+    """
+    images = []
+    for path, _ in samples:
+        with Image.open(path) as image:
+            images.append(remove_transparency(image).convert("RGB"))
+
+    sizes = dict.fromkeys(tuple(size) for _, size, _, _ in TASKS.values())
+    return {size: preprocess_batch(images, *size) for size in sizes}
+
+
+def run_backend(backend, inputs: np.ndarray, batch_size: int, latency_runs: int) -> tuple:
+    """
+    Runs a backend over the whole sample set and measures its latency.
+
+    Args:
+        backend (InferenceBackend): The loaded model.
+        inputs (np.ndarray): Preprocessed samples of shape (N, H, W, 3).
+        batch_size (int): Batch size used for the throughput measurement.
+        latency_runs (int): Number of single-image calls timed for the latency percentiles.
+
+    Returns:
+        tuple: (probabilities, metrics) where metrics holds single-image p50/p95 latency in
+            milliseconds and batched throughput in images per second.
+    """
+    backend.predict(inputs[:1])
+
+    single = []
+    for i in range(min(latency_runs, len(inputs))):
+        start = time.perf_counter()
+        backend.predict(inputs[i : i + 1])
+        single.append((time.perf_counter() - start) * 1000)
+
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(inputs), batch_size):
+        outputs.append(backend.predict(inputs[i : i + batch_size]))
+    elapsed = time.perf_counter() - start
+
+    return np.concatenate(outputs), {
+        "latency_p50_ms": round(float(np.percentile(single, 50)), 3) if single else None,
+        "latency_p95_ms": round(float(np.percentile(single, 95)), 3) if single else None,
+        "throughput_ips": round(len(inputs) / elapsed, 1),
+    }
+
+
+def parity_check(
+    labels_path: str,
+    image_dir: str,
+    backends: list,
+    models_dir: str = MODELS_DIR,
+    limit: int = 500,
+    batch_size: int = 32,
+    latency_runs: int = 50,
+) -> dict:
+    """
+    Compares each inference backend against the float32 Keras reference on a labelled set.
+
+    For every task and backend, reports accuracy against the labels, accuracy drift and
+    top-1 agreement relative to Keras, the largest absolute probability difference, model
+    file size, single-image latency and batched throughput.
+
+    Args:
+        labels_path (str): CSV of labels (image_id,label,variety,age).
+        image_dir (str): Directory of the labelled images.
+        backends (list): Backend names to evaluate; "keras" is always included as reference.
+        models_dir (str): Directory containing the model files.
+        limit (int): Maximum number of samples (0 for all).
+        batch_size (int): Batch size for the throughput measurement.
+        latency_runs (int): Number of single-image calls timed.
+
+    Returns:
+        dict: Nested report {task: {backend: metrics}}.
+    """
+    samples = load_samples(labels_path, image_dir, limit)
+    if not samples:
+        raise FileNotFoundError("No labelled images found.")
+    inputs = preprocess_samples(samples)
+    backends = ["keras"] + [name for name in backends if name != "keras"]
+
+    report = {}
+    for task, (model_name, size, column, classes) in TASKS.items():
+        labels = np.array([normalize_label(row[column]) for _, row in samples])
+        class_names = np.array([normalize_label(c) for c in classes])
+        reference = None
+        report[task] = {}
+
+        for name in backends:
+            backend = load_backend(model_name, name, models_dir)
+            probabilities, metrics = run_backend(
+                backend, inputs[tuple(size)], batch_size, latency_runs
+            )
+            predicted = probabilities.argmax(axis=1)
+            accuracy = float(np.mean(class_names[predicted] == labels))
+
+            if reference is None:
+                reference = (probabilities, predicted, accuracy)
+
+            report[task][name] = {
+                "samples": len(samples),
+                "accuracy": round(accuracy, 4),
+                "accuracy_drift": round(accuracy - reference[2], 4),
+                "agreement": round(float(np.mean(predicted == reference[1])), 4),
+                "max_abs_diff": round(float(np.max(np.abs(probabilities - reference[0]))), 5),
+                "size_mb": round(os.path.getsize(backend.model_path) / 1e6, 2),
+                **metrics,
+            }
+    return report
+
+
+def print_report(report: dict) -> None:
+    """
+    Prints the parity report as one table per task.
+    """
+    columns = [
+        "accuracy",
+        "accuracy_drift",
+        "agreement",
+        "max_abs_diff",
+        "size_mb",
+        "latency_p50_ms",
+        "latency_p95_ms",
+        "throughput_ips",
+    ]
+    for task, results in report.items():
+        print("-" * 50)
+        print(f"Task: {task}")
+        print("backend".ljust(12) + "".join(column.rjust(16) for column in columns))
+        for backend, metrics in results.items():
+            print(backend.ljust(12) + "".join(str(metrics[c]).rjust(16) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report accuracy drift and latency of each inference backend."
+    )
+    parser.add_argument("--labels", required=True, help="CSV with image_id,label,variety,age.")
+    parser.add_argument("--image-dir", required=True)
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS)
+    )
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--json", help="Also write the report to this JSON file.")
+    args = parser.parse_args()
+
+    result = parity_check(
+        args.labels,
+        args.image_dir,
+        args.backends,
+        models_dir=args.models_dir,
+        limit=args.limit,
+        batch_size=args.batch_size,
+        latency_runs=args.latency_runs,
+    )
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
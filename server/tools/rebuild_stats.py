@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import sys
+import time
+from utils.prediction_stats import rebuild_prediction_stats
+
+# Printed before a rebuild: rollup increments made while it runs are overwritten
+WRITES_WARNING = (
+    "Stop the API (and let its write-behind queue drain) before rebuilding: predictions "
+    "saved while the rebuild runs are overwritten in the rollups of their day."
+)
+
+
+async def main():
+    """
+    Recompute the daily prediction rollups from the prediction collection.
+    """
+    start = time.perf_counter()
+    days = await rebuild_prediction_stats()
+    print(f"Rebuilt {days} daily rollups in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recompute the daily prediction rollups served by /api/stats.",
+        epilog=WRITES_WARNING,
+    )
+    parser.add_argument(
+        "--yes", action="store_true", help="Do not ask to confirm that writes are stopped."
+    )
+    args = parser.parse_args()
+
+    print(f"Warning: {WRITES_WARNING}", file=sys.stderr)
+    if not args.yes and input("Are writes stopped? [y/N] ").strip().lower() not in ("y", "yes"):
+        sys.exit(1)
+    asyncio.run(main())
@@ -0,0 +1,305 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from config import (
+    ADMISSION_MAX_INFLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_BYTES,
+    ADMISSION_DEADLINE_MS,
+)
+from utils.metrics import record_rejection, track_queue_depth
+
+# Admission priorities; lower values are admitted first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Weight of the newest sample in the moving average of request service time
+SERVICE_TIME_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is shed by admission control.
+
+    Args:
+        message (str): Reason shown to the client.
+        status_code (int): 429 when the admission queue is full, 503 when the request
+            cannot be answered within its deadline.
+        retry_after (int): Seconds after which the client should try again.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number and total upload size of inference requests being processed.
+
+    Requests enter through `admit` before their upload is read. Up to `max_inflight`
+    requests holding at most `max_bytes` of uploads are processed at once; later ones wait
+    in a queue per priority and are admitted in priority order, first come first served
+    within a priority. A request larger than `max_bytes` is admitted once no other request
+    holds upload bytes. A request can also reserve upload bytes without taking a slot, e.g.
+    a batch request whose images then take slots one by one, so batches holding bytes can
+    never use up every slot their own images are waiting for.
+
+    Requests that cannot succeed are shed instead of piling up: when the queue holds
+    `max_queue` requests (429), when the expected queue wait plus service time already
+    exceeds the deadline (503), and when the deadline passes while waiting (503). The
+    deadline counts from the request's arrival; `admit` yields it, so that the work done
+    after admission can be cut off with `run_within` once it passes (503). The expected
+    wait is estimated from an exponentially weighted moving average of how long admitted
+    requests take. Every rejection carries a Retry-After estimate of the time until the
+    current queue has drained.
+
+    Args:
+        max_inflight (int): Maximum number of admitted requests.
+        max_queue (int): Maximum number of waiting requests.
+        max_bytes (int): Maximum total upload bytes of admitted requests.
+        deadline_ms (float): Time within which a request must be answered.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = ADMISSION_MAX_INFLIGHT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_bytes: int = ADMISSION_MAX_BYTES,
+        deadline_ms: float = ADMISSION_DEADLINE_MS,
+    ):
+        self.max_inflight = max(1, int(max_inflight))
+        self.max_queue = max(0, int(max_queue))
+        self.max_bytes = max(1, int(max_bytes))
+        self.deadline = max(0.0, float(deadline_ms)) / 1000.0
+        self._waiters = {
+            priority: deque() for priority in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+        }
+        self._inflight = 0
+        self._bytes = 0
+        self._service_time = None
+        self.admitted = 0
+        self.rejected = 0
+        track_queue_depth("admission", lambda: self.waiting)
+
+    @property
+    def waiting(self) -> int:
+        """
+        Number of requests waiting for admission.
+        """
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _can_take(self, nbytes: int, slot: bool = True) -> bool:
+        if slot and self._inflight >= self.max_inflight:
+            return False
+        return self._bytes == 0 or self._bytes + nbytes <= self.max_bytes
+
+    def _take(self, nbytes: int, slot: bool = True) -> None:
+        self._inflight += 1 if slot else 0
+        self._bytes += nbytes
+        self.admitted += 1
+
+    def _admit_waiters(self) -> None:
+        """
+        Admits waiting requests in priority order while capacity allows.
+        """
+        for waiters in self._waiters.values():
+            while waiters:
+                future, nbytes, slot = waiters[0]
+                if future.done():
+                    waiters.popleft()
+                    continue
+                if not self._can_take(nbytes, slot):
+                    return
+                waiters.popleft()
+                self._take(nbytes, slot)
+                future.set_result(None)
+
+    def expected_wait(self, ahead: int) -> float:
+        """
+        Estimates how long a request queued behind `ahead` others waits for admission.
+
+        Args:
+            ahead (int): Number of requests admitted before it.
+
+        Returns:
+            float: Seconds; 0 until a service time has been measured.
+        """
+        if self._service_time is None:
+            return 0.0
+        return (ahead + 1) * self._service_time / self.max_inflight
+
+    def _reject(self, message: str, status_code: int, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        record_rejection(reason)
+        retry_after = max(1, math.ceil(self.expected_wait(self.waiting)))
+        return AdmissionRejected(message, status_code, retry_after)
+
+    async def acquire(
+        self,
+        nbytes: int,
+        priority: int = PRIORITY_NORMAL,
+        shed: bool = True,
+        slot: bool = True,
+    ):
+        """
+        Waits until a request may be processed.
+
+        Args:
+            nbytes (int): Upload size the request holds while it is processed.
+            priority (int): PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.
+            shed (bool): Whether the request may be rejected. When False it waits for
+                as long as it takes, e.g. for images of a batch request.
+            slot (bool): Whether the request takes one of the `max_inflight` slots; when
+                False it only reserves `nbytes`.
+
+        Raises:
+            AdmissionRejected: If the request is shed.
+        """
+        ahead = sum(len(self._waiters[p]) for p in self._waiters if p <= priority)
+        if ahead == 0 and self._can_take(nbytes, slot):
+            self._take(nbytes, slot)
+            return
+
+        timeout = None
+        if shed:
+            if self.waiting >= self.max_queue:
+                raise self._reject(
+                    "Too many requests are waiting; try again later.", 429, "queue_full"
+                )
+            timeout = max(0.0, self.deadline - (self._service_time or 0.0))
+            if self.expected_wait(ahead) > timeout:
+                raise self._reject("The server is overloaded; try again later.", 503, "deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, nbytes, slot)
+        self._waiters[priority].append(entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait ended
+                if isinstance(e, asyncio.TimeoutError):
+                    return
+                self.release(nbytes, slot=slot)
+                raise
+            self._withdraw(priority, entry)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("The server is overloaded; try again later.", 503, "deadline")
+            raise
+
+    def _withdraw(self, priority: int, entry: tuple) -> None:
+        """
+        Removes a request that stopped waiting, letting the ones behind it move up.
+        """
+        if entry in self._waiters[priority]:
+            self._waiters[priority].remove(entry)
+        self._admit_waiters()
+
+    def release(
+        self, nbytes: int, service_time: Optional[float] = None, slot: bool = True
+    ) -> None:
+        """
+        Frees the capacity held by an admitted request and admits waiting ones.
+
+        Args:
+            nbytes (int): Upload size passed to `acquire`.
+            service_time (float, optional): Seconds the request was admitted for, used
+                to update the moving average.
+            slot (bool): Whether the request took a slot, as passed to `acquire`.
+        """
+        self._inflight -= 1 if slot else 0
+        self._bytes -= nbytes
+        if service_time is not None:
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time += SERVICE_TIME_EWMA_ALPHA * (service_time - self._service_time)
+        self._admit_waiters()
+
+    @asynccontextmanager
+    async def admit(
+        self, nbytes: Optional[int], priority: int = PRIORITY_NORMAL, shed: bool = True
+    ):
+        """
+        Holds an admission slot for the duration of the block.
+
+        Args:
+            nbytes (int, optional): Upload size; None counts as 0.
+            priority (int): PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.
+            shed (bool): Whether the request may be rejected, see `acquire`.
+
+        Yields:
+            float or None: The request's deadline in event loop time, for `run_within`;
+                None when the request may not be shed.
+
+        Raises:
+            AdmissionRejected: If the request is shed.
+        """
+        nbytes = max(0, int(nbytes or 0))
+        deadline = asyncio.get_running_loop().time() + self.deadline if shed else None
+        await self.acquire(nbytes, priority, shed)
+        start = time.perf_counter()
+        try:
+            yield deadline
+        finally:
+            self.release(nbytes, time.perf_counter() - start)
+
+    async def run_within(self, deadline: Optional[float], awaitable):
+        """
+        Awaits the work of an admitted request, cancelling it once the deadline has passed.
+
+        Args:
+            deadline (float, optional): Deadline yielded by `admit`; None waits without limit.
+            awaitable (Awaitable): The work, e.g. decoding and inference.
+
+        Returns:
+            The result of `awaitable`.
+
+        Raises:
+            AdmissionRejected: 503 if the work did not finish before the deadline.
+        """
+        if deadline is None:
+            return await awaitable
+        timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(
+                "The request could not be answered in time; try again later.", 503, "timeout"
+            )
+
+    def stats(self) -> dict:
+        """
+        Returns the current load and counters.
+
+        Returns:
+            dict: In-flight requests and bytes, waiting requests per priority, the service
+                time average (ms) and admitted/rejected counts.
+        """
+        return {
+            "inflight": self._inflight,
+            "inflight_bytes": self._bytes,
+            "waiting": {
+                name: len(self._waiters[priority])
+                for name, priority in (
+                    ("high", PRIORITY_HIGH),
+                    ("normal", PRIORITY_NORMAL),
+                    ("low", PRIORITY_LOW),
+                )
+            },
+            "service_time_ms": (
+                round(self._service_time * 1000, 1) if self._service_time is not None else None
+            ),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+# Shared admission controller for the inference routes
+admission_controller = AdmissionController()
@@ -1,11 +1,16 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
+from config import AGE_BACKEND
+from utils.model_registry import model_registry
 from utils.image_preprocessor import preprocess_image
 
-# Load the age classification model
-AGE_PREDICTION_MODEL_PATH = "./models/age_prediction_model.keras"
-age_prediction_model = tf.keras.models.load_model(AGE_PREDICTION_MODEL_PATH)
+# Model input resolution (width, height)
+AGE_INPUT_SIZE = (128, 128)
+
+# Register the age classification model with the configured inference backend;
+# it is loaded in the background at start-up or on first use (see MODEL_LOADING)
+AGE_PREDICTION_MODEL_NAME = "age_prediction_model"
+age_model = model_registry.register(AGE_PREDICTION_MODEL_NAME, AGE_BACKEND, AGE_INPUT_SIZE)
 
 # Define the age classes (in days)
 AGE_CLASSES = sorted(
@@ -13,6 +18,36 @@ AGE_CLASSES = sorted(
 )
 
 
+def predict_age_batch(input_batch: np.ndarray) -> np.ndarray:
+    """
+    Run the age prediction model on a batch of preprocessed images with the configured backend.
+
+    Args:
+        input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+    Returns:
+        np.ndarray: Softmax probabilities with shape (N, len(AGE_CLASSES)).
+    """
+    return age_model.get().predict(input_batch)
+
+
+def decode_age_prediction(prediction: np.ndarray) -> dict:
+    """
+    Convert one row of age prediction probabilities into a result and confidence score.
+
+    Args:
+        prediction (np.ndarray): Softmax probabilities for a single image.
+
+    Returns:
+        dict: Dictionary containing:
+            - 'result' (int): Predicted age in days.
+            - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
+    """
+    predicted_idx = np.argmax(prediction)
+    confidence = float(prediction[predicted_idx])
+    return {"result": AGE_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+
+
 def estimate_age(image_input: Image.Image, width: int = 128, height: int = 128) -> dict:
     """
     Estimate the age (in days) of a paddy plant based on its image, returning the result and confidence.
@@ -31,7 +66,5 @@ def estimate_age(image_input: Image.Image, width: int = 128, height: int = 128)
             - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
     """
     input_tensor = preprocess_image(image_input, width=width, height=height, normalize=False)
-    prediction = age_prediction_model.predict(input_tensor)[0]
-    predicted_idx = np.argmax(prediction)
-    confidence = float(prediction[predicted_idx])
-    return {"result": AGE_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+    prediction = predict_age_batch(input_tensor)[0]
+    return decode_age_prediction(prediction)
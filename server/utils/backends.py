@@ -0,0 +1,398 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from config import MODELS_DIR, BACKEND_NUM_THREADS, MODEL_SERVER_ADDRESS
+
+# Model file suffix for each backend
+BACKEND_FILE_SUFFIXES = {
+    "keras": ".keras",
+    "tflite": ".tflite",
+    "tflite-int8": ".int8.tflite",
+    "onnx": ".onnx",
+}
+
+
+class InferenceBackend:
+    """
+    Base class for a model served by a specific inference runtime.
+
+    Subclasses load a model file and implement `predict`, which maps a batch of
+    preprocessed images to softmax probabilities. All backends accept the same input as
+    the original Keras models: (N, H, W, 3) arrays with pixel values in [0, 255].
+
+    Args:
+        model_path (str): Path to the model file for this backend.
+    """
+
+    kind = "base"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        """
+        Runs the model on a batch of preprocessed images.
+
+        Args:
+            input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+        Returns:
+            np.ndarray: Softmax probabilities with shape (N, num_classes).
+        """
+        raise NotImplementedError
+
+    def predict_with_features(self, input_batch: np.ndarray) -> tuple:
+        """
+        Runs the model on a batch and also returns its penultimate-layer activations, the
+        image features used for similarity search.
+
+        Args:
+            input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+        Returns:
+            tuple: (probabilities, features) where features has shape (N, num_features),
+                or is None if the backend cannot expose them.
+        """
+        return self.predict(input_batch), None
+
+    def warmup(self, input_size: tuple, batch_sizes: list, samples: np.ndarray = None) -> None:
+        """
+        Runs the model once per batch size so tracing and allocation happen before real traffic.
+
+        Args:
+            input_size (tuple): Model input (width, height).
+            batch_sizes (list): Batch sizes to exercise.
+            samples (np.ndarray, optional): Preprocessed images of shape (N, H, W, 3), repeated
+                to fill each batch; zeros are used when not given.
+        """
+        width, height = input_size
+        for batch_size in batch_sizes:
+            if samples is None or len(samples) == 0:
+                batch = np.zeros((batch_size, height, width, 3), dtype=np.float32)
+            else:
+                batch = np.take(samples, np.arange(batch_size) % len(samples), axis=0)
+            self.predict(batch)
+
+    @property
+    def memory_bytes(self):
+        """
+        Approximate memory held by the model: the size of its file unless a backend knows better.
+
+        Returns:
+            int or None: Bytes, or None if unknown.
+        """
+        try:
+            return os.path.getsize(self.model_path)
+        except OSError:
+            return None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.model_path!r})"
+
+
+def feature_model(model):
+    """
+    Builds a Keras model with the same weights that also outputs the input of the last
+    layer, i.e. the penultimate-layer activations of a classifier.
+
+    Args:
+        model (tf.keras.Model): A loaded functional or sequential Keras model.
+
+    Returns:
+        tf.keras.Model or None: Model returning (probabilities, features), or None if the
+            model's graph does not expose them.
+    """
+    import tensorflow as tf
+
+    try:
+        return tf.keras.Model(model.inputs, [model.outputs[0], model.layers[-1].input])
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Serves a full-precision Keras model through a compiled direct-call path.
+
+    `model.predict` sets up a data adapter and callback loop on every call, which dominates
+    latency for small batches. Instead the model is wrapped in a `tf.function` with a fixed
+    input signature (any batch size, the model's own height, width and channels), which is
+    traced once and then called directly. The traced function also returns the input of
+    the last layer as the image features, which costs nothing extra in the same pass.
+    """
+
+    kind = "keras"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = tf.keras.models.load_model(model_path)
+        self.feature_model = feature_model(self.model)
+        network = self.feature_model or self.model
+        input_shape = (None,) + tuple(self.model.input_shape[1:])
+        self._forward = tf.function(
+            lambda inputs: network(inputs, training=False),
+            input_signature=[tf.TensorSpec(input_shape, tf.float32)],
+        )
+
+    def predict_with_features(self, input_batch: np.ndarray) -> tuple:
+        inputs = self._tf.convert_to_tensor(input_batch, dtype=self._tf.float32)
+        outputs = self._forward(inputs)
+        if self.feature_model is None:
+            return outputs.numpy(), None
+        probabilities, features = outputs
+        return probabilities.numpy(), features.numpy().reshape(len(input_batch), -1)
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        return self.predict_with_features(input_batch)[0]
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(
+            int(np.prod(weight.shape)) * self._tf.as_dtype(weight.dtype).size
+            for weight in self.model.weights
+        )
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Serves a TFLite model (float, dynamic-range or int8 quantized) with the TFLite interpreter.
+
+    Uses the lightweight `tflite_runtime` package when installed and falls back to the
+    interpreter bundled with TensorFlow. Quantized inputs and outputs are converted using the
+    tensor's scale and zero point, so callers always pass and receive float arrays. The
+    interpreter is not thread-safe, so calls are serialized.
+    """
+
+    kind = "tflite"
+
+    def __init__(self, model_path: str, num_threads: int = BACKEND_NUM_THREADS):
+        super().__init__(model_path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._input_shape = tuple(self.input_detail["shape"])
+        self._lock = threading.Lock()
+
+    def _resize(self, shape: tuple) -> None:
+        """
+        Resizes the interpreter input to a new batch shape and re-allocates tensors.
+        """
+        self.interpreter.resize_tensor_input(self.input_detail["index"], shape)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._input_shape = shape
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if tuple(input_batch.shape) != self._input_shape:
+                self._resize(tuple(input_batch.shape))
+
+            input_dtype = self.input_detail["dtype"]
+            scale, zero_point = self.input_detail["quantization"]
+            if scale:
+                values = np.round(input_batch.astype(np.float32) / scale + zero_point)
+                info = np.iinfo(input_dtype)
+                input_batch = np.clip(values, info.min, info.max)
+
+            self.interpreter.set_tensor(
+                self.input_detail["index"], input_batch.astype(input_dtype, copy=False)
+            )
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail["index"])
+
+            scale, zero_point = self.output_detail["quantization"]
+            if scale:
+                output = (output.astype(np.float32) - zero_point) * scale
+            return np.array(output, dtype=np.float32)
+
+    def warmup(self, input_size: tuple, batch_sizes: list, samples: np.ndarray = None) -> None:
+        # The interpreter re-allocates on every batch-size change, so only the smallest
+        # size is worth preparing ahead of time.
+        super().warmup(input_size, sorted(batch_sizes)[:1], samples)
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    Serves an ONNX export of the model with ONNX Runtime on the CPU.
+    """
+
+    kind = "onnx"
+
+    def __init__(self, model_path: str, num_threads: int = BACKEND_NUM_THREADS):
+        super().__init__(model_path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        feed = {self.input_name: input_batch.astype(np.float32, copy=False)}
+        return self.session.run(None, feed)[0]
+
+
+class RemoteBackend(InferenceBackend):
+    """
+    Forwards batches to a model held by a separate model server process (see model_server.py).
+
+    The API worker keeps no model in memory; tensors are handed over through shared memory
+    by `ModelServerClient`. The connection is opened on the first call, so importing the
+    model modules does not require the model server to be up yet.
+
+    Args:
+        model_name (str): Model file stem, as loaded by the model server.
+    """
+
+    kind = "remote"
+
+    def __init__(self, model_name: str):
+        super().__init__(f"model-server:{model_name}")
+        self.model_name = model_name
+
+    def predict(self, input_batch: np.ndarray) -> np.ndarray:
+        from utils.model_server_client import get_model_server_client
+
+        return get_model_server_client().predict(self.model_name, input_batch)
+
+    def predict_with_features(self, input_batch: np.ndarray) -> tuple:
+        from utils.model_server_client import get_model_server_client
+
+        return get_model_server_client().predict_with_features(self.model_name, input_batch)
+
+    @property
+    def memory_bytes(self) -> int:
+        # The model is held by the model server
+        return 0
+
+    def warmup(self, input_size: tuple, batch_sizes: list, samples: np.ndarray = None) -> None:
+        # The model server warms its own models; one small call opens the connection
+        # and checks that the model is being served.
+        super().warmup(input_size, sorted(batch_sizes)[:1], samples)
+
+
+# Backend class for each backend name
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "tflite-int8": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def get_model_path(model_name: str, backend: str, models_dir: str = MODELS_DIR) -> str:
+    """
+    Builds the path of a model file for a backend.
+
+    Args:
+        model_name (str): Model file stem, e.g. "disease_classification_model".
+        backend (str): Backend name (see BACKEND_FILE_SUFFIXES).
+        models_dir (str): Directory containing the model files.
+
+    Returns:
+        str: Path such as "./models/disease_classification_model.int8.tflite".
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend not in BACKEND_FILE_SUFFIXES:
+        raise ValueError(
+            f"Unknown inference backend '{backend}'. "
+            f"Expected one of: {', '.join(BACKEND_FILE_SUFFIXES)}."
+        )
+    return os.path.join(models_dir, model_name + BACKEND_FILE_SUFFIXES[backend])
+
+
+def load_backend(
+    model_name: str, backend: str = "keras", models_dir: str = MODELS_DIR
+) -> InferenceBackend:
+    """
+    Loads a model with the requested inference backend.
+
+    Args:
+        model_name (str): Model file stem, e.g. "disease_classification_model".
+        backend (str): One of "keras", "tflite", "tflite-int8" or "onnx".
+        models_dir (str): Directory containing the model files.
+
+    Returns:
+        InferenceBackend: The loaded model.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    model_path = get_model_path(model_name, backend, models_dir)
+    return BACKENDS[backend](model_path)
+
+
+def load_backend_file(model_path: str, backend: str = "keras") -> InferenceBackend:
+    """
+    Loads a specific model file, e.g. a new version of a model, with the requested backend.
+
+    Args:
+        model_path (str): Path to the model file.
+        backend (str): One of "keras", "tflite", "tflite-int8" or "onnx".
+
+    Returns:
+        InferenceBackend: The loaded model.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend '{backend}'. Expected one of: {', '.join(BACKENDS)}."
+        )
+    return BACKENDS[backend](model_path)
+
+
+def model_file_version(model_path: str):
+    """
+    Identifies a model file by its content, so records can name the model that produced them.
+
+    Args:
+        model_path (str): Path to the model file.
+
+    Returns:
+        str or None: The first 12 hex digits of the file's SHA-256, or None if the model
+            is not a single local file.
+    """
+    if not os.path.isfile(model_path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def load_configured_backend(model_name: str, backend: str = "keras") -> InferenceBackend:
+    """
+    Loads a model for the API, or connects to it in the model server when one is configured.
+
+    Args:
+        model_name (str): Model file stem, e.g. "disease_classification_model".
+        backend (str): Backend to load locally when MODEL_SERVER_ADDRESS is not set.
+
+    Returns:
+        InferenceBackend: A `RemoteBackend` or the locally loaded model.
+    """
+    if MODEL_SERVER_ADDRESS:
+        return RemoteBackend(model_name)
+    return load_backend(model_name, backend)
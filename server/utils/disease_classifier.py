@@ -1,12 +1,17 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
+from config import DISEASE_BACKEND
+from utils.model_registry import model_registry
 from utils.image_preprocessor import preprocess_image
 
-# Load the disease classification model
-DISEASE_CLASSIFICATION_MODEL_PATH = "./models/disease_classification_model.keras"
-disease_classification_model = tf.keras.models.load_model(
-    DISEASE_CLASSIFICATION_MODEL_PATH
+# Model input resolution (width, height)
+DISEASE_INPUT_SIZE = (256, 256)
+
+# Register the disease classification model with the configured inference backend;
+# it is loaded in the background at start-up or on first use (see MODEL_LOADING)
+DISEASE_CLASSIFICATION_MODEL_NAME = "disease_classification_model"
+disease_model = model_registry.register(
+    DISEASE_CLASSIFICATION_MODEL_NAME, DISEASE_BACKEND, DISEASE_INPUT_SIZE
 )
 
 # Define the disease classes
@@ -26,6 +31,36 @@ DISEASE_CLASSES = sorted(
 )
 
 
+def predict_disease_batch(input_batch: np.ndarray) -> np.ndarray:
+    """
+    Run the disease classification model on a batch of preprocessed images with the configured backend.
+
+    Args:
+        input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+    Returns:
+        np.ndarray: Softmax probabilities with shape (N, len(DISEASE_CLASSES)).
+    """
+    return disease_model.get().predict(input_batch)
+
+
+def decode_disease_prediction(prediction: np.ndarray) -> dict:
+    """
+    Convert one row of disease classification probabilities into a result and confidence score.
+
+    Args:
+        prediction (np.ndarray): Softmax probabilities for a single image.
+
+    Returns:
+        dict: Dictionary containing:
+            - 'result' (str): Predicted disease name.
+            - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
+    """
+    predicted_idx = np.argmax(prediction)
+    confidence = float(prediction[predicted_idx])
+    return {"result": DISEASE_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+
+
 def classify_disease(
     image_input: Image.Image, width: int = 256, height: int = 256
 ) -> dict:
@@ -46,7 +81,5 @@ def classify_disease(
             - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
     """
     input_tensor = preprocess_image(image_input, width=width, height=height, normalize=False)
-    prediction = disease_classification_model.predict(input_tensor)[0]
-    predicted_idx = np.argmax(prediction)
-    confidence = float(prediction[predicted_idx])
-    return {"result": DISEASE_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+    prediction = predict_disease_batch(input_tensor)[0]
+    return decode_disease_prediction(prediction)
@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Optional
+from config import EVENT_BUFFER_SIZE, EVENT_SUBSCRIBER_QUEUE_SIZE
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of events for server-sent event streams.
+
+    Every published event gets an ID of the form "<epoch>-<sequence>", where the epoch
+    identifies this process, and is kept in a ring buffer of the last `buffer_size` events.
+    A subscriber that reconnects with the ID of the last event it saw is first sent the
+    events it missed from the buffer. If that ID is from another process or has already
+    left the buffer, the subscriber is told to reset (re-fetch its state) instead.
+
+    Each subscriber has a bounded queue. A subscriber that falls `queue_size` events behind
+    is sent a reset and dropped rather than buffering without bound; it can subscribe again
+    to follow new events. Publishing must happen on the event loop that the subscribers
+    run on.
+
+    Args:
+        buffer_size (int): Number of recent events kept for resuming subscribers.
+        queue_size (int): Maximum number of undelivered events per subscriber.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = EVENT_BUFFER_SIZE,
+        queue_size: int = EVENT_SUBSCRIBER_QUEUE_SIZE,
+    ):
+        self.buffer_size = max(1, int(buffer_size))
+        self.queue_size = max(1, int(queue_size))
+        self.epoch = f"{int(time.time()):x}{os.getpid():x}"
+        self._sequence = itertools.count(1)
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._subscribers = set()
+        self.published = 0
+
+    def publish(self, event: str, data: dict) -> str:
+        """
+        Publishes an event to every subscriber.
+
+        Args:
+            event (str): Event type, e.g. "prediction".
+            data (dict): JSON-serializable payload.
+
+        Returns:
+            str: The event ID.
+        """
+        event_id = f"{self.epoch}-{next(self._sequence)}"
+        message = (event_id, event, json.dumps(data, default=str))
+        self._buffer.append(message)
+        self.published += 1
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind: replace the backlog with a reset and stop delivering
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return event_id
+
+    def _missed_since(self, last_event_id: str) -> Optional[list]:
+        """
+        Returns the buffered events after `last_event_id`, or None if they cannot be replayed.
+        """
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+
+        sequence = int(sequence)
+        if not self._buffer:
+            return [] if sequence == self.published else None
+        first = self.published - len(self._buffer) + 1
+        if sequence < first - 1 or sequence > self.published:
+            return None
+        return list(self._buffer)[sequence - first + 1 :]
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> asyncio.Queue:
+        """
+        Registers a subscriber.
+
+        Args:
+            last_event_id (str, optional): ID of the last event the client received.
+
+        Returns:
+            asyncio.Queue: Receives (event ID, event type, JSON data) tuples, starting with
+                any missed events; None means the subscriber must reset and was dropped.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size + self.buffer_size)
+        if last_event_id:
+            missed = self._missed_since(last_event_id)
+            if missed is None:
+                queue.put_nowait(None)
+                return queue
+            for message in missed:
+                queue.put_nowait(message)
+
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """
+        Removes a subscriber registered with `subscribe`.
+        """
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# Feed of newly saved prediction records for the history stream
+prediction_events = EventBus()
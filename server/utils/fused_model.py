@@ -0,0 +1,125 @@
+import numpy as np
+import tensorflow as tf
+
+
+def _center_crop_resize(image: tf.Tensor, size: tuple) -> tf.Tensor:
+    """
+    Centre-crops a single image to the aspect ratio of `size` and resizes it inside the graph.
+
+    Mirrors `resize_crop` from the image preprocessor: the central region is kept, then
+    resized with a Lanczos kernel. The result is rounded and clipped to the uint8 range so
+    the models see the same value range as with PIL preprocessing.
+
+    Args:
+        image (tf.Tensor): uint8 tensor of shape (H, W, 3).
+        size (tuple): Target (width, height).
+
+    Returns:
+        tf.Tensor: float32 tensor of shape (1, height, width, 3).
+    """
+    width, height = size
+    image_height = tf.shape(image)[0]
+    image_width = tf.shape(image)[1]
+    target_aspect_ratio = width / height
+    original_aspect_ratio = tf.cast(image_width, tf.float32) / tf.cast(image_height, tf.float32)
+
+    crop_width = tf.where(
+        original_aspect_ratio > target_aspect_ratio,
+        tf.cast(tf.cast(image_height, tf.float32) * target_aspect_ratio, tf.int32),
+        image_width,
+    )
+    crop_height = tf.where(
+        original_aspect_ratio > target_aspect_ratio,
+        image_height,
+        tf.cast(tf.cast(image_width, tf.float32) / target_aspect_ratio, tf.int32),
+    )
+    offset_x = (image_width - crop_width) // 2
+    offset_y = (image_height - crop_height) // 2
+
+    cropped = tf.image.crop_to_bounding_box(image, offset_y, offset_x, crop_height, crop_width)
+    resized = tf.image.resize(
+        tf.expand_dims(tf.cast(cropped, tf.float32), 0),
+        (height, width),
+        method="lanczos3",
+        antialias=True,
+    )
+    return tf.round(tf.clip_by_value(resized, 0.0, 255.0))
+
+
+def keras_model(backend) -> tf.keras.Model:
+    """
+    Returns the Keras model served by a backend.
+
+    Raises:
+        ValueError: If the backend does not hold a Keras model.
+    """
+    model = getattr(backend, "model", None)
+    if not isinstance(model, tf.keras.Model):
+        raise ValueError(f"Fused inference requires the Keras backend, got {backend!r}.")
+    return model
+
+
+def build_fused_predictor(
+    disease_backend,
+    variety_backend,
+    age_backend,
+    disease_size: tuple,
+    variety_size: tuple,
+    age_size: tuple,
+):
+    """
+    Wraps the disease, variety and age models into one compiled TensorFlow graph.
+
+    The returned function takes a raw uint8 RGB image of any size, performs the centre crop
+    and resizes inside the graph (sharing the resized tensor when two models use the same
+    resolution), and returns the three softmax outputs, plus the disease model's
+    penultimate-layer features, from a single dispatch. Because the sub-models are
+    independent branches of one graph, TensorFlow can schedule them concurrently across
+    cores.
+
+    Args:
+        disease_backend (KerasBackend): Disease classification model.
+        variety_backend (KerasBackend): Variety identification model.
+        age_backend (KerasBackend): Age prediction model.
+        disease_size (tuple): Disease model input (width, height).
+        variety_size (tuple): Variety model input (width, height).
+        age_size (tuple): Age model input (width, height).
+
+    Returns:
+        Callable[[np.ndarray], tuple]: Maps a (H, W, 3) uint8 array to the
+            (disease, variety, age) probability vectors and the disease features (None if
+            the disease model does not expose them).
+
+    Raises:
+        ValueError: If a model is not served by the Keras backend.
+    """
+    disease_model = keras_model(disease_backend)
+    variety_model = keras_model(variety_backend)
+    age_model = keras_model(age_backend)
+    disease_features_model = getattr(disease_backend, "feature_model", None)
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, None, 3), dtype=tf.uint8)])
+    def fused_graph(image):
+        resized = {}
+        for size in (disease_size, variety_size, age_size):
+            if size not in resized:
+                resized[size] = _center_crop_resize(image, size)
+
+        if disease_features_model is not None:
+            disease, features = disease_features_model(resized[disease_size], training=False)
+            features = tf.reshape(features[0], [-1])
+        else:
+            disease, features = disease_model(resized[disease_size], training=False), None
+
+        return (
+            disease[0],
+            variety_model(resized[variety_size], training=False)[0],
+            age_model(resized[age_size], training=False)[0],
+            features,
+        )
+
+    def predict(image_array: np.ndarray) -> tuple:
+        outputs = fused_graph(tf.convert_to_tensor(image_array, dtype=tf.uint8))
+        return tuple(None if output is None else output.numpy() for output in outputs)
+
+    return predict
@@ -0,0 +1,86 @@
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config import MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS, JPEG_DRAFT_DECODE
+from utils.image_preprocessor import remove_transparency
+
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ImageDecodeError(ValueError):
+    """
+    Raised when an upload cannot be decoded as an image.
+    """
+
+
+class ImageTooLargeError(ImageDecodeError):
+    """
+    Raised when an upload exceeds the configured byte or pixel budget.
+    """
+
+
+def decode_image(
+    contents: bytes,
+    min_size: tuple = None,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_pixels: int = MAX_IMAGE_PIXELS,
+) -> Image.Image:
+    """
+    Decode uploaded image bytes into an RGB PIL image within a memory budget.
+
+    The byte size is checked first and the pixel count is checked from the image header,
+    before any pixel data is decoded, so decompression bombs are rejected early. For JPEG
+    files, the decoder's DCT scaling (draft mode) decodes straight to the smallest size that
+    still covers `min_size`, instead of decoding the full-resolution photo and shrinking it
+    later. EXIF orientation is applied, and the image is only converted to RGB when it is
+    not already RGB, avoiding an extra full-size copy.
+
+    Args:
+        contents (bytes): Raw bytes of the uploaded file.
+        min_size (tuple, optional): (width, height) the decoded image must at least cover.
+            If omitted, the image is decoded at full resolution.
+        max_bytes (int): Largest accepted upload in bytes.
+        max_pixels (int): Largest accepted image in pixels.
+
+    Returns:
+        PIL.Image.Image: The decoded image in RGB mode.
+
+    Raises:
+        ImageTooLargeError: If the upload exceeds the byte or pixel budget.
+        ImageDecodeError: If the upload is not a readable image.
+    """
+    if len(contents) > max_bytes:
+        raise ImageTooLargeError(
+            f"Image is {len(contents)} bytes; the limit is {max_bytes} bytes."
+        )
+
+    try:
+        image = Image.open(BytesIO(contents))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageDecodeError("Uploaded file is not a valid image.") from e
+
+    if image.width * image.height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {image.width}x{image.height} pixels; the limit is {max_pixels} pixels."
+        )
+
+    if JPEG_DRAFT_DECODE and min_size and image.format == "JPEG":
+        # Request a square covering the larger side so the result still covers
+        # `min_size` after a 90-degree EXIF rotation
+        side = max(min_size)
+        image.draft("RGB", (side, side))
+
+    try:
+        image.load()
+        if image.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1:
+            image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError("Uploaded image could not be decoded.") from e
+
+    if image.mode != "RGB":
+        image = remove_transparency(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    return image
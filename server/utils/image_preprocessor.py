@@ -23,41 +23,75 @@ def remove_transparency(image: Image.Image) -> Image.Image:
     return image
 
 
-def resize_crop(image: Image.Image, width: int, height: int) -> Image.Image:
+def center_crop_box(image_width: int, image_height: int, width: int, height: int) -> tuple:
     """
-    Crops the input image to match the target aspect ratio and resizes it to the specified dimensions.
-
-    This function preserves the central portion of the image while cropping excess width or height
-    based on the difference between the image's original aspect ratio and the desired output aspect ratio.
-    After cropping, the image is resized to the exact target dimensions using high-quality resampling.
+    Computes the centred crop box that matches the aspect ratio of (width, height).
 
     Args:
-        image (PIL.Image.Image): The input image to crop and resize.
-        width (int): The desired output width.
-        height (int): The desired output height.
+        image_width (int): Width of the source image.
+        image_height (int): Height of the source image.
+        width (int): The target width, used only for its aspect ratio.
+        height (int): The target height, used only for its aspect ratio.
 
     Returns:
-        PIL.Image.Image: The resized and aspect-ratio-adjusted image.
+        tuple: (left, upper, right, lower) pixel coordinates of the crop.
     """
-    original_aspect_ratio = image.width / image.height
+    original_aspect_ratio = image_width / image_height
     target_aspect_ratio = width / height
 
     if original_aspect_ratio > target_aspect_ratio:
         # Crop horizontally
-        new_width = int(image.height * target_aspect_ratio)
-        left = (image.width - new_width) // 2
+        new_width = int(image_height * target_aspect_ratio)
+        left = (image_width - new_width) // 2
         upper = 0
         right = left + new_width
-        lower = image.height
+        lower = image_height
     else:
         # Crop vertically
-        new_height = int(image.width / target_aspect_ratio)
+        new_height = int(image_width / target_aspect_ratio)
         left = 0
-        upper = (image.height - new_height) // 2
-        right = image.width
+        upper = (image_height - new_height) // 2
+        right = image_width
         lower = upper + new_height
 
-    cropped_image = image.crop((left, upper, right, lower))
+    return left, upper, right, lower
+
+
+def center_crop(image: Image.Image, width: int, height: int) -> Image.Image:
+    """
+    Crops the central portion of the image to match the aspect ratio of (width, height).
+
+    Excess width or height is removed evenly from both sides, depending on whether the image
+    is wider or taller than the target aspect ratio. No resizing is performed.
+
+    Args:
+        image (PIL.Image.Image): The input image to crop.
+        width (int): The target width, used only for its aspect ratio.
+        height (int): The target height, used only for its aspect ratio.
+
+    Returns:
+        PIL.Image.Image: The cropped image.
+    """
+    return image.crop(center_crop_box(image.width, image.height, width, height))
+
+
+def resize_crop(image: Image.Image, width: int, height: int) -> Image.Image:
+    """
+    Crops the input image to match the target aspect ratio and resizes it to the specified dimensions.
+
+    This function preserves the central portion of the image while cropping excess width or height
+    based on the difference between the image's original aspect ratio and the desired output aspect ratio.
+    After cropping, the image is resized to the exact target dimensions using high-quality resampling.
+
+    Args:
+        image (PIL.Image.Image): The input image to crop and resize.
+        width (int): The desired output width.
+        height (int): The desired output height.
+
+    Returns:
+        PIL.Image.Image: The resized and aspect-ratio-adjusted image.
+    """
+    cropped_image = center_crop(image, width, height)
     resized_image = cropped_image.resize((width, height), Image.Resampling.LANCZOS)
     return resized_image
 
@@ -91,3 +125,92 @@ def preprocess_image(
         image_array = image_array.astype("float32") / 255.0
 
     return np.expand_dims(image_array, axis=0)
+
+
+def preprocess_image_multi(
+    image: Image.Image, sizes: list, normalize: bool = True
+) -> dict:
+    """
+    Preprocesses one image for several models, producing each distinct resolution only once.
+
+    Transparency is removed once, the centre crop is computed once per distinct aspect ratio,
+    and each distinct (width, height) pair is resized exactly once. Models that share an
+    input resolution therefore share the same tensor. The output for every size is identical
+    to calling `preprocess_image` with that size.
+
+    Args:
+        image (PIL.Image.Image): The input image to preprocess.
+        sizes (list): Target (width, height) pairs; duplicates are produced once.
+        normalize (bool, optional): Whether to scale pixel values to [0, 1]. Defaults to True.
+
+    Returns:
+        dict: Maps each distinct (width, height) pair to a tensor of shape (1, height, width, 3).
+    """
+    image = remove_transparency(image)
+    crops = {}
+    tensors = {}
+
+    for width, height in dict.fromkeys(tuple(size) for size in sizes):
+        aspect_ratio = width / height
+        if aspect_ratio not in crops:
+            crops[aspect_ratio] = center_crop(image, width, height)
+
+        resized = crops[aspect_ratio].resize((width, height), Image.Resampling.LANCZOS)
+        image_array = np.array(resized)
+
+        if normalize:
+            image_array = image_array.astype("float32") / 255.0
+
+        tensors[(width, height)] = np.expand_dims(image_array, axis=0)
+
+    return tensors
+
+
+def _to_rgb_image(image) -> Image.Image:
+    """
+    Returns one decoded image as an RGB PIL image without transparency.
+    """
+    if not isinstance(image, Image.Image):
+        if image.dtype != np.uint8 or image.ndim != 3 or image.shape[2] != 3:
+            raise ValueError("Image arrays must be uint8 with shape (H, W, 3).")
+        return Image.fromarray(image)
+
+    image = remove_transparency(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def preprocess_batch(
+    images: list, width: int = 256, height: int = 256, out: np.ndarray = None
+) -> np.ndarray:
+    """
+    Preprocesses N decoded images into one contiguous uint8 batch for model inference.
+
+    Each image has its transparency removed and is centre-cropped and LANCZOS-resized
+    exactly as in `preprocess_image`, then written straight into its row of the output
+    array, so no per-image tensors are stacked afterwards.
+
+    Args:
+        images (list): PIL images, or uint8 arrays of shape (H, W, 3).
+        width (int, optional): Target width after resizing. Defaults to 256.
+        height (int, optional): Target height after resizing. Defaults to 256.
+        out (np.ndarray, optional): Preallocated uint8 array of shape (N, height, width, 3)
+            to write into, e.g. a reusable batch buffer. Allocated when omitted.
+
+    Returns:
+        np.ndarray: The batch of shape (N, height, width, 3), unnormalized uint8.
+
+    Raises:
+        ValueError: If `out` has the wrong shape or dtype, or an image array is not RGB uint8.
+    """
+    shape = (len(images), height, width, 3)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif out.shape != shape or out.dtype != np.uint8:
+        raise ValueError(f"Output buffer must be uint8 with shape {shape}.")
+
+    for index, image in enumerate(images):
+        out[index] = np.asarray(resize_crop(_to_rgb_image(image), width, height))
+
+    return out
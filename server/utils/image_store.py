@@ -0,0 +1,231 @@
+import asyncio
+import mimetypes
+import traceback
+from io import BytesIO
+from PIL import Image
+from utils.image_decoder import decode_image
+from utils.inference_pool import preprocess_pool
+from db import fs, thumbnail_fs
+from config import THUMBNAIL_ON_UPLOAD
+import gridfs
+
+# Leading bytes that identify common image formats
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+
+
+def guess_content_type(data: bytes, filename: str = None) -> str:
+    """
+    Determine the MIME type of an image from its leading bytes, falling back to the filename.
+
+    Args:
+        data (bytes): The file contents, or at least its first few bytes.
+        filename (str, optional): Original file name, used when the bytes are not recognised.
+
+    Returns:
+        str: The MIME type, or "application/octet-stream" if unknown.
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+
+    if filename:
+        guessed, _ = mimetypes.guess_type(filename)
+        if guessed:
+            return guessed
+    return "application/octet-stream"
+
+
+async def upload_image(file_id, filename: str, contents: bytes):
+    """
+    Store an uploaded image in GridFS under a pre-allocated ID, with its content type
+    recorded in the metadata.
+
+    Args:
+        file_id (ObjectId): The ID to store the image under.
+        filename (str): Original name of the uploaded file.
+        contents (bytes): Raw bytes of the image.
+
+    Returns:
+        ObjectId: The GridFS file ID.
+    """
+    await fs.upload_from_stream_with_id(
+        file_id,
+        filename,
+        BytesIO(contents),
+        metadata={"content_type": guess_content_type(contents, filename)},
+    )
+    return file_id
+
+
+# Longest side (in pixels) of each resized image variant
+IMAGE_VARIANTS = {"thumb": 256, "medium": 768}
+
+# JPEG quality of resized variants
+VARIANT_JPEG_QUALITY = 80
+
+# Variant generations in progress, so concurrent requests share one render
+_pending_variants = {}
+
+# Background tasks started at upload time
+_background_tasks = set()
+
+
+def render_variant(contents: bytes, max_side: int) -> bytes:
+    """
+    Render a downscaled JPEG copy of an image whose longest side is at most `max_side`.
+
+    The original is decoded through the memory-bounded decoder (JPEG draft mode downscales
+    while decoding, EXIF orientation is applied since the variant carries no EXIF data), and
+    the result is resized with LANCZOS.
+
+    Args:
+        contents (bytes): Raw bytes of the original image.
+        max_side (int): Maximum width and height of the variant.
+
+    Returns:
+        bytes: The encoded JPEG variant.
+    """
+    image = decode_image(contents, (max_side, max_side))
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=VARIANT_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def variant_name(file_id, size: str) -> str:
+    """
+    Name under which a variant of an image is stored in the thumbnail bucket.
+    """
+    return f"{file_id}_{size}"
+
+
+async def _create_variant(file_id, size: str, contents: bytes = None) -> None:
+    """
+    Render a variant of an image and store it in the thumbnail bucket.
+    """
+    if contents is None:
+        grid_out = await fs.open_download_stream(file_id)
+        contents = await grid_out.read()
+
+    data = await preprocess_pool.run(render_variant, contents, IMAGE_VARIANTS[size])
+    await thumbnail_fs.upload_from_stream(
+        variant_name(file_id, size),
+        BytesIO(data),
+        metadata={"content_type": "image/jpeg", "source_id": file_id, "size": size},
+    )
+
+
+async def ensure_variant(file_id, size: str, contents: bytes = None) -> None:
+    """
+    Make sure a variant exists, generating it at most once per process at a time.
+
+    Args:
+        file_id (ObjectId): GridFS ID of the original image.
+        size (str): Variant name, a key of IMAGE_VARIANTS.
+        contents (bytes, optional): Original image bytes, if already in memory.
+    """
+    key = variant_name(file_id, size)
+    task = _pending_variants.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_create_variant(file_id, size, contents))
+        _pending_variants[key] = task
+        task.add_done_callback(lambda _: _pending_variants.pop(key, None))
+    await asyncio.shield(task)
+
+
+async def open_image_variant(file_id, size: str, contents: bytes = None):
+    """
+    Open a resized variant of an image, generating and storing it on first request.
+
+    Args:
+        file_id (ObjectId): GridFS ID of the original image.
+        size (str): Variant name, a key of IMAGE_VARIANTS.
+        contents (bytes, optional): Original image bytes, if not yet written to GridFS.
+
+    Returns:
+        GridOut: An open download stream of the variant.
+
+    Raises:
+        gridfs.errors.NoFile: If the original image does not exist.
+        ImageDecodeError: If the original image cannot be decoded to render the variant.
+    """
+    try:
+        return await thumbnail_fs.open_download_stream_by_name(variant_name(file_id, size))
+    except gridfs.errors.NoFile:
+        await ensure_variant(file_id, size, contents)
+    return await thumbnail_fs.open_download_stream_by_name(variant_name(file_id, size))
+
+
+async def delete_variants(file_id) -> None:
+    """
+    Delete every stored variant of an image, e.g. of one whose original could not be stored.
+    Variants still being rendered by this process are waited for first.
+
+    Args:
+        file_id (ObjectId): GridFS ID of the original image.
+    """
+    for size in IMAGE_VARIANTS:
+        name = variant_name(file_id, size)
+        task = _pending_variants.get(name)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        while True:
+            try:
+                grid_out = await thumbnail_fs.open_download_stream_by_name(name)
+            except gridfs.errors.NoFile:
+                break
+            await thumbnail_fs.delete(grid_out._id)
+
+
+def schedule_variant(file_id, size: str, contents: bytes) -> None:
+    """
+    Generate a variant in the background from bytes that are already in memory.
+
+    Args:
+        file_id (ObjectId): GridFS ID of the original image.
+        size (str): Variant name, a key of IMAGE_VARIANTS.
+        contents (bytes): Original image bytes.
+    """
+
+    async def run():
+        try:
+            await ensure_variant(file_id, size, contents)
+        except Exception:
+            traceback.print_exc()
+
+    task = asyncio.ensure_future(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def store_original(file_id, filename: str, contents: bytes):
+    """
+    Store an uploaded image, then generate its history thumbnail in the background when
+    THUMBNAIL_ON_UPLOAD is set.
+
+    The thumbnail is only generated once the original is stored, so none is left behind
+    for an upload whose prediction or storage failed.
+
+    Args:
+        file_id (ObjectId): The ID to store the image under.
+        filename (str): Original name of the uploaded file.
+        contents (bytes): Raw bytes of the image.
+
+    Returns:
+        ObjectId: The GridFS file ID.
+    """
+    await upload_image(file_id, filename, contents)
+    if THUMBNAIL_ON_UPLOAD:
+        schedule_variant(file_id, "thumb", contents)
+    return file_id
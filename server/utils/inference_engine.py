@@ -0,0 +1,410 @@
+import asyncio
+import threading
+import traceback
+from functools import partial
+import numpy as np
+from PIL import Image
+from config import FUSED_INFERENCE, MODEL_SERVER_ADDRESS, MODEL_WARMUP, VECTOR_INDEX
+from utils.image_preprocessor import preprocess_image, preprocess_image_multi
+from utils.micro_batcher import MicroBatcher
+from utils.inference_pool import inference_pool, preprocess_pool, get_pool_stats
+from utils.metrics import timed
+from utils.model_registry import ModelHandle, model_registry
+from utils.disease_classifier import DISEASE_INPUT_SIZE, disease_model, decode_disease_prediction
+from utils.variety_identifier import VARIETY_INPUT_SIZE, variety_model, decode_variety_prediction
+from utils.age_estimator import AGE_INPUT_SIZE, age_model, decode_age_prediction
+
+
+def predict_versioned_batch(
+    handle: ModelHandle, input_batch: np.ndarray, with_features: bool = False
+) -> tuple:
+    """
+    Runs the serving version of a model on a batch and labels each row with that version.
+
+    Args:
+        handle (ModelHandle): The model to run.
+        input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+        with_features (bool): Also return the model's penultimate-layer features.
+
+    Returns:
+        tuple: (probabilities, versions), or (probabilities, features, versions) with
+            `with_features`; features is None if the backend cannot expose them, and
+            `versions` holds the version label of the model that ran, once per row.
+    """
+    current = handle.get_version()
+    if with_features:
+        outputs = current.backend.predict_with_features(input_batch)
+    else:
+        outputs = (current.backend.predict(input_batch),)
+    return (*outputs, np.full(len(input_batch), current.version, dtype=object))
+
+
+def predict_disease_versioned_batch(input_batch: np.ndarray) -> tuple:
+    """
+    Runs the disease model on a batch, computing its features only when VECTOR_INDEX keeps
+    them, so that the default configuration runs (and transfers) the plain forward pass.
+
+    Args:
+        input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+    Returns:
+        tuple: (probabilities, features, versions), see `predict_versioned_batch`; features
+            is None when VECTOR_INDEX is disabled.
+    """
+    if VECTOR_INDEX:
+        return predict_versioned_batch(disease_model, input_batch, with_features=True)
+    probabilities, versions = predict_versioned_batch(disease_model, input_batch)
+    return probabilities, None, versions
+
+
+# One batcher per model so concurrent requests share forward passes,
+# all running on the dedicated inference pool. Each caller also gets the version of the
+# model that ran, and the disease batcher returns the image features kept for similarity
+# search
+disease_batcher = MicroBatcher(predict_disease_versioned_batch, name="disease", pool=inference_pool)
+variety_batcher = MicroBatcher(
+    partial(predict_versioned_batch, variety_model), name="variety", pool=inference_pool
+)
+age_batcher = MicroBatcher(
+    partial(predict_versioned_batch, age_model), name="age", pool=inference_pool
+)
+
+# Fused three-model graph, built on first use when FUSED_INFERENCE is enabled, with the
+# versions of the models it was built from
+_fused_predictor = None
+_fused_lock = threading.Lock()
+
+# Background task that loads the models (and warms the fused graph) at start-up
+_startup_task = None
+
+
+def _build_fused_predictor() -> tuple:
+    """
+    Builds the fused graph from the serving version of each model.
+
+    Returns:
+        tuple: (predictor, model_versions), see `get_fused_predictor`.
+    """
+    from utils.fused_model import build_fused_predictor
+
+    disease = disease_model.get_version()
+    variety = variety_model.get_version()
+    age = age_model.get_version()
+    predictor = build_fused_predictor(
+        disease.backend,
+        variety.backend,
+        age.backend,
+        DISEASE_INPUT_SIZE,
+        VARIETY_INPUT_SIZE,
+        AGE_INPUT_SIZE,
+    )
+    return predictor, {"disease": disease.version, "variety": variety.version, "age": age.version}
+
+
+def get_fused_predictor() -> tuple:
+    """
+    Returns the fused disease/variety/age predictor, building and tracing it on first use.
+
+    Returns:
+        tuple: (predictor, model_versions): the function described in
+            `build_fused_predictor` and the versions of the models it runs.
+    """
+    global _fused_predictor
+    with _fused_lock:
+        if _fused_predictor is None:
+            _fused_predictor = _build_fused_predictor()
+    return _fused_predictor
+
+
+def _rebuild_fused_predictor(handle) -> None:
+    """
+    Rebuilds and warms the fused graph after a model was swapped, then replaces the old
+    graph, which keeps serving until then.
+    """
+    global _fused_predictor
+    if not FUSED_INFERENCE or MODEL_SERVER_ADDRESS or _fused_predictor is None:
+        return
+
+    fused_predictor = _build_fused_predictor()
+    width, height = DISEASE_INPUT_SIZE
+    fused_predictor[0](np.zeros((height, width, 3), dtype=np.uint8))
+    with _fused_lock:
+        _fused_predictor = fused_predictor
+
+
+model_registry.add_swap_listener(_rebuild_fused_predictor)
+
+
+def get_model_versions() -> dict:
+    """
+    Returns the version of each serving model, as recorded with predictions.
+
+    Returns:
+        dict: {disease: str, variety: str, age: str}; None for unversioned models.
+    """
+    return {
+        "disease": disease_model.version,
+        "variety": variety_model.version,
+        "age": age_model.version,
+    }
+
+
+def predict_fused(image_array: np.ndarray) -> tuple:
+    """
+    Runs the fused graph on one raw RGB image, in the model server when one is configured.
+
+    Args:
+        image_array (np.ndarray): uint8 image of shape (H, W, 3).
+
+    Returns:
+        tuple: (disease, variety, age) probability vectors, the disease features (None
+            if the disease model does not expose them) and the versions of the models that
+            ran. With a model server, these are the versions serving when the call started.
+    """
+    if MODEL_SERVER_ADDRESS:
+        from utils.model_server_client import get_model_server_client
+
+        model_versions = get_model_versions()
+        return (*get_model_server_client().predict_fused(image_array), model_versions)
+    predictor, model_versions = get_fused_predictor()
+    return (*predictor(image_array), model_versions)
+
+
+async def _submit_timed(stage: str, batcher: MicroBatcher, input_tensor: np.ndarray):
+    """
+    Submits a tensor to a batcher, timing the wait (batching plus forward pass) as `stage`.
+    """
+    with timed(stage):
+        return await batcher.submit(input_tensor)
+
+
+async def classify_disease_async(
+    image_input: Image.Image, width: int = 256, height: int = 256
+) -> dict:
+    """
+    Predict the disease class of a paddy plant image through the batching engine.
+
+    Args:
+        image_input (PIL.Image.Image): Input image to classify.
+        width (int): Target width for resizing. Default is 256.
+        height (int): Target height for resizing. Default is 256.
+
+    Returns:
+        dict: Dictionary with 'result' (str) and 'confidence' (float).
+    """
+    with timed("preprocess"):
+        input_tensor = await preprocess_pool.run(
+            preprocess_image, image_input, width=width, height=height, normalize=False
+        )
+    with timed("infer_disease"):
+        prediction, _, _ = await disease_batcher.submit(input_tensor)
+    return decode_disease_prediction(prediction)
+
+
+async def identify_variety_async(
+    image_input: Image.Image, width: int = 128, height: int = 128
+) -> dict:
+    """
+    Predict the variety of a paddy plant image through the batching engine.
+
+    Args:
+        image_input (PIL.Image.Image): Input image to classify.
+        width (int): Target width for resizing. Default is 128.
+        height (int): Target height for resizing. Default is 128.
+
+    Returns:
+        dict: Dictionary with 'result' (str) and 'confidence' (float).
+    """
+    with timed("preprocess"):
+        input_tensor = await preprocess_pool.run(
+            preprocess_image, image_input, width=width, height=height, normalize=False
+        )
+    with timed("infer_variety"):
+        prediction, _ = await variety_batcher.submit(input_tensor)
+    return decode_variety_prediction(prediction)
+
+
+async def estimate_age_async(
+    image_input: Image.Image, width: int = 128, height: int = 128
+) -> dict:
+    """
+    Estimate the age (in days) of a paddy plant image through the batching engine.
+
+    Args:
+        image_input (PIL.Image.Image): Input image of the paddy plant.
+        width (int): Target width for resizing. Default is 128.
+        height (int): Target height for resizing. Default is 128.
+
+    Returns:
+        dict: Dictionary with 'result' (int) and 'confidence' (float).
+    """
+    with timed("preprocess"):
+        input_tensor = await preprocess_pool.run(
+            preprocess_image, image_input, width=width, height=height, normalize=False
+        )
+    with timed("infer_age"):
+        prediction, _ = await age_batcher.submit(input_tensor)
+    return decode_age_prediction(prediction)
+
+
+async def predict_all_async(image_input: Image.Image) -> tuple:
+    """
+    Run disease, variety and age prediction on one image with shared preprocessing.
+
+    Args:
+        image_input (PIL.Image.Image): Input image of the paddy plant.
+
+    Returns:
+        tuple: (disease, variety, age) result dicts, each with 'result' and 'confidence'.
+    """
+    disease, variety, age, _, _ = await predict_all_with_features_async(image_input)
+    return disease, variety, age
+
+
+async def predict_all_with_features_async(image_input: Image.Image) -> tuple:
+    """
+    Run disease, variety and age prediction on one image with shared preprocessing, also
+    returning the disease model's penultimate-layer features of the image and the versions
+    of the models that ran, which differ from the serving ones after a hot swap.
+
+    The image is preprocessed once per distinct model resolution, so the variety and age
+    models reuse the same 128x128 tensor, and the three tensors are submitted to their
+    batchers concurrently. When FUSED_INFERENCE is enabled, the raw image is instead sent
+    through the fused graph, which resizes internally and runs all three models in one
+    dispatch.
+
+    Args:
+        image_input (PIL.Image.Image): Input image of the paddy plant.
+
+    Returns:
+        tuple: (disease, variety, age, features, model_versions): result dicts, each with
+            'result' and 'confidence', the feature vector (None if VECTOR_INDEX is disabled
+            or the disease model's backend cannot expose it) and the model versions, as in
+            `get_model_versions`.
+    """
+    if FUSED_INFERENCE:
+        with timed("preprocess"):
+            image_array = await preprocess_pool.run(np.asarray, image_input, dtype=np.uint8)
+        with timed("infer_fused"):
+            disease, variety, age, features, model_versions = await inference_pool.run(
+                predict_fused, image_array
+            )
+        return (
+            decode_disease_prediction(disease),
+            decode_variety_prediction(variety),
+            decode_age_prediction(age),
+            features,
+            model_versions,
+        )
+
+    with timed("preprocess"):
+        tensors = await preprocess_pool.run(
+            preprocess_image_multi,
+            image_input,
+            [DISEASE_INPUT_SIZE, VARIETY_INPUT_SIZE, AGE_INPUT_SIZE],
+            normalize=False,
+        )
+    (disease, features, disease_version), (variety, variety_version), (age, age_version) = (
+        await asyncio.gather(
+            _submit_timed("infer_disease", disease_batcher, tensors[DISEASE_INPUT_SIZE]),
+            _submit_timed("infer_variety", variety_batcher, tensors[VARIETY_INPUT_SIZE]),
+            _submit_timed("infer_age", age_batcher, tensors[AGE_INPUT_SIZE]),
+        )
+    )
+    return (
+        decode_disease_prediction(disease),
+        decode_variety_prediction(variety),
+        decode_age_prediction(age),
+        features,
+        {"disease": disease_version, "variety": variety_version, "age": age_version},
+    )
+
+
+def warmup_fused() -> None:
+    """
+    Builds the fused graph and runs it once so that tracing happens before the first request.
+    The individual models are warmed up by the model registry as they load.
+    """
+    width, height = DISEASE_INPUT_SIZE
+    predict_fused(np.zeros((height, width, 3), dtype=np.uint8))
+
+
+async def _load_models(loads: list) -> None:
+    """
+    Waits for the model loads started by the registry, then warms the fused graph if enabled.
+    """
+    await asyncio.gather(*(asyncio.wrap_future(load) for load in loads))
+    if FUSED_INFERENCE and MODEL_WARMUP:
+        try:
+            await inference_pool.run(warmup_fused)
+        except Exception:
+            traceback.print_exc()
+            raise
+
+
+async def start_engine() -> None:
+    """
+    Starts loading the models as configured by MODEL_LOADING: concurrently in the background
+    ("background"), concurrently before returning ("eager"), or on first use ("lazy").
+    """
+    global _startup_task
+    if MODEL_SERVER_ADDRESS:
+        from utils.model_server_client import get_model_server_client
+
+        # Fails start-up when the model server settings are incomplete, e.g. no authkey
+        get_model_server_client()
+    if model_registry.mode == "lazy":
+        return
+
+    _startup_task = asyncio.ensure_future(_load_models(model_registry.start_loading()))
+    if model_registry.mode == "eager":
+        await asyncio.shield(_startup_task)
+
+
+def is_engine_ready() -> bool:
+    """
+    Whether every model is loaded and warm, so requests are served without load delays.
+    """
+    if not model_registry.ready:
+        return False
+    if _startup_task is None:
+        return True
+    return (
+        _startup_task.done()
+        and not _startup_task.cancelled()
+        and _startup_task.exception() is None
+    )
+
+
+def get_engine_stats() -> dict:
+    """
+    Returns queue depths of the batchers and counters of the worker pools.
+
+    Returns:
+        dict: 'batchers' maps model name to pending request count, 'pools' lists pool stats.
+    """
+    return {
+        "batchers": {
+            batcher.name: batcher.queue_depth
+            for batcher in (disease_batcher, variety_batcher, age_batcher)
+        },
+        "pools": get_pool_stats(),
+    }
+
+
+async def shutdown_engine() -> None:
+    """
+    Stops model loading, the background batching tasks for all models and the worker
+    pools, and closes the connections to the model server.
+    """
+    if _startup_task is not None and not _startup_task.done():
+        _startup_task.cancel()
+    for batcher in (disease_batcher, variety_batcher, age_batcher):
+        await batcher.close()
+    if MODEL_SERVER_ADDRESS:
+        from utils.model_server_client import get_model_server_client
+
+        get_model_server_client().close()
+    model_registry.shutdown()
+    inference_pool.shutdown()
+    preprocess_pool.shutdown()
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from config import INFERENCE_WORKERS, PREPROCESS_WORKERS
+from utils.metrics import track_queue_depth
+
+
+class InferencePool:
+    """
+    A bounded thread pool for CPU-heavy work that must not run on the asyncio event loop.
+
+    Work submitted through `run` executes on one of `max_workers` dedicated threads while the
+    event loop keeps serving I/O-bound routes. The pool tracks how many jobs are queued,
+    running and completed so its saturation can be observed.
+
+    Args:
+        name (str): Pool name, used for thread names and diagnostics.
+        max_workers (int): Maximum number of concurrently running jobs.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        track_queue_depth(f"pool_{name}", lambda: self.queue_depth)
+
+    def _execute(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        """
+        Runs a job on a worker thread and updates the pool counters.
+        """
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+        return result
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executes `fn(*args, **kwargs)` on the pool and awaits its result.
+
+        Args:
+            fn (Callable): The blocking function to run.
+            *args: Positional arguments for `fn`.
+            **kwargs: Keyword arguments for `fn`.
+
+        Returns:
+            Any: The return value of `fn`.
+        """
+        with self._lock:
+            self._queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._execute, fn, args, kwargs)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of jobs waiting for a free worker.
+        """
+        return self._queued
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool counters.
+
+        Returns:
+            dict: Pool name, size, queued, running, completed and failed job counts.
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self) -> None:
+        """
+        Stops accepting work and waits for running jobs to finish.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Pool running model forward passes
+inference_pool = InferencePool("inference", INFERENCE_WORKERS)
+
+# Pool running image decoding and preprocessing
+preprocess_pool = InferencePool("preprocess", PREPROCESS_WORKERS)
+
+
+def get_pool_stats() -> list:
+    """
+    Returns the counters of every worker pool.
+
+    Returns:
+        list: One stats dict per pool.
+    """
+    return [inference_pool.stats(), preprocess_pool.stats()]
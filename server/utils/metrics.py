@@ -0,0 +1,330 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from config import SERVER_TIMING
+
+# Request header with which a client asks for the Server-Timing header
+SERVER_TIMING_REQUEST_HEADER = b"x-server-timing"
+
+# Latency buckets (seconds) shared by the request and stage histograms
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# Batch size buckets, matching the powers of two the batchers are warmed up for
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+REQUESTS = Counter(
+    "paddy_http_requests_total",
+    "HTTP requests by route, method and status code.",
+    ["route", "method", "status"],
+)
+REQUEST_ERRORS = Counter(
+    "paddy_http_request_errors_total",
+    "HTTP requests that failed with a 5xx status or an unhandled exception.",
+    ["route", "method"],
+)
+REQUEST_LATENCY = Histogram(
+    "paddy_http_request_duration_seconds",
+    "Time until the response headers were sent, by route.",
+    ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "paddy_stage_duration_seconds",
+    "Time spent in each stage of request handling and background writes.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_LATENCY = Histogram(
+    "paddy_model_batch_duration_seconds",
+    "Forward pass time of one batch, by model.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_BATCH_SIZE = Histogram(
+    "paddy_model_batch_size",
+    "Number of images per forward pass, by model.",
+    ["model"],
+    buckets=BATCH_SIZE_BUCKETS,
+)
+MODEL_IMAGES = Counter(
+    "paddy_model_images_total",
+    "Images run through each model.",
+    ["model"],
+)
+MODEL_ERRORS = Counter(
+    "paddy_model_errors_total",
+    "Forward passes that raised an exception, by model.",
+    ["model"],
+)
+QUEUE_DEPTH = Gauge(
+    "paddy_queue_depth",
+    "Work waiting in each batcher, worker pool and the write-behind queue.",
+    ["queue"],
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "paddy_model_load_seconds",
+    "Time taken to load (and warm up) each model.",
+    ["model"],
+)
+MODEL_MEMORY_BYTES = Gauge(
+    "paddy_model_memory_bytes",
+    "Approximate memory held by each loaded model.",
+    ["model"],
+)
+ADMISSION_REJECTED = Counter(
+    "paddy_admission_rejected_total",
+    "Inference requests shed by admission control, by reason.",
+    ["reason"],
+)
+
+# Per-request stage durations for the Server-Timing header; None outside a timed request
+_request_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Times a block of request handling as one stage.
+
+    The duration is observed in the stage histogram and, when the current request
+    collects Server-Timing data, added to that request's timings. Stages that run more
+    than once per request (e.g. in the batch route) are summed.
+
+    Args:
+        stage (str): Stage name, e.g. "decode" or "mongo_insert".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def leave_request_context() -> None:
+    """
+    Stops the current task from adding stage timings to the request it was started from.
+
+    Background tasks inherit the context of the request that created them; call this at
+    the start of such a task so its work is only recorded in the histograms.
+    """
+    _request_timings.set(None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Records a stage whose duration was measured elsewhere.
+
+    Args:
+        stage (str): Stage name.
+        seconds (float): Duration of the stage.
+    """
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def record_parse_time() -> None:
+    """
+    Records the time from the start of the request until the route handler runs, which
+    covers receiving and parsing the multipart body. Call at the top of a handler.
+    """
+    timings = _request_timings.get()
+    if timings is not None and "_start" in timings:
+        record_stage("parse", time.perf_counter() - timings["_start"])
+
+
+def record_batch(model: str, batch_size: int, seconds: float, failed: bool = False) -> None:
+    """
+    Records one forward pass of a batcher.
+
+    Args:
+        model (str): Model name.
+        batch_size (int): Number of images in the batch.
+        seconds (float): Forward pass duration.
+        failed (bool): Whether the forward pass raised.
+    """
+    MODEL_LATENCY.labels(model=model).observe(seconds)
+    MODEL_BATCH_SIZE.labels(model=model).observe(batch_size)
+    MODEL_IMAGES.labels(model=model).inc(batch_size)
+    if failed:
+        MODEL_ERRORS.labels(model=model).inc()
+
+
+def track_queue_depth(queue: str, depth_fn: Callable[[], int]) -> None:
+    """
+    Reports a queue's current depth on every scrape.
+
+    Args:
+        queue (str): Queue name, used as the `queue` label.
+        depth_fn (Callable[[], int]): Returns the number of waiting items.
+    """
+    QUEUE_DEPTH.labels(queue=queue).set_function(depth_fn)
+
+
+def record_model_load(model: str, seconds: float, memory_bytes: Optional[int]) -> None:
+    """
+    Records the load time and memory footprint of a model.
+
+    Args:
+        model (str): Model name.
+        seconds (float): Load (and warm-up) duration.
+        memory_bytes (int, optional): Memory held by the model, if known.
+    """
+    MODEL_LOAD_SECONDS.labels(model=model).set(seconds)
+    if memory_bytes is not None:
+        MODEL_MEMORY_BYTES.labels(model=model).set(memory_bytes)
+
+
+def record_rejection(reason: str) -> None:
+    """
+    Counts a request shed by admission control.
+
+    Args:
+        reason (str): "queue_full", "deadline" (shed before admission) or "timeout" (cut off
+            after admission).
+    """
+    ADMISSION_REJECTED.labels(reason=reason).inc()
+
+
+def format_server_timing(timings: dict, total: float) -> str:
+    """
+    Formats stage durations as a Server-Timing header value (durations in milliseconds).
+
+    Args:
+        timings (dict): Stage name -> seconds.
+        total (float): Seconds from the start of the request to the response headers.
+
+    Returns:
+        str: e.g. "parse;dur=1.2, decode;dur=8.4, total;dur=52.0".
+    """
+    entries = [
+        f"{stage};dur={seconds * 1000:.1f}"
+        for stage, seconds in timings.items()
+        if not stage.startswith("_")
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def route_template(scope: dict) -> str:
+    """
+    Returns the path template of the route that handled a request, e.g.
+    "/api/image/{image_id}", from the route Starlette stored in the scope while routing.
+
+    Some FastAPI versions keep routes of included routers with paths relative to the router
+    prefix; the prefix is then the part of the request path before what the route matched.
+
+    Args:
+        scope (dict): The ASGI scope after routing.
+
+    Returns:
+        str: The template, or "unmatched" if no route matched.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+
+    path = scope.get("path", "")
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is None or path_regex.match(path):
+        return route.path
+    for index, char in enumerate(path):
+        if char == "/" and path_regex.match(path[index:]):
+            return path[:index] + route.path
+    return route.path
+
+
+def metrics_response() -> tuple:
+    """
+    Renders all metrics in the Prometheus text exposition format.
+
+    Returns:
+        tuple: (body bytes, content type).
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts and times every HTTP request by route.
+
+    Requests are labelled with the matched route template (e.g. "/api/image/{image_id}")
+    rather than the raw path, so the number of series stays bounded. Latency is measured
+    until the response headers are sent. The stage durations recorded with `timed` during
+    the request are returned in a `Server-Timing` header when the request asks for them
+    with `X-Server-Timing: 1`, or for every request when SERVER_TIMING is "true".
+
+    Args:
+        app: The ASGI application to wrap.
+        server_timing (str): "request" (per-request opt-in), "true" (always) or "false".
+    """
+
+    def __init__(self, app, server_timing: str = SERVER_TIMING):
+        self.app = app
+        self.server_timing_always = server_timing in ("1", "true", "yes")
+        self.server_timing_on_request = self.server_timing_always or server_timing == "request"
+
+    def wants_server_timing(self, scope) -> bool:
+        """
+        Whether the response to a request gets the Server-Timing header.
+        """
+        if self.server_timing_always:
+            return True
+        if not self.server_timing_on_request:
+            return False
+        for name, value in scope.get("headers", []):
+            if name == SERVER_TIMING_REQUEST_HEADER:
+                return value.strip().lower() in (b"1", b"true", b"yes")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = {"_start": start}
+        token = _request_timings.set(timings)
+        status = {"code": 500, "latency": None}
+        server_timing = self.wants_server_timing(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["latency"] = time.perf_counter() - start
+                if server_timing:
+                    headers = list(message.get("headers", []))
+                    value = format_server_timing(timings, status["latency"])
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            route_label = route_template(scope)
+            method = scope.get("method", "")
+            latency = status["latency"]
+
+            REQUESTS.labels(route=route_label, method=method, status=str(status["code"])).inc()
+            REQUEST_LATENCY.labels(route=route_label, method=method).observe(
+                latency if latency is not None else time.perf_counter() - start
+            )
+            if status["code"] >= 500:
+                REQUEST_ERRORS.labels(route=route_label, method=method).inc()
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from typing import Callable, Optional
+import numpy as np
+from config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS
+from utils.inference_pool import InferencePool
+from utils.metrics import leave_request_context, record_batch, track_queue_depth
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-image inference requests into batched forward passes.
+
+    Each request submits a preprocessed tensor of shape (1, H, W, C) and waits on a future.
+    A background task collects pending requests until either `max_batch_size` is reached or
+    the first request has waited `max_wait_ms`, stacks them into one (N, H, W, C) batch,
+    runs the model once, and hands each caller its own row of the prediction. A model may
+    return a tuple of outputs (e.g. probabilities and features); each caller then receives
+    a tuple of its rows, with None kept for outputs that are None.
+
+    When a worker pool is given, forward passes run on it instead of the event loop's default
+    executor, and up to one batch per pool worker may be in flight at a time. New requests keep accumulating while
+    all workers are busy, so batches grow with load.
+
+    Args:
+        predict_fn (Callable[[np.ndarray], np.ndarray]): Runs the model on a batch and returns
+            one prediction row per input row, or a tuple of such outputs.
+        max_batch_size (int): Maximum number of images per forward pass.
+        max_wait_ms (float): Maximum time the oldest request waits for a batch to fill.
+        name (str): Model name, used for diagnostics.
+        pool (InferencePool, optional): Worker pool that runs the forward passes.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+        name: str = "model",
+        pool: Optional[InferencePool] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.pool = pool
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._slots = None
+        self._inflight = set()
+        track_queue_depth(f"batcher_{name}", lambda: self.queue_depth)
+
+    def _ensure_worker(self) -> None:
+        """
+        Starts the batching task on the running event loop if it is not already running.
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.pool.max_workers if self.pool else 1)
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        Queues a single preprocessed image and waits for its prediction.
+
+        Args:
+            input_tensor (np.ndarray): Model input with shape (1, H, W, C).
+
+        Returns:
+            np.ndarray or tuple: The model output row for this image (batch dimension
+                removed), or a tuple of rows for a model with several outputs.
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((input_tensor, future))
+        return await future
+
+    async def _collect(self) -> list:
+        """
+        Waits for the first pending request, then gathers more until the batch is full
+        or the wait window has elapsed.
+
+        Returns:
+            list: Pending (input_tensor, future) pairs forming the next batch.
+        """
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        try:
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped while filling a batch: its requests will not be run
+            for _, future in batch:
+                future.cancel()
+            raise
+
+        return [(tensor, future) for tensor, future in batch if not future.done()]
+
+    async def _predict(self, input_batch: np.ndarray) -> np.ndarray:
+        """
+        Runs the model on the worker pool, or on the loop's default executor when no pool is
+        configured.
+        """
+        if self.pool is None:
+            return await self._loop.run_in_executor(None, self.predict_fn, input_batch)
+        return await self.pool.run(self.predict_fn, input_batch)
+
+    async def _dispatch(self, batch: list) -> None:
+        """
+        Runs one forward pass per distinct input shape and resolves each waiting future.
+
+        Args:
+            batch (list): Pending (input_tensor, future) pairs.
+        """
+        groups = {}
+        for tensor, future in batch:
+            groups.setdefault(tensor.shape[1:], []).append((tensor, future))
+
+        for group in groups.values():
+            start = time.perf_counter()
+            try:
+                outputs = await self._predict(np.concatenate([t for t, _ in group], axis=0))
+            except Exception as e:
+                record_batch(self.name, len(group), time.perf_counter() - start, failed=True)
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            record_batch(self.name, len(group), time.perf_counter() - start)
+            for row, (_, future) in enumerate(group):
+                if future.done():
+                    continue
+                if isinstance(outputs, tuple):
+                    future.set_result(
+                        tuple(None if output is None else output[row] for output in outputs)
+                    )
+                else:
+                    future.set_result(outputs[row])
+
+    async def _run(self) -> None:
+        """
+        Background loop that forms and executes batches for as long as the event loop runs.
+        """
+        leave_request_context()
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            task = self._loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_dispatch_done)
+
+    def _on_dispatch_done(self, task: asyncio.Task) -> None:
+        """
+        Frees a dispatch slot once a batch has been resolved.
+        """
+        self._inflight.discard(task)
+        self._slots.release()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of requests waiting to be placed in a batch.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def close(self) -> None:
+        """
+        Stops the batching task and waits for the batches already dispatched to finish, so
+        their callers are answered before the worker pools shut down. Requests still waiting
+        for a batch are cancelled.
+        """
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
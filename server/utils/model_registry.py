@@ -0,0 +1,439 @@
+import glob
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+import numpy as np
+from config import (
+    MODEL_LOADING,
+    MODEL_SERVER_ADDRESS,
+    MODEL_WARMUP,
+    MODEL_WARMUP_IMAGES_DIR,
+    WARMUP_BATCH_SIZES,
+)
+from utils.backends import (
+    InferenceBackend,
+    load_backend_file,
+    load_configured_backend,
+    model_file_version,
+)
+from utils.metrics import record_model_load
+
+# Model loading modes (see MODEL_LOADING)
+LOADING_MODES = ("background", "eager", "lazy")
+
+# File patterns of the sample images used for warm-up
+WARMUP_IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+class ModelUnavailableError(RuntimeError):
+    """
+    Raised when a model is requested whose load failed.
+    """
+
+
+def load_warmup_samples(input_size: tuple, limit: int) -> Optional[np.ndarray]:
+    """
+    Preprocesses the sample images in MODEL_WARMUP_IMAGES_DIR for warming up a model.
+
+    Args:
+        input_size (tuple): Model input (width, height).
+        limit (int): Maximum number of images.
+
+    Returns:
+        np.ndarray or None: float32 batch of shape (N, height, width, 3), or None if the
+            directory holds no images.
+    """
+    from PIL import Image
+    from utils.image_preprocessor import preprocess_batch, remove_transparency
+
+    paths = sorted(
+        path
+        for pattern in WARMUP_IMAGE_PATTERNS
+        for path in glob.glob(os.path.join(MODEL_WARMUP_IMAGES_DIR, pattern))
+    )[: max(1, limit)]
+    if not paths:
+        return None
+
+    images = []
+    for path in paths:
+        with Image.open(path) as image:
+            images.append(remove_transparency(image).convert("RGB"))
+    width, height = input_size
+    return preprocess_batch(images, width, height).astype(np.float32)
+
+
+class ModelVersion:
+    """
+    One loaded version of a model.
+
+    Args:
+        backend (InferenceBackend): The loaded model.
+        version (str, optional): Version label; None for unversioned models.
+        load_seconds (float): Time taken to load and warm up this version.
+        output_shape (tuple, optional): Shape of one output row, checked when swapping.
+    """
+
+    def __init__(
+        self,
+        backend: InferenceBackend,
+        version: Optional[str],
+        load_seconds: float,
+        output_shape: Optional[tuple],
+    ):
+        self.backend = backend
+        self.version = version
+        self.load_seconds = load_seconds
+        self.output_shape = output_shape
+        self.loaded_at = datetime.now(timezone.utc)
+
+
+class ModelHandle:
+    """
+    A registered model, loaded once in the background or on first use and hot-swappable.
+
+    `get` returns the backend of the version currently serving: it waits if the first load
+    is in progress, and loads the model in the calling thread if nobody has started it yet.
+    Loading includes the warm-up runs when MODEL_WARMUP is set, so a version serves only
+    once it is warm.
+
+    `reload` loads another version next to the serving one and swaps it in with a single
+    assignment once it is warm. Forward passes already running keep the backend they
+    fetched and finish on the old version, which is released when the last of them ends.
+
+    Args:
+        name (str): Model file stem, e.g. "disease_classification_model".
+        backend (str): Inference backend to load it with.
+        input_size (tuple): Model input (width, height), used for warm-up.
+    """
+
+    def __init__(self, name: str, backend: str, input_size: tuple):
+        self.name = name
+        self.backend_name = backend
+        self.input_size = input_size
+        self.state = "pending"
+        self.error = None
+        self.reload_state = None
+        self.reload_error = None
+        self._current = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+
+    def _claim(self) -> bool:
+        """
+        Marks the model as loading if no load has been started.
+
+        Returns:
+            bool: True if the caller should perform the load.
+        """
+        with self._lock:
+            if self.state != "pending":
+                return False
+            self.state = "loading"
+            return True
+
+    def _load_version(
+        self, model_path: Optional[str] = None, version: Optional[str] = None
+    ) -> ModelVersion:
+        """
+        Loads and warms up a version of the model.
+
+        Args:
+            model_path (str, optional): Model file; the configured model when omitted.
+            version (str, optional): Version label; the file's content hash when omitted.
+
+        Returns:
+            ModelVersion: The loaded version.
+        """
+        start = time.perf_counter()
+        if model_path is None:
+            backend = load_configured_backend(self.name, self.backend_name)
+        else:
+            backend = load_backend_file(model_path, self.backend_name)
+
+        output_shape = None
+        if MODEL_WARMUP:
+            batch_sizes = sorted(set(WARMUP_BATCH_SIZES)) or [1]
+            samples = load_warmup_samples(self.input_size, max(batch_sizes))
+            backend.warmup(self.input_size, batch_sizes, samples)
+            if samples is not None:
+                output_shape = tuple(np.shape(backend.predict(samples[:1]))[1:])
+
+        if version is None:
+            version = model_file_version(backend.model_path)
+        loaded = ModelVersion(backend, version, time.perf_counter() - start, output_shape)
+        record_model_load(self.name, loaded.load_seconds, backend.memory_bytes)
+        return loaded
+
+    def _load(self) -> None:
+        try:
+            self._current = self._load_version()
+            self.state = "ready"
+        except Exception as e:
+            traceback.print_exc()
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = "failed"
+        finally:
+            self._loaded.set()
+
+    def load(self) -> None:
+        """
+        Loads the model unless a load has already been started, then waits for it.
+        """
+        if self._claim():
+            self._load()
+        self._loaded.wait()
+
+    def get_version(self) -> ModelVersion:
+        """
+        Returns the serving version of the model, loading it or waiting for its load first.
+
+        The backend and its version label are read together, so a caller can record which
+        version produced its output even if another one is swapped in meanwhile.
+
+        Returns:
+            ModelVersion: The serving version.
+
+        Raises:
+            ModelUnavailableError: If the model failed to load.
+        """
+        current = self._current
+        if current is None:
+            self.load()
+            current = self._current
+            if current is None:
+                raise ModelUnavailableError(f"Model '{self.name}' failed to load: {self.error}")
+        return current
+
+    def get(self) -> InferenceBackend:
+        """
+        Returns the backend of the serving version, see `get_version`.
+
+        Returns:
+            InferenceBackend: The model.
+
+        Raises:
+            ModelUnavailableError: If the model failed to load.
+        """
+        return self.get_version().backend
+
+    @property
+    def version(self) -> Optional[str]:
+        """
+        Version label of the serving model, or None if not loaded or unversioned.
+        """
+        current = self._current
+        return current.version if current is not None else None
+
+    def begin_reload(self) -> None:
+        """
+        Marks a reload as started; call before `reload`.
+
+        Raises:
+            RuntimeError: If a reload is already in progress.
+        """
+        with self._lock:
+            if self.reload_state == "loading":
+                raise RuntimeError(f"A new version of '{self.name}' is already loading.")
+            self.reload_state = "loading"
+            self.reload_error = None
+
+    def reload(self, model_path: Optional[str] = None, version: Optional[str] = None) -> bool:
+        """
+        Loads and warms up a new version, then swaps it in for the serving one.
+
+        Args:
+            model_path (str, optional): Model file; the configured model when omitted.
+            version (str, optional): Version label; the file's content hash when omitted.
+
+        Returns:
+            bool: True if the new version was swapped in; on failure the old version keeps
+                serving and the error is kept in the reload stats.
+        """
+        try:
+            loaded = self._load_version(model_path, version)
+            current = self._current
+            if (
+                current is not None
+                and current.output_shape is not None
+                and loaded.output_shape != current.output_shape
+            ):
+                raise ValueError(
+                    f"New version outputs shape {loaded.output_shape}, "
+                    f"expected {current.output_shape}."
+                )
+
+            # Requests that already fetched the old backend finish on it
+            self._current = loaded
+            self.state = "ready"
+            self.error = None
+            self._loaded.set()
+            self.reload_state = "swapped"
+            return True
+        except Exception as e:
+            traceback.print_exc()
+            self.reload_error = f"{type(e).__name__}: {e}"
+            self.reload_state = "failed"
+            return False
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def stats(self) -> dict:
+        """
+        Returns the load state, serving version, load time (ms), memory footprint and the
+        state of the last reload.
+        """
+        current = self._current
+        return {
+            "state": self.state,
+            "backend": self.backend_name,
+            "version": current.version if current is not None else None,
+            "loaded_at": current.loaded_at.isoformat() if current is not None else None,
+            "load_ms": round(current.load_seconds * 1000, 1) if current is not None else None,
+            "memory_bytes": current.backend.memory_bytes if current is not None else None,
+            "error": self.error,
+            "reload": {"state": self.reload_state, "error": self.reload_error},
+        }
+
+
+class ModelRegistry:
+    """
+    Holds the models used by the API, loads them concurrently and swaps in new versions.
+
+    Model modules register their models at import time without loading them, so importing
+    the routers stays cheap. `start_loading` loads every model not yet loaded on its own
+    thread; a model that is needed before then is loaded on first use. `reload` loads a
+    new version of one model in the background and hot-swaps it; callbacks registered with
+    `add_swap_listener` then run, e.g. to drop results cached from the old version.
+
+    Args:
+        mode (str): "background", "eager" or "lazy" (see MODEL_LOADING).
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+
+    def __init__(self, mode: str = MODEL_LOADING):
+        if mode not in LOADING_MODES:
+            raise ValueError(
+                f"Unknown model loading mode '{mode}'. "
+                f"Expected one of: {', '.join(LOADING_MODES)}."
+            )
+        self.mode = mode
+        self.models = {}
+        self._executor = None
+        self._listeners = []
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, len(self.models)), thread_name_prefix="model-loader"
+            )
+        return self._executor
+
+    def register(self, name: str, backend: str, input_size: tuple) -> ModelHandle:
+        """
+        Registers a model without loading it.
+
+        Args:
+            name (str): Model file stem.
+            backend (str): Inference backend to load it with.
+            input_size (tuple): Model input (width, height).
+
+        Returns:
+            ModelHandle: Handle whose `get` returns the serving model.
+        """
+        handle = ModelHandle(name, backend, input_size)
+        self.models[name] = handle
+        return handle
+
+    def start_loading(self) -> list:
+        """
+        Starts loading every registered model, one thread per model.
+
+        Returns:
+            list: A `concurrent.futures.Future` per model, resolved when its load has ended.
+        """
+        executor = self._get_executor()
+        return [executor.submit(handle.load) for handle in self.models.values()]
+
+    def reload(
+        self, name: str, model_path: Optional[str] = None, version: Optional[str] = None
+    ) -> Future:
+        """
+        Loads a new version of a model in the background and swaps it in once warm.
+
+        The swap is skipped (and the old version keeps serving) if the load or warm-up
+        fails, or if the new version's output shape differs from the serving one.
+
+        Args:
+            name (str): Model file stem.
+            model_path (str, optional): Model file to load; the configured file when omitted,
+                e.g. after it was replaced on disk.
+            version (str, optional): Version label; the file's content hash when omitted.
+
+        Returns:
+            Future: Resolved when the reload has ended; see the model's `reload` stats.
+
+        Raises:
+            KeyError: If no such model is registered.
+            RuntimeError: If a reload of the model is already in progress, or the models
+                are served by a model server.
+        """
+        if MODEL_SERVER_ADDRESS:
+            raise RuntimeError("Models are served by the model server; restart it to reload.")
+        handle = self.models[name]
+        handle.begin_reload()
+        return self._get_executor().submit(self._reload, handle, model_path, version)
+
+    def _reload(self, handle: ModelHandle, model_path: Optional[str], version: Optional[str]):
+        if not handle.reload(model_path, version):
+            return
+        for listener in self._listeners:
+            try:
+                listener(handle)
+            except Exception:
+                traceback.print_exc()
+
+    def add_swap_listener(self, listener: Callable[[ModelHandle], None]) -> None:
+        """
+        Registers a callback run (on the loader thread) after a new version is swapped in.
+
+        Args:
+            listener (Callable[[ModelHandle], None]): Receives the swapped model's handle.
+        """
+        self._listeners.append(listener)
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether every registered model is loaded. In lazy mode, models that have not been
+        requested yet do not count against readiness.
+        """
+        return all(
+            handle.ready or (self.mode == "lazy" and handle.state == "pending")
+            for handle in self.models.values()
+        )
+
+    def stats(self) -> dict:
+        """
+        Returns the per-model load state, version, load time and memory footprint.
+        """
+        return {name: handle.stats() for name, handle in self.models.items()}
+
+    def shutdown(self) -> None:
+        """
+        Stops the loader threads once running loads have finished.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Shared registry of the disease, variety and age models
+model_registry = ModelRegistry()
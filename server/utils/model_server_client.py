@@ -0,0 +1,252 @@
+import queue
+import threading
+from multiprocessing.connection import Client
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+import numpy as np
+from config import MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY, MODEL_SERVER_CONNECTIONS
+
+# Hosts of the loopback interface, the only TCP addresses the model server listens on unless
+# MODEL_SERVER_ALLOW_REMOTE is set
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+# Smallest shared-memory buffer allocated per connection (one 256x256 float32 image)
+MIN_BUFFER_BYTES = 256 * 256 * 3 * 4
+
+
+class ModelServerError(RuntimeError):
+    """
+    Raised when the model server cannot be reached or reports an error.
+    """
+
+
+def parse_address(address: str):
+    """
+    Converts a configured address into a `multiprocessing.connection` address.
+
+    Args:
+        address (str): "host:port" for TCP, or a filesystem path for a Unix socket.
+
+    Returns:
+        tuple or str: (host, port), or the socket path.
+    """
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def require_authkey(authkey: str) -> bytes:
+    """
+    Returns the shared secret as bytes, refusing to run without one.
+
+    The model server exchanges pickled messages, so anyone able to connect with the key
+    can run code in it; there is deliberately no default key.
+
+    Args:
+        authkey (str): The configured MODEL_SERVER_AUTHKEY.
+
+    Returns:
+        bytes: The encoded key.
+
+    Raises:
+        ValueError: If no key is configured.
+    """
+    if not authkey:
+        raise ValueError(
+            "MODEL_SERVER_AUTHKEY must be set to a secret shared by the model server and "
+            "the API workers."
+        )
+    return authkey.encode()
+
+
+class _Channel:
+    """
+    One connection to the model server with its own shared-memory input buffer.
+
+    Tensors are copied into the buffer and only their name, shape and dtype travel over
+    the socket; the model server maps the same buffer and reads them without a copy. A
+    channel carries one request at a time, so the buffer can be reused for every call.
+    """
+
+    def __init__(self, address, authkey: bytes):
+        self.connection = Client(address, authkey=authkey)
+        self.buffer = None
+
+    def _ensure_capacity(self, nbytes: int) -> None:
+        if self.buffer is not None and self.buffer.size >= nbytes:
+            return
+        self._release_buffer()
+        size = max(MIN_BUFFER_BYTES, 1 << (max(nbytes, 1) - 1).bit_length())
+        self.buffer = SharedMemory(create=True, size=size)
+
+    def _release_buffer(self) -> None:
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer.unlink()
+            self.buffer = None
+
+    def call(self, operation: str, model_name: Optional[str], array: np.ndarray):
+        """
+        Sends one array to the model server and returns its reply.
+        """
+        array = np.ascontiguousarray(array)
+        self._ensure_capacity(array.nbytes)
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=self.buffer.buf)
+        view[...] = array
+        del view
+
+        self.connection.send(
+            (operation, model_name, self.buffer.name, array.shape, array.dtype.str)
+        )
+        status, payload = self.connection.recv()
+        if status != "ok":
+            raise ModelServerError(payload)
+        return payload
+
+    def close(self) -> None:
+        try:
+            self.connection.close()
+        finally:
+            self._release_buffer()
+
+
+class ModelServerClient:
+    """
+    Thread-safe client for the model server, used by the "remote" inference backend.
+
+    Keeps up to `max_connections` channels, created on demand and reused; each call borrows
+    one, so that many inference threads can have requests in flight at once. A channel
+    whose connection fails is discarded and the call is retried once on a new connection,
+    which covers a restarted model server.
+
+    Args:
+        address (str): Model server address, see `parse_address`.
+        authkey (str): Shared secret configured on the model server.
+        max_connections (int): Maximum number of open channels.
+
+    Raises:
+        ValueError: If no authkey is configured.
+    """
+
+    def __init__(
+        self,
+        address: str = MODEL_SERVER_ADDRESS,
+        authkey: str = MODEL_SERVER_AUTHKEY,
+        max_connections: int = MODEL_SERVER_CONNECTIONS,
+    ):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.max_connections = max(1, int(max_connections))
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Channel:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._opened < self.max_connections
+            if create:
+                self._opened += 1
+        if not create:
+            return self._idle.get()
+
+        try:
+            return _Channel(self.address, self.authkey)
+        except Exception as e:
+            with self._lock:
+                self._opened -= 1
+            raise ModelServerError(f"Cannot connect to model server at {self.address}") from e
+
+    def _discard(self, channel: _Channel) -> None:
+        with self._lock:
+            self._opened -= 1
+        try:
+            channel.close()
+        except OSError:
+            pass
+
+    def _call(self, operation: str, model_name: Optional[str], array: np.ndarray):
+        for attempt in range(2):
+            channel = self._acquire()
+            try:
+                result = channel.call(operation, model_name, array)
+            except (EOFError, OSError) as e:
+                self._discard(channel)
+                if attempt == 1:
+                    raise ModelServerError("Lost connection to model server") from e
+                continue
+            except BaseException:
+                self._discard(channel)
+                raise
+            self._idle.put(channel)
+            return result
+
+    def predict(self, model_name: str, input_batch: np.ndarray) -> np.ndarray:
+        """
+        Runs one model on a batch of preprocessed images in the model server.
+
+        Args:
+            model_name (str): Model file stem, e.g. "disease_classification_model".
+            input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+        Returns:
+            np.ndarray: Softmax probabilities with shape (N, num_classes).
+        """
+        return self._call("predict", model_name, input_batch)
+
+    def predict_with_features(self, model_name: str, input_batch: np.ndarray) -> tuple:
+        """
+        Runs one model on a batch in the model server, also returning its features.
+
+        Args:
+            model_name (str): Model file stem, e.g. "disease_classification_model".
+            input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+        Returns:
+            tuple: (probabilities, features); features is None if the model's backend
+                cannot expose them.
+        """
+        return self._call("predict_features", model_name, input_batch)
+
+    def predict_fused(self, image_array: np.ndarray) -> tuple:
+        """
+        Runs the fused three-model graph in the model server on one raw RGB image.
+
+        Args:
+            image_array (np.ndarray): uint8 image of shape (H, W, 3).
+
+        Returns:
+            tuple: (disease, variety, age) probability vectors and the disease features.
+        """
+        return self._call("fused", None, image_array)
+
+    def close(self) -> None:
+        """
+        Closes every idle channel and frees its shared memory.
+        """
+        while True:
+            try:
+                channel = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(channel)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_model_server_client() -> ModelServerClient:
+    """
+    Returns the process-wide model server client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModelServerClient()
+    return _client
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+from config import PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES
+
+
+def hash_contents(contents: bytes) -> str:
+    """
+    Compute the content hash used to recognise repeated uploads.
+
+    Args:
+        contents (bytes): Raw bytes of the uploaded file.
+
+    Returns:
+        str: Hex-encoded SHA-256 digest of the contents.
+    """
+    return hashlib.sha256(contents).hexdigest()
+
+
+class PredictionCache:
+    """
+    An in-process LRU cache of prediction results keyed by upload content hash.
+
+    The cache is bounded both by number of entries and by the approximate serialized size of
+    the cached results; the least recently used entries are evicted first when either limit
+    is exceeded. Hit and miss counters distinguish results served from memory, results found
+    in the persisted hash index, and uploads that had to run through the models.
+
+    Args:
+        max_entries (int): Maximum number of cached results.
+        max_bytes (int): Maximum total serialized size of the cached results.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        max_bytes: int = PREDICTION_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, content_hash: str) -> Optional[dict]:
+        """
+        Look up a cached result and mark it as recently used.
+
+        Args:
+            content_hash (str): Content hash of the upload.
+
+        Returns:
+            dict or None: The cached result, or None if not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                return None
+            self._entries.move_to_end(content_hash)
+            self.memory_hits += 1
+            return entry[0]
+
+    def put(self, content_hash: str, result: dict) -> None:
+        """
+        Store a result, evicting least recently used entries to stay within the bounds.
+
+        Args:
+            content_hash (str): Content hash of the upload.
+            result (dict): JSON-serializable prediction result.
+        """
+        size = len(json.dumps(result, default=str)) + len(content_hash)
+        if size > self.max_bytes or self.max_entries == 0:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(content_hash, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[content_hash] = (result, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def discard(self, content_hash: str, image_id: str = None) -> None:
+        """
+        Drop one cached result, e.g. because its image could not be stored.
+
+        Args:
+            content_hash (str): Content hash of the upload.
+            image_id (str, optional): Only drop the result if it still refers to this image.
+        """
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None or (image_id is not None and entry[0].get("image_id") != image_id):
+                return
+            del self._entries[content_hash]
+            self._bytes -= entry[1]
+
+    def clear(self) -> None:
+        """
+        Drop every cached result, e.g. after a model was replaced.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def record_store_hit(self) -> None:
+        """
+        Count a repeat upload that was resolved from the persisted hash index.
+        """
+        with self._lock:
+            self.store_hits += 1
+
+    def record_miss(self) -> None:
+        """
+        Count an upload that was not found in memory or in the persisted hash index.
+        """
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the cache size and hit/miss counters.
+
+        Returns:
+            dict: Entry count, byte size, limits, hits (memory and store), misses and evictions.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.store_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (
+                    round((self.memory_hits + self.store_hits) / lookups, 4)
+                    if lookups
+                    else 0.0
+                ),
+            }
+
+
+# Shared cache of prediction results for the combined predict route
+prediction_cache = PredictionCache()
@@ -0,0 +1,192 @@
+from collections import defaultdict
+from datetime import datetime
+from pymongo import ReplaceOne, UpdateOne
+from db import prediction_collection, stats_collection
+
+# Predicted fields that are counted per class and per confidence bucket
+STATS_FIELDS = ("disease", "variety", "age")
+
+# Number of equal-width confidence histogram buckets over [0, 1]
+CONFIDENCE_BUCKETS = 10
+
+
+def confidence_bucket(confidence) -> str:
+    """
+    Map a confidence score to its histogram bucket index.
+
+    Args:
+        confidence (float): Softmax confidence in [0, 1].
+
+    Returns:
+        str: Bucket index "0" (0.0-0.1) to "9" (0.9-1.0), as used in the rollup documents.
+    """
+    index = int(float(confidence) * CONFIDENCE_BUCKETS)
+    return str(min(max(index, 0), CONFIDENCE_BUCKETS - 1))
+
+
+def rollup_increments(record: dict) -> tuple:
+    """
+    Compute the counter increments one prediction record contributes to its daily rollup.
+
+    Args:
+        record (dict): A prediction record with 'timestamp' and disease/variety/age results.
+
+    Returns:
+        tuple: (day, increments) where `day` is the "YYYY-MM-DD" rollup ID and `increments`
+            maps dotted counter paths (e.g. "disease.Blast", "confidence.age.9") to 1.
+    """
+    timestamp = record.get("timestamp") or datetime.now()
+    increments = {"total": 1}
+
+    for field in STATS_FIELDS:
+        prediction = record.get(field) or {}
+        if prediction.get("result") is None:
+            continue
+        increments[f"{field}.{prediction['result']}"] = 1
+        if prediction.get("confidence") is not None:
+            bucket = confidence_bucket(prediction["confidence"])
+            increments[f"confidence.{field}.{bucket}"] = 1
+
+    return timestamp.date().isoformat(), increments
+
+
+def accumulate_rollups(records, days: dict = None) -> dict:
+    """
+    Sum the rollup increments of many records per day.
+
+    Args:
+        records (Iterable[dict]): Prediction records.
+        days (dict, optional): Existing per-day sums to add to.
+
+    Returns:
+        dict: Maps "YYYY-MM-DD" to a dict of summed counter increments.
+    """
+    if days is None:
+        days = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        day, increments = rollup_increments(record)
+        for path, value in increments.items():
+            days[day][path] += value
+    return days
+
+
+async def record_prediction_stats(records: list) -> None:
+    """
+    Apply the rollup increments of newly inserted prediction records.
+
+    Increments are summed per day first, so a bulk insert costs one upsert per day touched.
+
+    Args:
+        records (list): The prediction records that were just inserted.
+    """
+    operations = [
+        UpdateOne(
+            {"_id": day},
+            {"$inc": dict(increments), "$setOnInsert": {"date": datetime.fromisoformat(day)}},
+            upsert=True,
+        )
+        for day, increments in accumulate_rollups(records).items()
+    ]
+    if operations:
+        await stats_collection.bulk_write(operations, ordered=False)
+
+
+def expand_rollup(day: str, increments: dict) -> dict:
+    """
+    Turn summed dotted counter paths into a nested rollup document.
+    """
+    document = {"_id": day, "date": datetime.fromisoformat(day)}
+    for path, value in increments.items():
+        target = document
+        *parents, leaf = path.split(".")
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = value
+    return document
+
+
+async def rebuild_prediction_stats(batch_size: int = 5000) -> int:
+    """
+    Recompute every daily rollup from the prediction collection in one pass.
+
+    Records are streamed with a projection of only the counted fields and summed in memory
+    per day. Each day's rollup is then replaced in place (upserted), and only afterwards are
+    rollups of days without predictions removed, so `/api/stats` never sees an empty or
+    partial collection while a rebuild runs, and an interrupted rebuild leaves every day
+    either old or rebuilt.
+
+    Run it with prediction writes stopped: the increments of records saved after the scan
+    has passed them are overwritten when their day's rollup is replaced, so those
+    predictions would be missing from the rollups.
+
+    Args:
+        batch_size (int): Cursor batch size used while scanning the predictions.
+
+    Returns:
+        int: Number of daily rollup documents written.
+    """
+    projection = {"_id": 0, "timestamp": 1}
+    for field in STATS_FIELDS:
+        projection[f"{field}.result"] = 1
+        projection[f"{field}.confidence"] = 1
+
+    records = []
+    days = None
+    cursor = prediction_collection.find({}, projection=projection).batch_size(batch_size)
+    async for record in cursor:
+        records.append(record)
+        if len(records) >= batch_size:
+            days = accumulate_rollups(records, days)
+            records = []
+    days = accumulate_rollups(records, days)
+
+    documents = [expand_rollup(day, increments) for day, increments in sorted(days.items())]
+    for start in range(0, len(documents), batch_size):
+        await stats_collection.bulk_write(
+            [
+                ReplaceOne({"_id": document["_id"]}, document, upsert=True)
+                for document in documents[start : start + batch_size]
+            ],
+            ordered=False,
+        )
+    await stats_collection.delete_many({"_id": {"$nin": sorted(days)}})
+    return len(documents)
+
+
+async def get_prediction_stats(date_from: datetime = None, date_to: datetime = None) -> dict:
+    """
+    Read the daily rollups in a date range and sum them into overall totals.
+
+    Args:
+        date_from (datetime, optional): First day to include.
+        date_to (datetime, optional): Last day to include.
+
+    Returns:
+        dict: {
+            days: list of daily rollups (oldest first),
+            totals: summed counters over the range, in the same shape as a daily rollup
+        }
+    """
+    query = {}
+    if date_from is not None:
+        query.setdefault("_id", {})["$gte"] = date_from.date().isoformat()
+    if date_to is not None:
+        query.setdefault("_id", {})["$lte"] = date_to.date().isoformat()
+
+    days = []
+    totals = {"total": 0}
+
+    def add(target: dict, source: dict) -> None:
+        for key, value in source.items():
+            if isinstance(value, dict):
+                add(target.setdefault(key, {}), value)
+            elif isinstance(value, (int, float)):
+                target[key] = target.get(key, 0) + value
+
+    async for doc in stats_collection.find(query).sort("_id", 1):
+        doc.pop("date", None)
+        day = doc.pop("_id")
+        add(totals, doc)
+        days.append({"day": day, **doc})
+
+    return {"days": days, "totals": totals}
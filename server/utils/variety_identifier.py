@@ -1,12 +1,17 @@
-import tensorflow as tf
 import numpy as np
 from PIL import Image
+from config import VARIETY_BACKEND
+from utils.model_registry import model_registry
 from utils.image_preprocessor import preprocess_image
 
-# Load the variety classification model
-VARIETY_IDENTIFICATION_MODEL_PATH = "./models/variety_identification_model.keras"
-variety_identification_model = tf.keras.models.load_model(
-    VARIETY_IDENTIFICATION_MODEL_PATH
+# Model input resolution (width, height)
+VARIETY_INPUT_SIZE = (128, 128)
+
+# Register the variety classification model with the configured inference backend;
+# it is loaded in the background at start-up or on first use (see MODEL_LOADING)
+VARIETY_IDENTIFICATION_MODEL_NAME = "variety_identification_model"
+variety_model = model_registry.register(
+    VARIETY_IDENTIFICATION_MODEL_NAME, VARIETY_BACKEND, VARIETY_INPUT_SIZE
 )
 
 # Define the variety classes
@@ -26,6 +31,36 @@ VARIETY_CLASSES = sorted(
 )
 
 
+def predict_variety_batch(input_batch: np.ndarray) -> np.ndarray:
+    """
+    Run the variety identification model on a batch of preprocessed images with the configured backend.
+
+    Args:
+        input_batch (np.ndarray): Preprocessed images with shape (N, H, W, 3).
+
+    Returns:
+        np.ndarray: Softmax probabilities with shape (N, len(VARIETY_CLASSES)).
+    """
+    return variety_model.get().predict(input_batch)
+
+
+def decode_variety_prediction(prediction: np.ndarray) -> dict:
+    """
+    Convert one row of variety identification probabilities into a result and confidence score.
+
+    Args:
+        prediction (np.ndarray): Softmax probabilities for a single image.
+
+    Returns:
+        dict: Dictionary containing:
+            - 'result' (str): Predicted paddy variety.
+            - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
+    """
+    predicted_idx = np.argmax(prediction)
+    confidence = float(prediction[predicted_idx])
+    return {"result": VARIETY_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+
+
 def identify_variety(
     image_input: Image.Image, width: int = 128, height: int = 128
 ) -> dict:
@@ -46,7 +81,5 @@ def identify_variety(
             - 'confidence' (float): Softmax confidence score (0.0 to 1.0), rounded to 4 decimals.
     """
     input_tensor = preprocess_image(image_input, width=width, height=height, normalize=False)
-    prediction = variety_identification_model.predict(input_tensor)[0]
-    predicted_idx = np.argmax(prediction)
-    confidence = float(prediction[predicted_idx])
-    return {"result": VARIETY_CLASSES[predicted_idx], "confidence": round(confidence, 4)}
+    prediction = predict_variety_batch(input_tensor)[0]
+    return decode_variety_prediction(prediction)
@@ -0,0 +1,456 @@
+import fcntl
+import math
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+from bson import ObjectId
+from config import VECTOR_INDEX_DIR, VECTOR_INDEX_NPROBE
+
+# Header at the start of the vector file: magic, feature dimension, row count, row capacity
+HEADER_FORMAT = "<8sIQQ"
+HEADER_BYTES = 64
+HEADER_MAGIC = b"PADDYVEC"
+
+# Rows allocated when an index is created; the files double in size whenever they are full
+INITIAL_CAPACITY = 4096
+
+# Rows scored per step of an exhaustive scan, bounding the float32 working set
+SEARCH_CHUNK_ROWS = 65536
+
+# Rows added since the inverted lists were built that are scored exhaustively before the
+# lists are rebuilt (at least this many, or a tenth of the index)
+MAX_UNLISTED_ROWS = 20000
+
+# Directory name of the features of a model without a version
+UNVERSIONED = "unversioned"
+
+
+def normalize(vector: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Scales a feature vector to unit length, so cosine similarity becomes a dot product.
+
+    Args:
+        vector (np.ndarray): Feature vector of any shape.
+
+    Returns:
+        np.ndarray or None: Flat float32 unit vector, or None for an all-zero vector.
+    """
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    if not math.isfinite(norm) or norm == 0.0:
+        return None
+    return vector / norm
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the positions of the `k` highest scores, best first.
+    """
+    if len(scores) > k:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """
+    Append-only, memory-mapped index of image feature vectors with top-k cosine search.
+
+    Vectors are stored L2-normalized as float16 rows of `vectors.f16`, next to the image ID
+    of each row in `ids.bin` (12-byte ObjectIds) and its cluster in `lists.i32`. The files
+    are mapped rather than read, so an index of a million 1280-dimension vectors costs
+    2.5 GB of page cache instead of heap, and opening it is instant. The row count in the
+    vector file header is only advanced once a row is fully written, so readers never see
+    partial rows; rows are appended under an exclusive `flock`, so several API workers can
+    share one index.
+
+    Searches are exhaustive until the index is clustered with `train` (see
+    tools/build_vector_index.py): rows are then grouped into inverted lists by their
+    nearest k-means centroid, and a query only scores the rows of its `nprobe` nearest
+    clusters, plus rows added since the lists were built and rows that predate the
+    clustering. New rows are assigned to a cluster as they are added.
+
+    Args:
+        path (str): Directory of the index files; created if missing.
+        nprobe (int): Number of clusters scanned per query; 0 always scans everything.
+    """
+
+    def __init__(self, path: str, nprobe: int = VECTOR_INDEX_NPROBE):
+        self.path = path
+        self.nprobe = max(0, int(nprobe))
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f16")
+        self._ids_path = os.path.join(path, "ids.bin")
+        self._lists_path = os.path.join(path, "lists.i32")
+        self._centroids_path = os.path.join(path, "centroids.npy")
+
+        self._fd = os.open(self._vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self._dim = None
+        self._capacity = 0
+        self._vectors = None
+        self._ids = None
+        self._lists = None
+        self._centroids = None
+        self._centroids_stamp = None
+        self._inverted = None
+
+    @contextmanager
+    def _exclusive(self):
+        """
+        Holds the in-process lock and the cross-process file lock.
+        """
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read_header(self) -> Optional[tuple]:
+        """
+        Returns (dim, count, capacity), or None for an index nothing was added to yet.
+        """
+        raw = os.pread(self._fd, struct.calcsize(HEADER_FORMAT), 0)
+        if len(raw) < struct.calcsize(HEADER_FORMAT):
+            return None
+        magic, dim, count, capacity = struct.unpack(HEADER_FORMAT, raw)
+        if magic != HEADER_MAGIC:
+            raise ValueError(f"{self._vectors_path} is not a vector index file.")
+        return dim, count, capacity
+
+    def _write_header(self, dim: int, count: int, capacity: int) -> None:
+        header = struct.pack(HEADER_FORMAT, HEADER_MAGIC, dim, count, capacity)
+        os.pwrite(self._fd, header.ljust(HEADER_BYTES, b"\0"), 0)
+
+    def _resize_files(self, dim: int, capacity: int) -> None:
+        os.ftruncate(self._fd, HEADER_BYTES + capacity * dim * 2)
+        for path, row_bytes in ((self._ids_path, 12), (self._lists_path, 4)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+    def _map(self, dim: int, capacity: int) -> None:
+        """
+        Maps the index files for `capacity` rows. Arrays handed out before stay valid.
+        """
+        self._vectors = np.memmap(
+            self._vectors_path, np.float16, "r+", offset=HEADER_BYTES, shape=(capacity, dim)
+        )
+        self._ids = np.memmap(self._ids_path, np.uint32, "r+", shape=(capacity, 3))
+        self._lists = np.memmap(self._lists_path, np.int32, "r+", shape=(capacity,))
+        self._dim = dim
+        self._capacity = capacity
+
+    def _refresh(self) -> int:
+        """
+        Re-maps the files if another process grew them and reloads changed centroids.
+
+        Returns:
+            int: Number of rows in the index.
+        """
+        header = self._read_header()
+        if header is None:
+            return 0
+        dim, count, capacity = header
+        if capacity != self._capacity or dim != self._dim:
+            self._map(dim, capacity)
+        self._load_centroids()
+        return count
+
+    def _load_centroids(self) -> None:
+        try:
+            stat = os.stat(self._centroids_path)
+        except FileNotFoundError:
+            self._centroids = None
+            self._centroids_stamp = None
+            self._inverted = None
+            return
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._centroids_stamp:
+            self._centroids = np.load(self._centroids_path).astype(np.float32)
+            self._centroids_stamp = stamp
+            self._inverted = None
+
+    def _assign(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the list number of each row: its nearest centroid plus one, or 0 when the
+        index is not clustered.
+        """
+        centroids = self._centroids if centroids is None else centroids
+        if centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return (np.argmax(vectors @ centroids.T, axis=1) + 1).astype(np.int32)
+
+    def add(self, image_id: str, features: np.ndarray) -> bool:
+        """
+        Appends the features of one image.
+
+        Args:
+            image_id (str): ObjectId of the image.
+            features (np.ndarray): Feature vector; its length fixes the index dimension.
+
+        Returns:
+            bool: False if the vector was all zeros and not added.
+
+        Raises:
+            ValueError: If the vector length differs from the index dimension.
+        """
+        vector = normalize(features)
+        if vector is None:
+            return False
+        key = np.frombuffer(ObjectId(image_id).binary, dtype=np.uint32)
+
+        with self._exclusive():
+            header = self._read_header()
+            if header is None:
+                dim, count, capacity = len(vector), 0, INITIAL_CAPACITY
+                self._resize_files(dim, capacity)
+                self._write_header(dim, count, capacity)
+            else:
+                dim, count, capacity = header
+            if len(vector) != dim:
+                raise ValueError(f"Expected {dim} features, got {len(vector)}.")
+
+            if count == capacity:
+                capacity *= 2
+                self._resize_files(dim, capacity)
+                self._write_header(dim, count, capacity)
+            if capacity != self._capacity or dim != self._dim:
+                self._map(dim, capacity)
+            self._load_centroids()
+
+            self._vectors[count] = vector
+            self._ids[count] = key
+            self._lists[count] = self._assign(vector[None])[0]
+            # The row becomes visible to readers only now
+            self._write_header(dim, count + 1, capacity)
+        return True
+
+    def find(self, image_id: str) -> Optional[int]:
+        """
+        Returns the row holding an image's features, or None if it is not indexed.
+        """
+        with self._lock:
+            count = self._refresh()
+            ids = self._ids
+        if count == 0:
+            return None
+
+        key = np.frombuffer(ObjectId(image_id).binary, dtype=np.uint32)
+        # The last four bytes (counter) are nearly unique, so few rows are compared in full
+        for row in np.flatnonzero(ids[:count, 2] == key[2])[::-1]:
+            if np.array_equal(ids[row], key):
+                return int(row)
+        return None
+
+    def _inverted_lists(self, count: int) -> tuple:
+        """
+        Returns (order, bounds, listed): the rows sorted by list number, where list `n`
+        spans order[bounds[n]:bounds[n + 1]], covering the first `listed` rows. Rebuilt
+        when too many rows were added since.
+        """
+        inverted = self._inverted
+        if inverted is not None:
+            listed = inverted[2]
+            if count - listed <= max(MAX_UNLISTED_ROWS, listed // 10):
+                return inverted
+
+        labels = np.asarray(self._lists[:count])
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(labels[order], np.arange(len(self._centroids) + 2))
+        self._inverted = (order, bounds, count)
+        return self._inverted
+
+    def search(self, features: np.ndarray, k: int = 10, exclude_row: int = None) -> list:
+        """
+        Finds the rows most similar to a feature vector.
+
+        Args:
+            features (np.ndarray): Query feature vector.
+            k (int): Number of results.
+            exclude_row (int, optional): Row to leave out, e.g. the query image itself.
+
+        Returns:
+            list: (row, cosine similarity) pairs, most similar first.
+        """
+        query = normalize(features)
+        with self._lock:
+            count = self._refresh()
+            if count == 0 or query is None:
+                return []
+            vectors = self._vectors
+            centroids = self._centroids
+            inverted = None
+            if centroids is not None and 0 < self.nprobe < len(centroids):
+                inverted = self._inverted_lists(count)
+
+        if inverted is None:
+            rows, scores = [], []
+            for start in range(0, count, SEARCH_CHUNK_ROWS):
+                end = min(count, start + SEARCH_CHUNK_ROWS)
+                chunk_scores = np.asarray(vectors[start:end], dtype=np.float32) @ query
+                best = top_k(chunk_scores, k + 1)
+                rows.append(best + start)
+                scores.append(chunk_scores[best])
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+        else:
+            order, bounds, listed = inverted
+            probed = top_k(centroids @ query, self.nprobe) + 1
+            # List 0 holds rows added before the index was clustered
+            rows = np.concatenate(
+                [order[bounds[n] : bounds[n + 1]] for n in (0, *probed)]
+                + [np.arange(listed, count)]
+            )
+            rows.sort()
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+
+        if exclude_row is not None:
+            scores = np.where(rows == exclude_row, -np.inf, scores)
+        best = top_k(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    def similar(self, image_id: str, k: int = 10) -> Optional[list]:
+        """
+        Finds the images most similar to an indexed image.
+
+        Args:
+            image_id (str): ObjectId of the query image.
+            k (int): Number of results.
+
+        Returns:
+            list or None: (image ID, cosine similarity) pairs, most similar first, or None
+                if the image is not indexed.
+        """
+        row = self.find(image_id)
+        if row is None:
+            return None
+        features = np.asarray(self._vectors[row], dtype=np.float32)
+        return [
+            (str(ObjectId(self._ids[match].tobytes())), score)
+            for match, score in self.search(features, k, exclude_row=row)
+        ]
+
+    def train(
+        self,
+        nlist: int = None,
+        sample_size: int = 100_000,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> int:
+        """
+        Clusters the index with spherical k-means on a sample of rows and assigns every row
+        to its nearest centroid. Rows added meanwhile are assigned by the new centroids.
+
+        Args:
+            nlist (int, optional): Number of clusters; twice the square root of the row
+                count when omitted.
+            sample_size (int): Rows used to fit the centroids.
+            iterations (int): k-means iterations.
+            seed (int): Random seed for sampling and initialization.
+
+        Returns:
+            int: Number of clusters.
+
+        Raises:
+            ValueError: If the index is empty.
+        """
+        with self._lock:
+            count = self._refresh()
+            vectors = self._vectors
+        if count == 0:
+            raise ValueError(f"The index at {self.path} is empty.")
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(count, sample_size), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        nlist = max(1, min(len(sample), nlist or int(2 * math.sqrt(count))))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+
+        for _ in range(iterations):
+            labels = self._assign(sample, centroids) - 1
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.diff(sorted_labels, prepend=-1))
+            sums = np.zeros_like(centroids)
+            sums[sorted_labels[starts]] = np.add.reduceat(sample[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Clusters that lost all their rows keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        def assign_rows(start: int, end: int) -> None:
+            for chunk in range(start, end, SEARCH_CHUNK_ROWS):
+                chunk_end = min(end, chunk + SEARCH_CHUNK_ROWS)
+                chunk_vectors = np.asarray(vectors[chunk:chunk_end], dtype=np.float32)
+                self._lists[chunk:chunk_end] = self._assign(chunk_vectors, centroids)
+
+        assign_rows(0, count)
+        with self._exclusive():
+            latest = self._refresh()
+            vectors = self._vectors
+            assign_rows(count, latest)
+            temporary_path = self._centroids_path + ".tmp.npy"
+            np.save(temporary_path, centroids.astype(np.float32))
+            os.replace(temporary_path, self._centroids_path)
+            self._load_centroids()
+        return nlist
+
+    def stats(self) -> dict:
+        """
+        Returns the number of rows, feature dimension and number of clusters.
+        """
+        with self._lock:
+            count = self._refresh()
+            return {
+                "path": self.path,
+                "rows": count,
+                "dim": self._dim,
+                "clusters": len(self._centroids) if self._centroids is not None else 0,
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(version: Optional[str], root: str = VECTOR_INDEX_DIR) -> VectorIndex:
+    """
+    Returns the feature index of a disease model version, opening it on first use.
+
+    Features of different model versions are not comparable, so each version has its own
+    index directory under `root`.
+
+    Args:
+        version (str, optional): Disease model version; None for an unversioned model.
+        root (str): Directory holding the per-version indexes.
+
+    Returns:
+        VectorIndex: The index.
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", version or UNVERSIONED).lstrip(".") or UNVERSIONED
+    path = os.path.join(root, name)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = VectorIndex(path)
+        return _indexes[path]
+
+
+def add_features(version: Optional[str], image_id: str, features: np.ndarray) -> bool:
+    """
+    Adds the features of a new image to the index of the disease model version that
+    produced them.
+
+    Args:
+        version (str, optional): Disease model version.
+        image_id (str): ObjectId of the image.
+        features (np.ndarray): Penultimate-layer features of the image.
+
+    Returns:
+        bool: False if the vector was all zeros and not added.
+    """
+    return get_vector_index(version).add(image_id, features)
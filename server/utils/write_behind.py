@@ -0,0 +1,356 @@
+import asyncio
+import traceback
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+from pymongo.errors import BulkWriteError
+from config import (
+    WRITE_BEHIND_MAX_BYTES,
+    WRITE_BEHIND_MAX_ITEMS,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_MS,
+    WRITE_BEHIND_RETRY_SECONDS,
+)
+from utils.image_store import delete_variants, store_original
+from utils.prediction_cache import prediction_cache
+from utils.prediction_stats import record_prediction_stats
+from utils.metrics import leave_request_context, timed, track_queue_depth
+from db import fs, prediction_collection
+import gridfs
+
+# Approximate memory held by one queued prediction record, excluding its image
+RECORD_OVERHEAD_BYTES = 1024
+
+# Duplicate key error code, raised when a retried insert had already succeeded
+DUPLICATE_KEY_ERROR = 11000
+
+# First and longest wait (in seconds) between attempts of a failing write
+RETRY_INITIAL_DELAY = 0.1
+RETRY_MAX_DELAY = 5.0
+
+# Number of image IDs given up on that are remembered, so that repeat uploads of them
+# queued in later batches are dropped too
+FAILED_IMAGES_KEPT = 4096
+
+
+class WriteBehindQueue:
+    """
+    Buffers GridFS uploads and prediction records and writes them in the background.
+
+    Requests hand over the image bytes (under a pre-allocated GridFS ID) and the finished
+    prediction record, then respond immediately. A flusher task collects queued items into
+    batches, uploads their images, writes the records with one `insert_many`, and updates
+    the daily statistics. Failed writes are retried with exponential backoff until
+    `retry_seconds` have passed. Records whose image could not be stored are dropped rather
+    than inserted, and their content hash is evicted from the prediction cache, so a repeat
+    upload of the same image is predicted and stored again instead of referring to an image
+    that does not exist; resized variants already rendered from its queued bytes are
+    deleted. The IDs of the last FAILED_IMAGES_KEPT such images are remembered, so repeat
+    uploads answered from the cache before the eviction are dropped as well, even when they
+    are flushed in a later batch.
+
+    Memory is bounded by total queued bytes and item count: when either limit is reached,
+    `submit` waits until a flush frees space, which pushes back on the producers. Images
+    that are queued but not yet written can be read through `get_pending_image`. Callbacks
+    registered with `add_write_listener` run with each batch of records once it is inserted,
+    e.g. to announce them to the history stream.
+
+    Args:
+        max_bytes (int): Maximum bytes of queued images and records.
+        max_items (int): Maximum number of queued records.
+        batch_size (int): Maximum records per flush.
+        flush_interval_ms (float): Time to wait for more records before flushing a batch.
+        retry_seconds (float): Time a failing write is retried before it is given up and
+            logged.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = WRITE_BEHIND_MAX_BYTES,
+        max_items: int = WRITE_BEHIND_MAX_ITEMS,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval_ms: float = WRITE_BEHIND_FLUSH_MS,
+        retry_seconds: float = WRITE_BEHIND_RETRY_SECONDS,
+    ):
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_items = max(1, int(max_items))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.retry_seconds = max(0.0, float(retry_seconds))
+        self._items = deque()
+        self._bytes = 0
+        self._inflight = 0
+        self._pending_images = {}
+        self._space = None
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+        self._listeners = []
+        self._failed_images = OrderedDict()
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        track_queue_depth("write_behind", lambda: len(self._items) + self._inflight)
+
+    def _ensure_started(self) -> None:
+        """
+        Starts the flusher task on the running event loop if it is not already running.
+        """
+        if self._task is None or self._task.done():
+            self._space = asyncio.Condition()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, record: dict, upload: Optional[tuple] = None) -> None:
+        """
+        Queue a prediction record and, optionally, the image it refers to.
+
+        Waits while the queue is at its memory or item limit.
+
+        Args:
+            record (dict): The prediction record to insert; should carry a pre-allocated `_id`.
+            upload (tuple, optional): (file_id, filename, contents) of an image to store in GridFS.
+
+        Raises:
+            RuntimeError: If the queue is shutting down.
+        """
+        if self._closing:
+            raise RuntimeError("Write-behind queue is shutting down.")
+        self._ensure_started()
+
+        size = RECORD_OVERHEAD_BYTES + (len(upload[2]) if upload else 0)
+        async with self._space:
+            await self._space.wait_for(
+                lambda: (not self._items and not self._inflight)
+                or (
+                    self._bytes + size <= self.max_bytes
+                    and len(self._items) + self._inflight < self.max_items
+                )
+            )
+            self._items.append((record, upload, size))
+            self._bytes += size
+            if upload:
+                self._pending_images[upload[0]] = upload
+
+        self.submitted += 1
+        self._wakeup.set()
+
+    def add_write_listener(self, listener: Callable[[list], None]) -> None:
+        """
+        Registers a callback run (on the event loop) after records have been inserted.
+
+        Args:
+            listener (Callable[[list], None]): Receives the inserted records, in queue order.
+        """
+        self._listeners.append(listener)
+
+    def get_pending_image(self, file_id) -> Optional[tuple]:
+        """
+        Return an image that has been accepted but not yet written to GridFS.
+
+        Args:
+            file_id (ObjectId): The pre-allocated GridFS ID.
+
+        Returns:
+            tuple or None: (file_id, filename, contents), or None if not pending.
+        """
+        return self._pending_images.get(file_id)
+
+    async def _with_retries(self, operation, *args) -> bool:
+        """
+        Runs an async write, retrying with exponential backoff until `retry_seconds` after
+        the first attempt.
+
+        Returns:
+            bool: True if the write eventually succeeded.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.retry_seconds
+        delay = RETRY_INITIAL_DELAY
+        while True:
+            try:
+                await operation(*args)
+                return True
+            except Exception:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    traceback.print_exc()
+                    return False
+                self.retries += 1
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    async def _upload(self, upload: tuple) -> None:
+        """
+        Stores one image, removing any partial copy if the attempt fails so it can be retried.
+        """
+        file_id, filename, contents = upload
+        try:
+            await store_original(file_id, filename, contents)
+        except Exception:
+            try:
+                await fs.delete(file_id)
+            except gridfs.errors.NoFile:
+                pass
+            raise
+
+    async def _insert(self, records: list) -> None:
+        """
+        Inserts records, treating duplicates from an earlier partially successful attempt as done.
+        """
+        try:
+            await prediction_collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+
+    async def _flush(self, batch: list) -> None:
+        """
+        Writes one batch: images first, then the records that reference them, then statistics.
+
+        Records referring to an image that could not be stored, in this batch or an earlier
+        one, are dropped and counted as failed.
+        """
+        try:
+            uploads = [upload for _, upload, _ in batch if upload]
+            with timed("gridfs_upload"):
+                uploaded = await asyncio.gather(
+                    *(self._with_retries(self._upload, upload) for upload in uploads)
+                )
+            for upload, stored in zip(uploads, uploaded):
+                if not stored:
+                    self._remember_failed_image(str(upload[0]))
+                    await self._delete_variants(upload[0])
+
+            records = []
+            for record, _, _ in batch:
+                if record.get("image_id") in self._failed_images:
+                    prediction_cache.discard(record.get("content_hash"), record["image_id"])
+                    self.failed += 1
+                else:
+                    records.append(record)
+            if not records:
+                return
+
+            with timed("mongo_insert"):
+                inserted = await self._with_retries(self._insert, records)
+            if inserted:
+                self.written += len(records)
+                await self._update_stats(records)
+                self._notify_written(records)
+            else:
+                self.failed += len(records)
+        finally:
+            async with self._space:
+                for _, upload, size in batch:
+                    self._bytes -= size
+                    if upload:
+                        self._pending_images.pop(upload[0], None)
+                self._inflight -= len(batch)
+                self._space.notify_all()
+
+    async def _delete_variants(self, file_id) -> None:
+        """
+        Deletes the resized variants rendered from an image that could not be stored; a
+        failure is logged, leaving them behind.
+        """
+        try:
+            await delete_variants(file_id)
+        except Exception:
+            traceback.print_exc()
+
+    def _remember_failed_image(self, image_id: str) -> None:
+        """
+        Records an image that was given up on, forgetting the oldest beyond FAILED_IMAGES_KEPT.
+        """
+        self._failed_images[image_id] = None
+        self._failed_images.move_to_end(image_id)
+        while len(self._failed_images) > FAILED_IMAGES_KEPT:
+            self._failed_images.popitem(last=False)
+
+    async def _update_stats(self, records: list) -> None:
+        """
+        Applies the statistics increments once; increments are not idempotent, so a failure
+        is logged rather than retried (the rollups can be rebuilt from the records).
+        """
+        try:
+            with timed("stats_update"):
+                await record_prediction_stats(records)
+        except Exception:
+            traceback.print_exc()
+
+    def _notify_written(self, records: list) -> None:
+        """
+        Runs the write listeners; a failing listener is logged and does not affect the others.
+        """
+        for listener in self._listeners:
+            try:
+                listener(records)
+            except Exception:
+                traceback.print_exc()
+
+    def _take_batch(self) -> list:
+        """
+        Removes up to `batch_size` queued items for flushing.
+        """
+        batch = []
+        while self._items and len(batch) < self.batch_size:
+            batch.append(self._items.popleft())
+        self._inflight += len(batch)
+        return batch
+
+    async def _run(self) -> None:
+        """
+        Background loop that flushes queued items in batches.
+        """
+        leave_request_context()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if len(self._items) < self.batch_size and not self._closing:
+                await asyncio.sleep(self.flush_interval)
+
+            while self._items:
+                await self._flush(self._take_batch())
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the queue size and write counters.
+
+        Returns:
+            dict: Queued items and bytes, limits, and submitted/written/failed/retry counts.
+        """
+        return {
+            "queued": len(self._items) + self._inflight,
+            "queued_bytes": self._bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+    async def close(self) -> None:
+        """
+        Stops accepting new items, writes everything still queued, and stops the flusher.
+        """
+        self._closing = True
+        if self._task is None:
+            return
+
+        self._wakeup.set()
+        async with self._space:
+            await self._space.wait_for(lambda: not self._items and not self._inflight)
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Shared write-behind queue for prediction uploads and records
+write_behind_queue = WriteBehindQueue()